@@ -1,14 +1,21 @@
 import chess
 import chess.engine
-from typing import List, Optional, Tuple
+import chess.polyglot
+from typing import List, Optional, Tuple, Dict, Set
+from .pieces import ChessPiece
 
 class ChessBoard:
     """Chess board representation and basic operations"""
     
-    def __init__(self):
-        self.board = chess.Board()
+    ZOBRIST = chess.polyglot.ZobristHasher(chess.polyglot.POLYGLOT_RANDOM_ARRAY)
+    _castling_keys = {}  # Castling rights mask -> Zobrist key
+    
+    def __init__(self, fen: str = None, debug: bool = False):
+        self.board = chess.Board(fen) if fen else chess.Board()
         self.move_history = []
-        
+        self.debug = debug  # Check the incremental state against a full recompute after every move
+        self._recompute_state()
+    
     def get_fen(self) -> str:
         """Get current board state in FEN format"""
         return self.board.fen()
@@ -21,18 +28,19 @@ class ChessBoard:
         """Make a move and return success status"""
         try:
             move = chess.Move.from_uci(move_uci)
-            if move in self.board.legal_moves:
-                self.board.push(move)
-                self.move_history.append(move_uci)
-                return True
+        except ValueError:
             return False
-        except:
+        if move not in self.board.legal_moves:
             return False
+        # Nothing is pushed unless the move succeeds, push_move raises after undoing it
+        self.push_move(move)
+        self.move_history.append(move_uci)
+        return True
     
     def undo_move(self) -> bool:
         """Undo the last move"""
         if self.board.move_stack:
-            self.board.pop()
+            self.pop_move()
             if self.move_history:
                 self.move_history.pop()
             return True
@@ -72,4 +80,171 @@ class ChessBoard:
     def reset(self):
         """Reset board to starting position"""
         self.board = chess.Board()
-        self.move_history = []
\ No newline at end of file
+        self.move_history = []
+        self._recompute_state()
+    
+    def set_board(self, board: chess.Board):
+        """Replace the underlying board, e.g. with a copy to search on"""
+        self.board = board
+        self.move_history = [move.uci() for move in board.move_stack]
+        self._recompute_state()
+    
+    def push_move(self, move: chess.Move):
+        """Make a move without a legality check, keeping the evaluation state up to date"""
+        board = self.board
+        color = board.turn
+        changes = []
+        
+        piece_type = board.piece_type_at(move.from_square)
+        if board.is_castling(move):
+            # Both e1g1 and king-takes-rook e1h1: the king lands on the g or c file, the rook next to it
+            rank = chess.square_rank(move.from_square)
+            kingside = board.is_kingside_castling(move)
+            if board.piece_type_at(move.to_square) == chess.ROOK:
+                rook_from = move.to_square
+            else:
+                rook_from = chess.square(7 if kingside else 0, rank)
+            king_to = chess.square(6 if kingside else 2, rank)
+            rook_to = chess.square(5 if kingside else 3, rank)
+            self._remove_piece(color, chess.KING, move.from_square, changes)
+            self._remove_piece(color, chess.ROOK, rook_from, changes)
+            self._add_piece(color, chess.KING, king_to, changes)
+            self._add_piece(color, chess.ROOK, rook_to, changes)
+        else:
+            if board.is_en_passant(move):
+                self._remove_piece(not color, chess.PAWN, move.to_square ^ 8, changes)
+            else:
+                captured = board.piece_type_at(move.to_square)
+                if captured:
+                    self._remove_piece(not color, captured, move.to_square, changes)
+            
+            self._remove_piece(color, piece_type, move.from_square, changes)
+            self._add_piece(color, move.promotion or piece_type, move.to_square, changes)
+        
+        self._undo_stack.append((changes, self.zobrist_hash))
+        board.push(move)
+        self.zobrist_hash = self._hash_extras(self._piece_hash)
+        
+        if self.debug:
+            try:
+                self.check_consistency()
+            except RuntimeError:
+                self._undo_last()  # Leave the board as it was before the move
+                raise
+    
+    def pop_move(self) -> chess.Move:
+        """Take back the last move, restoring the evaluation state"""
+        move = self._undo_last()
+        if self.debug:
+            self.check_consistency()
+        return move
+    
+    def _undo_last(self) -> chess.Move:
+        """Pop the last move and its undo record"""
+        move = self.board.pop()
+        changes, self.zobrist_hash = self._undo_stack.pop()
+        
+        for color, piece_type, square, added in reversed(changes):
+            if added:
+                self._remove_piece(color, piece_type, square, None)
+            else:
+                self._add_piece(color, piece_type, square, None)
+        return move
+    
+    def get_material(self, color: bool) -> int:
+        """Get total material value for a color"""
+        return self._material[color]
+    
+    def get_piece_positions(self, color: bool) -> Dict[int, Set[int]]:
+        """Get the squares of each piece type for a color (do not modify the sets)"""
+        return {piece_type: squares for piece_type, squares in self._pieces[color].items() if squares}
+    
+    def get_pst_score(self) -> int:
+        """Get the piece-square table balance in centipawns, positive for White"""
+        return self._pst_score
+    
+    def get_zobrist_hash(self) -> int:
+        """Get the Polyglot Zobrist hash of the current position"""
+        return self.zobrist_hash
+    
+    def evaluate(self) -> int:
+        """Get material plus piece-square score in centipawns, positive for White"""
+        return (self._material[chess.WHITE] - self._material[chess.BLACK]) * 100 + self._pst_score
+    
+    def check_consistency(self):
+        """Compare the incremental state with a full recompute"""
+        expected = {
+            "material": {color: ChessPiece.count_material(self.board, color) for color in chess.COLORS},
+            "pieces": {color: {piece_type: set(squares) for piece_type, squares in
+                               ChessPiece.get_all_piece_positions(self.board, color).items()}
+                       for color in chess.COLORS},
+            "pst": self._full_pst_score(),
+            "hash": chess.polyglot.zobrist_hash(self.board)
+        }
+        actual = {
+            "material": dict(self._material),
+            "pieces": {color: self.get_piece_positions(color) for color in chess.COLORS},
+            "pst": self._pst_score,
+            "hash": self.zobrist_hash
+        }
+        for name in expected:
+            if expected[name] != actual[name]:
+                raise RuntimeError(f"Incremental {name} out of sync after {self.board.move_stack[-1:]}: "
+                                   f"{actual[name]} != {expected[name]}")
+    
+    def _recompute_state(self):
+        """Rebuild the incremental evaluation state from scratch"""
+        # Moves already on the stack need undo records, so replay them from the root
+        moves = self.board.move_stack
+        if moves:
+            self.board = self.board.root()
+        
+        self._material = {chess.WHITE: 0, chess.BLACK: 0}
+        self._pieces = {color: {piece_type: set() for piece_type in chess.PIECE_TYPES} for color in chess.COLORS}
+        self._pst_score = 0
+        self._piece_hash = 0
+        self._undo_stack = []
+        
+        for square, piece in self.board.piece_map().items():
+            self._add_piece(piece.color, piece.piece_type, square, None)
+        self.zobrist_hash = self._hash_extras(self._piece_hash)
+        
+        for move in moves:
+            self.push_move(move)
+    
+    def _full_pst_score(self) -> int:
+        """Compute the piece-square table balance by scanning the board"""
+        score = 0
+        for square, piece in self.board.piece_map().items():
+            value = ChessPiece.get_square_value(piece.piece_type, piece.color, square)
+            score += value if piece.color == chess.WHITE else -value
+        return score
+    
+    def _hash_extras(self, piece_hash: int) -> int:
+        """Combine the piece hash with the castling, en passant and turn keys"""
+        castling_rights = self.board.clean_castling_rights()
+        castling_key = self._castling_keys.get(castling_rights)
+        if castling_key is None:
+            castling_key = self._castling_keys[castling_rights] = self.ZOBRIST.hash_castling(self.board)
+        return (piece_hash ^ castling_key ^
+                self.ZOBRIST.hash_ep_square(self.board) ^ self.ZOBRIST.hash_turn(self.board))
+    
+    def _add_piece(self, color: bool, piece_type: int, square: int, changes: Optional[list]):
+        """Add a piece to the incremental state"""
+        self._material[color] += ChessPiece.PIECE_VALUES[piece_type]
+        self._pieces[color][piece_type].add(square)
+        value = ChessPiece.get_square_value(piece_type, color, square)
+        self._pst_score += value if color == chess.WHITE else -value
+        self._piece_hash ^= chess.polyglot.POLYGLOT_RANDOM_ARRAY[64 * ((piece_type - 1) * 2 + color) + square]
+        if changes is not None:
+            changes.append((color, piece_type, square, True))
+    
+    def _remove_piece(self, color: bool, piece_type: int, square: int, changes: Optional[list]):
+        """Remove a piece from the incremental state"""
+        self._material[color] -= ChessPiece.PIECE_VALUES[piece_type]
+        self._pieces[color][piece_type].discard(square)
+        value = ChessPiece.get_square_value(piece_type, color, square)
+        self._pst_score -= value if color == chess.WHITE else -value
+        self._piece_hash ^= chess.polyglot.POLYGLOT_RANDOM_ARRAY[64 * ((piece_type - 1) * 2 + color) + square]
+        if changes is not None:
+            changes.append((color, piece_type, square, False))
\ No newline at end of file
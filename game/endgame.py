@@ -0,0 +1,323 @@
+import os
+import time
+import chess
+import numpy as np
+from typing import Dict, List, Optional, Any
+
+DEFAULT_TABLE_DIR = "models/endgame"
+
+# Supported endgames: the strong side has a king and one piece, the weak side a bare king
+TABLES = {"KQK": chess.QUEEN, "KRK": chess.ROOK, "KPK": chess.PAWN}
+# A pawn promotes into the queen and rook endgames, which must be solved first
+DEPENDENCIES = {"KPK": ["KQK", "KRK"]}
+
+# Index = ((side to move * 64 + strong king) * 64 + weak king) * 64 + piece, squares
+# as seen with the strong side playing White
+STRONG, WEAK = 0, 1
+TABLE_SIZE = 2 * 64 * 64 * 64
+
+# Entries are plies to mate: even means the side to move is mated, odd means it mates
+DRAW = 255  # Also used for illegal positions
+
+KING_STEPS = [(-1, -1), (0, -1), (1, -1), (-1, 0), (1, 0), (-1, 1), (0, 1), (1, 1)]
+KNIGHT_STEPS = [(1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2)]
+ROOK_DIRECTIONS = [(1, 0), (-1, 0), (0, 1), (0, -1)]
+BISHOP_DIRECTIONS = [(1, 1), (1, -1), (-1, 1), (-1, -1)]
+SLIDER_DIRECTIONS = {
+    chess.QUEEN: ROOK_DIRECTIONS + BISHOP_DIRECTIONS,
+    chess.ROOK: ROOK_DIRECTIONS,
+    chess.BISHOP: BISHOP_DIRECTIONS,
+}
+
+FILES = np.arange(64) & 7
+RANKS = np.arange(64) >> 3
+
+def _square_tables():
+    """Precompute king adjacency, slider lines and in-between masks for all square pairs"""
+    df = FILES[None, :] - FILES[:, None]
+    dr = RANKS[None, :] - RANKS[:, None]
+    different = (df != 0) | (dr != 0)
+    
+    king_adjacent = (np.maximum(np.abs(df), np.abs(dr)) == 1)
+    knight_jump = (np.abs(df) * np.abs(dr) == 2)
+    rook_line = ((df == 0) | (dr == 0)) & different
+    bishop_line = (np.abs(df) == np.abs(dr)) & different
+    
+    between = np.zeros((64, 64), dtype=np.uint64)
+    for square in range(64):
+        for step_file, step_rank in ROOK_DIRECTIONS + BISHOP_DIRECTIONS:
+            mask = 0
+            file, rank = square & 7, square >> 3
+            while True:
+                file += step_file
+                rank += step_rank
+                if not (0 <= file < 8 and 0 <= rank < 8):
+                    break
+                between[square, rank * 8 + file] = mask
+                mask |= 1 << (rank * 8 + file)
+    
+    lines = {
+        chess.QUEEN: rook_line | bishop_line,
+        chess.ROOK: rook_line,
+        chess.BISHOP: bishop_line,
+    }
+    return king_adjacent, knight_jump, lines, between
+
+KING_ADJACENT, KNIGHT_JUMP, LINES, BETWEEN = _square_tables()
+
+def table_index(stm, strong_king, weak_king, piece):
+    """Perfect hash of a position into its table (works on scalars and arrays)"""
+    return ((stm * 64 + strong_king) * 64 + weak_king) * 64 + piece
+
+def _bit(squares: np.ndarray) -> np.ndarray:
+    return np.left_shift(np.uint64(1), squares.astype(np.uint64))
+
+def _attacks(piece_type: int, piece: np.ndarray, target: np.ndarray, blockers: np.ndarray) -> np.ndarray:
+    """Whether the strong piece attacks a square"""
+    if piece_type == chess.PAWN:
+        return (RANKS[target] == RANKS[piece] + 1) & (np.abs(FILES[target] - FILES[piece]) == 1)
+    if piece_type == chess.KNIGHT:
+        return KNIGHT_JUMP[piece, target]
+    return LINES[piece_type][piece, target] & ((BETWEEN[piece, target] & blockers) == 0)
+
+def _legal(piece_type: int, stm, strong_king, weak_king, piece) -> np.ndarray:
+    """Whether positions are legal: distinct squares, no adjacent kings, no capturable king"""
+    legal = (strong_king != weak_king) & (piece != strong_king) & (piece != weak_king)
+    legal &= ~KING_ADJACENT[strong_king, weak_king]
+    if piece_type == chess.PAWN:
+        legal &= (RANKS[piece] != 0) & (RANKS[piece] != 7)
+    # With the strong side to move, the weak king must not be in check
+    return legal & ~((stm == STRONG) & _attacks(piece_type, piece, weak_king, _bit(strong_king)))
+
+def _step(squares: np.ndarray, step_file: int, step_rank: int, distance: int = 1):
+    """Move squares by a step, returning the targets and whether they are on the board"""
+    file = FILES[squares] + step_file * distance
+    rank = RANKS[squares] + step_rank * distance
+    on_board = (file >= 0) & (file < 8) & (rank >= 0) & (rank < 8)
+    return np.where(on_board, rank * 8 + file, 0), on_board
+
+def _successors(piece_type: int, promotion_offsets: Dict[int, int], draw_slot: int):
+    """List the (position, successor) pairs of all legal moves"""
+    stm, strong_king, weak_king, piece = np.unravel_index(np.arange(TABLE_SIZE), (2, 64, 64, 64))
+    legal = _legal(piece_type, stm, strong_king, weak_king, piece)
+    strong = legal & (stm == STRONG)
+    weak = legal & (stm == WEAK)
+    occupied = _bit(strong_king) | _bit(weak_king)
+    
+    rows, successors = [], []
+    
+    def add(mask, successor):
+        found = np.flatnonzero(mask)
+        rows.append(found)
+        successors.append(np.broadcast_to(successor, mask.shape)[found])
+    
+    # Strong king moves
+    for step_file, step_rank in KING_STEPS:
+        target, valid = _step(strong_king, step_file, step_rank)
+        valid &= strong & (target != piece) & _legal(piece_type, WEAK, target, weak_king, piece)
+        add(valid, table_index(WEAK, target, weak_king, piece))
+    
+    # Strong piece moves
+    if piece_type in SLIDER_DIRECTIONS:
+        for step_file, step_rank in SLIDER_DIRECTIONS[piece_type]:
+            for distance in range(1, 8):
+                target, valid = _step(piece, step_file, step_rank, distance)
+                valid &= strong & (target != strong_king) & (target != weak_king)
+                valid &= (BETWEEN[piece, target] & occupied) == 0
+                add(valid, table_index(WEAK, strong_king, weak_king, target))
+    elif piece_type == chess.KNIGHT:
+        for step_file, step_rank in KNIGHT_STEPS:
+            target, valid = _step(piece, step_file, step_rank)
+            valid &= strong & (target != strong_king) & (target != weak_king)
+            add(valid, table_index(WEAK, strong_king, weak_king, target))
+    elif piece_type == chess.PAWN:
+        target = piece + 8
+        valid = strong & (target != strong_king) & (target != weak_king)
+        promotes = RANKS[np.minimum(target, 63)] == 7
+        add(valid & ~promotes, table_index(WEAK, strong_king, weak_king, target))
+        for promotion in (chess.QUEEN, chess.ROOK):
+            add(valid & promotes, promotion_offsets[promotion] + table_index(WEAK, strong_king, weak_king, target))
+        # Minor piece promotions leave insufficient material
+        add(valid & promotes, draw_slot)
+        
+        double = piece + 16
+        valid &= (RANKS[piece] == 1) & (double != strong_king) & (double != weak_king)
+        add(valid, table_index(WEAK, strong_king, weak_king, np.minimum(double, 63)))
+    
+    # Weak king moves, capturing the piece leaves a drawn king against king
+    for step_file, step_rank in KING_STEPS:
+        target, valid = _step(weak_king, step_file, step_rank)
+        valid &= weak & (target != strong_king)
+        captures = valid & (target == piece) & ~KING_ADJACENT[strong_king, target]
+        add(captures, draw_slot)
+        valid &= (target != piece) & _legal(piece_type, STRONG, strong_king, target, piece)
+        add(valid, table_index(STRONG, strong_king, target, piece))
+    
+    rows = np.concatenate(rows)
+    successors = np.concatenate(successors).astype(np.int64)
+    order = np.argsort(rows, kind='stable')
+    
+    in_check = weak & _attacks(piece_type, piece, weak_king, _bit(strong_king))
+    return legal, in_check, rows[order], successors[order]
+
+def generate_table(piece_type: int, promotion_tables: Dict[int, np.ndarray] = None) -> np.ndarray:
+    """Solve an endgame by retrograde analysis and return its distance-to-mate table"""
+    promotion_tables = promotion_tables or {}
+    
+    # Values of all successors live in one array: this table, a draw slot, then promotion tables
+    draw_slot = TABLE_SIZE
+    promotion_offsets = {}
+    parts = [np.full(TABLE_SIZE + 1, DRAW, dtype=np.uint8)]
+    offset = TABLE_SIZE + 1
+    for promotion in (chess.QUEEN, chess.ROOK):
+        if piece_type == chess.PAWN:
+            promotion_offsets[promotion] = offset
+            parts.append(np.asarray(promotion_tables[promotion], dtype=np.uint8))
+            offset += TABLE_SIZE
+    values = np.concatenate(parts)
+    
+    legal, in_check, rows, successors = _successors(piece_type, promotion_offsets, draw_slot)
+    counts = np.bincount(rows, minlength=TABLE_SIZE)
+    has_moves = np.flatnonzero(counts)
+    starts = (np.cumsum(counts) - counts)[has_moves]
+    
+    # Checkmated positions, stalemates stay drawn
+    values[np.flatnonzero(legal & (counts == 0) & in_check)] = 0
+    
+    external = values[TABLE_SIZE + 1:]
+    longest_external = int(external[external != DRAW].max()) if (external != DRAW).any() else 0
+    
+    quiet = 0
+    for plies in range(1, DRAW - 1):
+        found = values[successors]
+        if plies % 2:
+            # Win: some move reaches a position where the opponent is mated in plies - 1
+            hit = np.maximum.reduceat((found == plies - 1).astype(np.uint8), starts)
+        else:
+            # Loss: every move reaches a win for the opponent, the longest taking plies - 1
+            wins = ((found & 1) == 1) & (found != DRAW)
+            all_wins = np.minimum.reduceat(wins.astype(np.uint8), starts)
+            longest = np.maximum.reduceat(np.where(wins, found, 0), starts)
+            hit = all_wins & (longest == plies - 1)
+        
+        solved = has_moves[hit.astype(bool)]
+        solved = solved[values[solved] == DRAW]
+        values[solved] = plies
+        
+        # Wins can only resume after a gap while promotions may still lead somewhere
+        quiet = 0 if len(solved) else quiet + 1
+        if quiet >= 2 and plies > longest_external + 1:
+            break
+    
+    return values[:TABLE_SIZE].copy()
+
+def build_tables(directory: str = DEFAULT_TABLE_DIR, names: List[str] = None) -> Dict[str, Dict[str, Any]]:
+    """Generate endgame tables, with the tables they depend on, and save them as .npy files"""
+    os.makedirs(directory, exist_ok=True)
+    names = names or list(TABLES)
+    
+    solved = {}
+    
+    def solve(name):
+        if name in solved:
+            return solved[name]
+        path = os.path.join(directory, f"{name}.npy")
+        if name not in names and os.path.isfile(path):
+            # Reuse a dependency generated earlier
+            solved[name] = {"table": np.load(path, mmap_mode='r')}
+            return solved[name]
+        
+        dependencies = {TABLES[dependency]: solve(dependency)["table"] for dependency in DEPENDENCIES.get(name, [])}
+        start = time.perf_counter()
+        table = generate_table(TABLES[name], dependencies)
+        
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, table)
+        os.replace(tmp_path, path)
+        
+        wins = table[(table != DRAW) & (table % 2 == 1)]
+        solved[name] = {
+            "table": table,
+            "path": path,
+            "time": time.perf_counter() - start,
+            "longest_mate": int(wins.max()) if len(wins) else 0,
+            "wins": int(len(wins)),
+        }
+        return solved[name]
+    
+    for name in names:
+        solve(name)
+    
+    return {name: {key: value for key, value in info.items() if key != "table"}
+            for name, info in solved.items() if name in names}
+
+class EndgameTablebase:
+    """Read-only distance-to-mate tables, memory-mapped so processes share them"""
+    
+    def __init__(self, directory: str = DEFAULT_TABLE_DIR):
+        self.directory = directory
+        self.tables = {}
+        for name, piece_type in TABLES.items():
+            path = os.path.join(directory, f"{name}.npy")
+            if os.path.isfile(path):
+                self.tables[piece_type] = np.load(path, mmap_mode='r')
+    
+    def __bool__(self) -> bool:
+        return bool(self.tables)
+    
+    def probe(self, board: chess.Board) -> Optional[Dict[str, Any]]:
+        """Look up a position: wdl is 1/0/-1 for the side to move, dtm the plies to mate"""
+        if not self.tables or board.castling_rights:
+            return None
+        
+        pieces = chess.popcount(board.occupied)
+        if pieces == 2:
+            return {"wdl": 0, "dtm": None}
+        if pieces != 3:
+            return None
+        
+        square = chess.msb(board.occupied & ~board.kings)
+        piece_type = board.piece_type_at(square)
+        if piece_type in (chess.KNIGHT, chess.BISHOP):
+            return {"wdl": 0, "dtm": None}
+        if piece_type not in self.tables:
+            return None
+        
+        # Tables are stored with the strong side as White, mirror otherwise
+        strong_color = board.color_at(square)
+        flip = 0 if strong_color == chess.WHITE else 56
+        index = table_index(STRONG if board.turn == strong_color else WEAK,
+                            board.king(strong_color) ^ flip, board.king(not strong_color) ^ flip, square ^ flip)
+        
+        value = int(self.tables[piece_type][index])
+        if value == DRAW:
+            return {"wdl": 0, "dtm": None}
+        return {"wdl": 1 if value % 2 else -1, "dtm": value}
+    
+    def best_move(self, board: chess.Board) -> Optional[str]:
+        """Get the fastest mating move, the longest defence, or a drawing move"""
+        if self.probe(board) is None:
+            return None
+        
+        board = board.copy(stack=False)
+        best_move = None
+        best_key = None
+        for move in board.legal_moves:
+            board.push(move)
+            child = self.probe(board)
+            board.pop()
+            if child is None:
+                continue
+            
+            if child["wdl"] < 0:
+                key = (2, -child["dtm"])  # Mate as fast as possible
+            elif child["wdl"] == 0:
+                key = (1, 0)
+            else:
+                key = (0, child["dtm"])  # Resist as long as possible
+            if best_key is None or key > best_key:
+                best_key = key
+                best_move = move
+        
+        return best_move.uci() if best_move else None
\ No newline at end of file
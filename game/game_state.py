@@ -1,7 +1,38 @@
 import chess
+import hashlib
+import json
+import uuid
 from .board import ChessBoard
 from .rules import ChessRules
-from typing import Optional, Dict, Any
+from .metrics import REGISTRY
+from typing import Optional, Dict, Any, Tuple
+
+PLAYER_MOVE_SECONDS = REGISTRY.histogram("chess_player_move_seconds", "Time to validate and make a player move")
+
+class GameSnapshot:
+    """Immutable view of a game at one ply
+    
+    Built on the first read after a move and shared by every read until the
+    next one, so polling clients get pre-serialized JSON and a stable ETag.
+    The board JSON is only built when it is first asked for.
+    """
+    
+    __slots__ = ("ply", "history_id", "legal_moves", "info", "info_json", "etag", "board_json", "board_etag")
+    
+    def __init__(self, ply: int, history_id: str, legal_moves: Tuple[str, ...], info: Dict[str, Any]):
+        self.ply = ply
+        self.history_id = history_id
+        self.legal_moves = legal_moves
+        self.info = info
+        self.info_json = json.dumps(info).encode()
+        self.etag = GameSnapshot.make_etag(self.info_json)
+        self.board_json = None
+        self.board_etag = None
+    
+    @staticmethod
+    def make_etag(body: bytes) -> str:
+        """Content hash used as the ETag of a serialized response"""
+        return hashlib.blake2b(body, digest_size=8).hexdigest()
 
 class GameState:
     """Manages the overall game state and flow"""
@@ -13,7 +44,9 @@ class GameState:
         self.game_over = False
         self.winner = None
         self.game_result = None
-        
+        self.history_id = uuid.uuid4().hex[:12]  # Changes whenever the move history is rewritten
+        self._snapshot = None
+    
     def is_player_turn(self) -> bool:
         """Check if it's the player's turn"""
         return self.board.board.turn == self.player_color
@@ -24,25 +57,27 @@ class GameState:
     
     def make_player_move(self, move_uci: str) -> Dict[str, Any]:
         """Make a player move and return result"""
-        if not self.is_player_turn():
-            return {"success": False, "error": "Not player's turn"}
-        
-        if not ChessRules.is_legal_move(self.board.board, move_uci):
-            return {"success": False, "error": "Illegal move"}
-        
-        success = self.board.make_move(move_uci)
-        if success:
-            self._check_game_over()
-            return {
-                "success": True,
-                "move": move_uci,
-                "fen": self.board.get_fen(),
-                "is_check": self.board.is_check(),
-                "game_over": self.game_over,
-                "result": self.game_result
-            }
-        else:
-            return {"success": False, "error": "Failed to make move"}
+        with PLAYER_MOVE_SECONDS.time():
+            if not self.is_player_turn():
+                return {"success": False, "error": "Not player's turn"}
+            
+            if not ChessRules.is_legal_move(self.board.board, move_uci):
+                return {"success": False, "error": "Illegal move"}
+            
+            success = self.board.make_move(move_uci)
+            if success:
+                self._snapshot = None
+                self._check_game_over()
+                return {
+                    "success": True,
+                    "move": move_uci,
+                    "fen": self.board.get_fen(),
+                    "is_check": self.board.is_check(),
+                    "game_over": self.game_over,
+                    "result": self.game_result
+                }
+            else:
+                return {"success": False, "error": "Failed to make move"}
     
     def make_ai_move(self, move_uci: str) -> Dict[str, Any]:
         """Make an AI move and return result"""
@@ -51,6 +86,7 @@ class GameState:
         
         success = self.board.make_move(move_uci)
         if success:
+            self._snapshot = None
             self._check_game_over()
             return {
                 "success": True,
@@ -77,23 +113,102 @@ class GameState:
     
     def get_game_info(self) -> Dict[str, Any]:
         """Get current game information"""
-        return {
+        return dict(self.snapshot().info)
+    
+    def get_legal_moves(self) -> Tuple[str, ...]:
+        """Legal moves of the current position, computed once per ply"""
+        return self.snapshot().legal_moves
+    
+    def snapshot(self) -> GameSnapshot:
+        """Get the snapshot of the current ply, building it after a move"""
+        ply = len(self.board.board.move_stack)
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.ply == ply:
+            return snapshot
+        
+        legal_moves = tuple(self.board.get_legal_moves())
+        info = {
             "fen": self.board.get_fen(),
             "player_color": "White" if self.player_color else "Black",
             "ai_color": "Black" if self.ai_color else "White",
             "current_turn": "White" if self.board.board.turn else "Black",
             "is_player_turn": self.is_player_turn(),
             "is_check": self.board.is_check(),
-            "legal_moves": self.board.get_legal_moves(),
-            "move_history": self.board.move_history,
+            "legal_moves": legal_moves,
+            "move_history": tuple(self.board.move_history),
             "game_over": self.game_over,
             "result": self.game_result,
-            "winner": "White" if self.winner else "Black" if self.winner is False else None
+            "winner": "White" if self.winner else "Black" if self.winner is False else None,
+            "ply": ply,
+            "history_id": self.history_id
         }
+        self._snapshot = GameSnapshot(ply, self.history_id, legal_moves, info)
+        return self._snapshot
+    
+    def board_snapshot(self) -> GameSnapshot:
+        """Get the snapshot of the current ply with its board JSON filled in"""
+        snapshot = self.snapshot()
+        if snapshot.board_json is None:
+            board_data = {
+                chess.square_name(square): {
+                    "piece": piece.symbol(),
+                    "color": "white" if piece.color else "black"
+                }
+                for square, piece in self.board.board.piece_map().items()
+            }
+            snapshot.board_json = json.dumps({
+                "board": board_data,
+                "fen": snapshot.info["fen"],
+                "turn": snapshot.info["current_turn"].lower(),
+                "is_check": snapshot.info["is_check"],
+                "game_over": self.game_over,
+                "result": self.game_result,
+                "ply": snapshot.ply,
+                "history_id": self.history_id
+            }).encode()
+            snapshot.board_etag = GameSnapshot.make_etag(snapshot.board_json)
+        return snapshot
+    
+    def get_game_delta(self, since_ply: int, history_id: Optional[str] = None) -> Dict[str, Any]:
+        """Get the game information with only the moves played after since_ply
+        
+        Falls back to the full information, marked with "full", when the
+        client's history is not a prefix of the game, e.g. after a reset.
+        """
+        info = self.snapshot().info
+        if history_id != self.history_id or not 0 <= since_ply <= info["ply"]:
+            return dict(info, full=True)
+        
+        delta = {key: value for key, value in info.items() if key != "move_history"}
+        delta.update(full=False, since=since_ply, moves=info["move_history"][since_ply:])
+        return delta
+    
+    def to_record(self) -> tuple:
+        """Get a compact, immutable record of the game for idle storage"""
+        board = self.board.board
+        root_fen = board.root().fen() if board.move_stack else board.fen()
+        moves = " ".join(move.uci() for move in board.move_stack)
+        # The history id survives, so clients' deltas and ETags stay valid across hibernation
+        return (self.player_color, root_fen, moves, self.history_id)
+    
+    @staticmethod
+    def from_record(record: tuple) -> "GameState":
+        """Rebuild a game from a record made by to_record"""
+        player_color, root_fen, moves, history_id = record
+        game = GameState(player_color=player_color)
+        game.history_id = history_id
+        if root_fen != chess.STARTING_FEN:
+            game.board.set_board(chess.Board(root_fen))
+        for move_uci in moves.split():
+            game.board.make_move(move_uci)
+        game._check_game_over()
+        return game
     
     def reset_game(self, player_color: bool = chess.WHITE):
         """Reset the game to initial state"""
         self.board.reset()
+        self._snapshot = None
+        self.history_id = uuid.uuid4().hex[:12]
         self.player_color = player_color
         self.ai_color = not player_color
         self.game_over = False
@@ -0,0 +1,148 @@
+import threading
+import time
+import uuid
+import chess
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Iterator, Optional, Dict, Any
+from .game_state import GameState
+
+class _GameEntry:
+    """One stored game, either live or hibernated to a compact record"""
+    
+    __slots__ = ("game", "record", "lock", "last_access")
+    
+    def __init__(self, game: GameState, now: float):
+        self.game = game
+        self.record = None
+        self.lock = threading.Lock()
+        self.last_access = now
+
+class GameStore:
+    """Thread-safe store of many games keyed by game ID
+    
+    Games are kept in least-recently-used order. Games idle for longer than
+    hibernate_after are packed into a compact record of their moves, games
+    idle for longer than idle_timeout are dropped, and the least recently
+    used games are dropped once max_games is exceeded. Each game has its own
+    lock, so requests on different games never wait for each other.
+    """
+    
+    def __init__(self, max_games: int = 50000, idle_timeout: float = 3600.0,
+                 hibernate_after: float = 60.0, maintenance_interval: float = 1.0):
+        self.max_games = max_games
+        self.idle_timeout = idle_timeout
+        self.hibernate_after = hibernate_after
+        self.maintenance_interval = maintenance_interval
+        
+        self._live = OrderedDict()        # game_id -> entry, least recently used first
+        self._hibernated = OrderedDict()  # game_id -> entry, least recently used first
+        self._lock = threading.Lock()      # Guards the dictionaries and stats, never held during game logic
+        self._next_maintenance = 0.0
+        self.stats = {"created": 0, "hibernated": 0, "restored": 0, "evicted": 0}
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._live) + len(self._hibernated)
+    
+    def __contains__(self, game_id: str) -> bool:
+        with self._lock:
+            return game_id in self._live or game_id in self._hibernated
+    
+    def create_game(self, player_color: bool = chess.WHITE) -> str:
+        """Create a new game and return its ID"""
+        game_id = uuid.uuid4().hex
+        now = time.monotonic()
+        with self._lock:
+            self._live[game_id] = _GameEntry(GameState(player_color=player_color), now)
+            self.stats["created"] += 1
+            self._maintain(now, force=len(self._live) + len(self._hibernated) > self.max_games)
+        return game_id
+    
+    @contextmanager
+    def game(self, game_id: str) -> Iterator[Optional[GameState]]:
+        """Lock a game for the duration of a request, yielding None if it does not exist"""
+        entry = self._touch(game_id)
+        if entry is None:
+            yield None
+            return
+        
+        with entry.lock:
+            if entry.game is None:
+                entry.game = GameState.from_record(entry.record)
+                entry.record = None
+                # Safe under the game lock: the store lock only ever tries game locks without blocking
+                with self._lock:
+                    self.stats["restored"] += 1
+            yield entry.game
+    
+    def remove_game(self, game_id: str) -> bool:
+        """Remove a game"""
+        with self._lock:
+            return (self._live.pop(game_id, None) or self._hibernated.pop(game_id, None)) is not None
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get store counters"""
+        with self._lock:
+            return dict(self.stats, live=len(self._live), hibernated_now=len(self._hibernated))
+    
+    def _touch(self, game_id: str) -> Optional[_GameEntry]:
+        """Look up a game and mark it as most recently used"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._live.get(game_id)
+            if entry is not None:
+                self._live.move_to_end(game_id)
+            else:
+                entry = self._hibernated.pop(game_id, None)
+                if entry is not None:
+                    self._live[game_id] = entry
+            
+            if entry is not None:
+                entry.last_access = now
+            self._maintain(now)
+            return entry
+    
+    def _maintain(self, now: float, force: bool = False):
+        """Hibernate and evict idle games (store lock must be held)"""
+        if now < self._next_maintenance and not force:
+            return
+        self._next_maintenance = now + self.maintenance_interval
+        
+        # Pack idle live games into records, skipping games in use
+        busy = []
+        while self._live:
+            game_id, entry = next(iter(self._live.items()))
+            if now - entry.last_access < self.hibernate_after:
+                break
+            self._live.popitem(last=False)
+            if entry.lock.acquire(blocking=False):
+                try:
+                    # A game looked up but not yet restored is still a record
+                    if entry.game is not None:
+                        entry.record = entry.game.to_record()
+                        entry.game = None
+                finally:
+                    entry.lock.release()
+                self._hibernated[game_id] = entry
+                self.stats["hibernated"] += 1
+            else:
+                busy.append((game_id, entry))
+        for game_id, entry in busy:
+            self._live[game_id] = entry
+        
+        # Drop games that have been idle too long
+        while self._hibernated:
+            game_id, entry = next(iter(self._hibernated.items()))
+            if now - entry.last_access < self.idle_timeout:
+                break
+            self._hibernated.popitem(last=False)
+            self.stats["evicted"] += 1
+        
+        # Enforce the size limit, oldest hibernated games first
+        while len(self._live) + len(self._hibernated) > self.max_games:
+            if self._hibernated:
+                self._hibernated.popitem(last=False)
+            else:
+                self._live.popitem(last=False)
+            self.stats["evicted"] += 1
\ No newline at end of file
@@ -0,0 +1,227 @@
+import bisect
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Latency buckets in seconds, from sub-millisecond lookups to long searches
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    """Render labels as {name="value",...}"""
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for value in labels.values())
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + "}"
+
+def _format_value(value: float) -> str:
+    """Render a sample value, integers without a decimal point"""
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Timer:
+    """Observe the seconds spent in a with block, cheaper than a generator context manager"""
+    
+    __slots__ = ("metric", "start")
+    
+    def __init__(self, metric):
+        self.metric = metric
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc):
+        self.metric.observe(time.perf_counter() - self.start)
+        return False
+
+class _Metric:
+    """Base of the metric types, holding one child per label value combination"""
+    
+    kind = "untyped"
+    
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], "_Metric"] = {}
+        self._lock = threading.Lock()
+    
+    def labels(self, *values, **labels) -> "_Metric":
+        """Get the child metric of one label value combination"""
+        key = tuple(str(value) for value in values) or tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+    
+    def _new_child(self) -> "_Metric":
+        raise NotImplementedError
+    
+    def _samples(self) -> Iterable[Tuple[str, Dict[str, str], float]]:
+        """(suffix, labels, value) of this metric without its own labels"""
+        raise NotImplementedError
+    
+    def collect(self) -> List[Tuple[str, Dict[str, str], float]]:
+        """All samples, with the label values of each child"""
+        if not self.labelnames:
+            return list(self._samples())
+        samples = []
+        for key, child in sorted(self._children.items()):
+            labels = dict(zip(self.labelnames, key))
+            for suffix, extra, value in child._samples():
+                samples.append((suffix, dict(labels, **extra), value))
+        return samples
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+    
+    kind = "counter"
+    
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, help, labelnames)
+        self.value = 0.0
+    
+    def inc(self, amount: float = 1.0):
+        """Add to the count"""
+        with self._lock:
+            self.value += amount
+    
+    def _new_child(self) -> "Counter":
+        return Counter(self.name, self.help)
+    
+    def _samples(self):
+        yield "_total", {}, self.value
+
+class Gauge(_Metric):
+    """Value that can go up and down, or be read from a function at scrape time"""
+    
+    kind = "gauge"
+    
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (),
+                 function: Optional[Callable[[], float]] = None):
+        super().__init__(name, help, labelnames)
+        self.value = 0.0
+        self.function = function
+    
+    def set(self, value: float):
+        """Set the current value"""
+        self.value = value
+    
+    def inc(self, amount: float = 1.0):
+        """Raise the value"""
+        with self._lock:
+            self.value += amount
+    
+    def dec(self, amount: float = 1.0):
+        """Lower the value"""
+        self.inc(-amount)
+    
+    def _new_child(self) -> "Gauge":
+        return Gauge(self.name, self.help)
+    
+    def _samples(self):
+        yield "", {}, self.function() if self.function else self.value
+
+class Histogram(_Metric):
+    """Distribution of observed values in fixed buckets"""
+    
+    kind = "histogram"
+    
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # Per bucket, the last one is +Inf
+        self.sum = 0.0
+    
+    def observe(self, value: float):
+        """Count one value in its bucket"""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+    
+    def time(self) -> _Timer:
+        """Observe the duration of a with block"""
+        return _Timer(self)
+    
+    def _new_child(self) -> "Histogram":
+        return Histogram(self.name, self.help, buckets=self.buckets)
+    
+    def _samples(self):
+        with self._lock:
+            counts, total = list(self.counts), self.sum
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            yield "_bucket", {"le": _format_value(float(bound))}, cumulative
+        yield "_sum", {}, total
+        yield "_count", {}, cumulative
+
+class MetricsRegistry:
+    """In-process metrics rendered in the Prometheus text format
+    
+    Metrics are cheap to update: one lock and, for histograms, a bisect over
+    the buckets. Values owned by other components, such as cache counters,
+    are read by collectors only when the metrics are scraped.
+    """
+    
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], Iterable[_Metric]]] = []
+        self._lock = threading.Lock()
+    
+    def _register(self, metric: _Metric) -> _Metric:
+        """Add a metric, or return the one already registered under its name"""
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric):
+                    raise ValueError(f"Metric {metric.name} is already registered as a {existing.kind}")
+                return existing
+            self._metrics[metric.name] = metric
+        return metric
+    
+    def counter(self, name: str, help: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        """Get or create a counter"""
+        return self._register(Counter(name, help, labelnames))
+    
+    def gauge(self, name: str, help: str, labelnames: Tuple[str, ...] = (),
+              function: Optional[Callable[[], float]] = None) -> Gauge:
+        """Get or create a gauge, optionally read from a function"""
+        return self._register(Gauge(name, help, labelnames, function))
+    
+    def histogram(self, name: str, help: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        """Get or create a histogram"""
+        return self._register(Histogram(name, help, labelnames, buckets))
+    
+    def add_collector(self, collector: Callable[[], Iterable[_Metric]]):
+        """Add a function returning metrics built at scrape time"""
+        with self._lock:
+            self._collectors.append(collector)
+    
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+        for collector in collectors:
+            metrics.extend(collector())
+        
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for suffix, labels, value in metric.collect():
+                lines.append(f"{metric.name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+# Shared by the game, the model code and the web server
+REGISTRY = MetricsRegistry()
\ No newline at end of file
@@ -0,0 +1,142 @@
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, Optional
+from .board import ChessBoard
+from .game_state import GameState
+from .game_store import GameStore
+
+class _AIMoveJob:
+    """The pending or finished AI reply of one game"""
+    
+    __slots__ = ("job_id", "fen", "status", "result", "done")
+    
+    def __init__(self, job_id: int, fen: str):
+        self.job_id = job_id
+        self.fen = fen
+        self.status = "pending"
+        self.result: Dict[str, Any] = {}
+        self.done = threading.Event()
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self.result, job=self.job_id, status=self.status)
+
+class AIMoveWorker:
+    """Compute AI replies on a thread pool and hand them to waiting clients
+    
+    Scheduling only copies the board, so the player's request returns at once.
+    The move is chosen on the copy without holding the game lock, then played
+    if the job is still the latest one of the game and the position has not
+    changed in the meantime, e.g. by a reset.
+    """
+    
+    def __init__(self, store: GameStore, choose_move: Callable[[ChessBoard], Optional[str]],
+                 max_workers: int = 4, max_jobs: int = 50000):
+        self.store = store
+        self.choose_move = choose_move
+        self.max_jobs = max_jobs
+        
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ai-move")
+        self._jobs = OrderedDict()  # game_id -> latest job, least recently scheduled first
+        self._lock = threading.Lock()
+        self._job_ids = itertools.count(1)
+        self.stats = {"scheduled": 0, "completed": 0, "stale": 0, "failed": 0}
+    
+    def schedule(self, game_id: str, game: GameState) -> Optional[int]:
+        """Queue the AI reply of a game and return the job ID, called with the game lock held
+        
+        If it is not the AI's turn, any pending job of the game is dropped.
+        """
+        with self._lock:
+            stale = self._jobs.pop(game_id, None)
+            if game.game_over or not game.is_ai_turn():
+                job = None
+            else:
+                job = _AIMoveJob(next(self._job_ids), game.board.get_fen())
+                self._jobs[game_id] = job
+                while len(self._jobs) > self.max_jobs:
+                    self._jobs.popitem(last=False)[1].done.set()
+                self.stats["scheduled"] += 1
+        
+        if stale is not None and stale.status == "pending":
+            stale.done.set()  # Release its waiters, they will find a newer job or none
+        if job is None:
+            return None
+        
+        board = ChessBoard()
+        board.set_board(game.board.board.copy())
+        self._pool.submit(self._run, game_id, job, board)
+        return job.job_id
+    
+    def wait(self, game_id: str, job_id: Optional[int] = None, timeout: float = 25.0) -> Optional[Dict[str, Any]]:
+        """Wait for the AI reply of a game
+        
+        Returns the job with status "pending" if it is not done within the
+        timeout, "stale" if job_id was replaced by a newer job, or None if
+        the game has no AI job.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                job = self._jobs.get(game_id)
+            if job is None:
+                return None
+            if job_id is not None and job.job_id != job_id:
+                return {"job": job_id, "status": "stale", "latest_job": job.job_id}
+            
+            remaining = deadline - time.monotonic()
+            if job.done.is_set() or remaining <= 0:
+                if job.status == "pending" and job.done.is_set():
+                    continue  # Replaced while waiting, look up the newer job
+                return job.to_dict()
+            job.done.wait(remaining)
+    
+    def get(self, game_id: str) -> Optional[Dict[str, Any]]:
+        """Get the latest AI job of a game without waiting"""
+        with self._lock:
+            job = self._jobs.get(game_id)
+        return job.to_dict() if job is not None else None
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Job counters and the number of tracked games"""
+        with self._lock:
+            pending = sum(1 for job in self._jobs.values() if job.status == "pending")
+            return dict(self.stats, tracked=len(self._jobs), pending=pending)
+    
+    def shutdown(self, wait: bool = True):
+        """Stop the workers"""
+        self._pool.shutdown(wait=wait)
+    
+    def _run(self, game_id: str, job: _AIMoveJob, board: ChessBoard):
+        """Choose a move on the copied board and play it on the stored game"""
+        try:
+            move = self.choose_move(board)
+            error = None if move else "No move found"
+        except Exception as e:
+            move, error = None, str(e)
+        
+        with self.store.game(game_id) as game:
+            with self._lock:
+                current = self._jobs.get(game_id) is job
+            
+            if not current or game is None or game.board.get_fen() != job.fen:
+                status, result = "stale", {}
+            elif error:
+                status, result = "failed", {"error": error}
+            else:
+                ai_result = game.make_ai_move(move)
+                status = "done" if ai_result["success"] else "failed"
+                result = {
+                    "ai_move": move,
+                    "ai_result": ai_result,
+                    "game_over": game.game_over,
+                    "result": game.game_result
+                }
+        
+        with self._lock:
+            job.result = result
+            job.status = status
+            self.stats["completed" if status == "done" else status] += 1
+        job.done.set()
\ No newline at end of file
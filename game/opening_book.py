@@ -0,0 +1,211 @@
+import mmap
+import os
+import random
+import struct
+import chess
+import chess.pgn
+import chess.polyglot
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+from .board import ChessBoard
+
+DEFAULT_BOOK_PATH = "models/opening_book.bin"
+
+# Polyglot entry: key, move, weight, learn (big-endian, sorted by key)
+ENTRY_STRUCT = struct.Struct(">QHHI")
+KEY_STRUCT = struct.Struct(">Q")
+
+def polyglot_move(board: chess.Board, move: chess.Move) -> int:
+    """Encode a move in Polyglot format, castling as king takes rook"""
+    to_square = move.to_square
+    if board.is_castling(move):
+        rook_file = 7 if board.is_kingside_castling(move) else 0
+        to_square = chess.square(rook_file, chess.square_rank(move.from_square))
+    promotion = move.promotion - 1 if move.promotion else 0
+    return to_square | (move.from_square << 6) | (promotion << 12)
+
+def position_ply(board: chess.Board) -> int:
+    """Number of plies played from the standard starting position"""
+    return (board.fullmove_number - 1) * 2 + (board.turn == chess.BLACK)
+
+class OpeningBookBuilder:
+    """Count moves played in opening positions and write them as a Polyglot book"""
+    
+    def __init__(self, max_ply: int = 24):
+        self.max_ply = max_ply
+        self.counts: Dict[int, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        self.positions = 0
+    
+    def add_move(self, board: chess.Board, move: chess.Move, weight: int = 1):
+        """Count one move played in a position"""
+        if position_ply(board) >= self.max_ply or not board.is_legal(move):
+            return
+        self.counts[chess.polyglot.zobrist_hash(board)][polyglot_move(board, move)] += weight
+        self.positions += 1
+    
+    def add_records(self, records: Iterable[Dict]) -> int:
+        """Add dataset records with "fen" and "move" fields and return how many were read"""
+        count = 0
+        for record in records:
+            count += 1
+            board = chess.Board(record["fen"])
+            if position_ply(board) < self.max_ply:
+                self.add_move(board, chess.Move.from_uci(record["move"]))
+        return count
+    
+    def add_game(self, moves: Iterable[chess.Move], board: chess.Board = None, weight: int = 1):
+        """Add the opening moves of one game"""
+        board = board.copy() if board else chess.Board()
+        for move in moves:
+            if position_ply(board) >= self.max_ply:
+                break
+            self.add_move(board, move, weight)
+            board.push(move)
+    
+    def add_pgn(self, path: str, min_elo: int = 0) -> int:
+        """Add the games of a PGN file, optionally only games between strong players"""
+        games = 0
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            while True:
+                game = chess.pgn.read_game(f)
+                if game is None:
+                    break
+                if min_elo:
+                    try:
+                        elos = [int(game.headers.get(tag, 0)) for tag in ("WhiteElo", "BlackElo")]
+                    except ValueError:
+                        continue
+                    if min(elos) < min_elo:
+                        continue
+                self.add_game(game.mainline_moves(), game.board())
+                games += 1
+        return games
+    
+    def write(self, path: str = DEFAULT_BOOK_PATH, min_count: int = 1) -> int:
+        """Write the sorted book file and return the number of entries"""
+        entries: List[Tuple[int, int, int]] = []
+        for key, moves in self.counts.items():
+            top = max(moves.values())
+            for move, count in moves.items():
+                if count < min_count:
+                    continue
+                # Scale counts into the 16-bit weight field, keeping every move playable
+                weight = max(1, count * 0xFFFF // top) if top > 0xFFFF else count
+                entries.append((key, weight, move))
+        
+        # Polyglot readers binary search by key and expect the best move first
+        entries.sort(key=lambda entry: (entry[0], -entry[1], entry[2]))
+        
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            for key, weight, move in entries:
+                f.write(ENTRY_STRUCT.pack(key, move, weight, 0))
+        os.replace(tmp_path, path)
+        return len(entries)
+
+class OpeningBook:
+    """Read-only Polyglot opening book
+    
+    The file is memory-mapped and searched by binary search, so lookups take
+    microseconds and all processes serving games share one copy of it
+    through the page cache.
+    """
+    
+    def __init__(self, path: str = DEFAULT_BOOK_PATH, max_ply: Optional[int] = None):
+        self.path = path
+        self.max_ply = max_ply
+        self.data = None
+        self.size = 0
+        self.stats = {"hits": 0, "misses": 0}
+        
+        if os.path.isfile(path) and os.path.getsize(path) >= ENTRY_STRUCT.size:
+            with open(path, 'rb') as f:
+                self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.size = len(self.data) // ENTRY_STRUCT.size
+    
+    def __bool__(self) -> bool:
+        return self.data is not None
+    
+    def __len__(self) -> int:
+        return self.size
+    
+    def _find(self, key: int) -> List[Tuple[int, int]]:
+        """Binary search the (move, weight) entries of a position key"""
+        entry_size = ENTRY_STRUCT.size
+        lo, hi = 0, self.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if KEY_STRUCT.unpack_from(self.data, mid * entry_size)[0] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        
+        entries = []
+        while lo < self.size:
+            entry_key, move, weight, _ = ENTRY_STRUCT.unpack_from(self.data, lo * entry_size)
+            if entry_key != key:
+                break
+            entries.append((move, weight))
+            lo += 1
+        return entries
+    
+    @staticmethod
+    def _decode_move(board: chess.Board, raw: int) -> chess.Move:
+        """Decode a Polyglot move, turning king-takes-rook back into castling"""
+        from_square = (raw >> 6) & 0x3F
+        to_square = raw & 0x3F
+        promotion = (raw >> 12) & 0x7
+        
+        if board.piece_type_at(from_square) == chess.KING and from_square in (chess.E1, chess.E8):
+            if to_square == from_square + 3:
+                to_square = from_square + 2
+            elif to_square == from_square - 4:
+                to_square = from_square - 2
+        return chess.Move(from_square, to_square, promotion + 1 if promotion else None)
+    
+    def get_entries(self, board: Union[chess.Board, ChessBoard]) -> List[Tuple[str, int]]:
+        """Get all book moves of a position with their weights"""
+        key, board = self._key(board)
+        if self.data is None:
+            return []
+        moves = [(self._decode_move(board, raw), weight) for raw, weight in self._find(key)]
+        return [(move.uci(), weight) for move, weight in moves if board.is_legal(move)]
+    
+    def get_move(self, board: Union[chess.Board, ChessBoard], rng: random.Random = None) -> Optional[str]:
+        """Pick a book move with probability proportional to its weight, or None"""
+        key, board = self._key(board)
+        if self.data is None or (self.max_ply is not None and position_ply(board) >= self.max_ply):
+            return None
+        
+        entries = self._find(key)
+        total = sum(weight for _, weight in entries)
+        if total:
+            choice = (rng or random).randrange(total)
+            for raw, weight in entries:
+                choice -= weight
+                if choice < 0:
+                    break
+            
+            # Only the chosen move is checked, which also guards against hash collisions
+            move = self._decode_move(board, raw)
+            if board.is_legal(move):
+                self.stats["hits"] += 1
+                return move.uci()
+        
+        self.stats["misses"] += 1
+        return None
+    
+    @staticmethod
+    def _key(board: Union[chess.Board, ChessBoard]) -> Tuple[int, chess.Board]:
+        """Get the position key, reusing the incremental hash of a ChessBoard"""
+        if isinstance(board, ChessBoard):
+            return board.zobrist_hash, board.board
+        return chess.polyglot.zobrist_hash(board), board
+    
+    def close(self):
+        """Unmap the book file"""
+        if self.data is not None:
+            self.data.close()
+            self.data = None
+            self.size = 0
\ No newline at end of file
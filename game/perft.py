@@ -0,0 +1,161 @@
+import json
+import os
+import platform
+import time
+import chess
+from typing import Dict, List, Optional, Any
+from .board import ChessBoard
+from .rules import ChessRules
+
+DEFAULT_BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "perft_baseline.json")
+
+# Standard perft positions with their known node counts by depth
+PERFT_POSITIONS = [
+    ("start", chess.STARTING_FEN,
+     {1: 20, 2: 400, 3: 8902, 4: 197281}),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+     {1: 48, 2: 2039, 3: 97862}),
+    ("endgame", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+     {1: 14, 2: 191, 3: 2812, 4: 43238}),
+    ("promotions", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+     {1: 6, 2: 264, 3: 9467, 4: 422333}),
+    ("discovered", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+     {1: 44, 2: 1486, 3: 62379}),
+    ("middlegame", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+     {1: 46, 2: 2079, 3: 89890}),
+]
+
+# How moves are made: raw python-chess, the incremental board used by the
+# search, and the UCI wrappers used by the game and the web server
+PERFT_MODES = ("raw", "incremental", "wrapper")
+
+def perft_raw(board: chess.Board, depth: int) -> int:
+    """Count leaf nodes with python-chess push and pop"""
+    if depth == 0:
+        return 1
+    nodes = 0
+    for move in board.legal_moves:
+        board.push(move)
+        nodes += perft_raw(board, depth - 1)
+        board.pop()
+    return nodes
+
+def perft_incremental(board: ChessBoard, depth: int) -> int:
+    """Count leaf nodes with the incremental push_move and pop_move"""
+    if depth == 0:
+        return 1
+    nodes = 0
+    for move in board.board.legal_moves:
+        board.push_move(move)
+        nodes += perft_incremental(board, depth - 1)
+        board.pop_move()
+    return nodes
+
+def perft_wrapper(board: ChessBoard, depth: int) -> int:
+    """Count leaf nodes through UCI strings, rule checks, make_move and undo_move"""
+    if depth == 0:
+        return 1
+    nodes = 0
+    for move_uci in board.get_legal_moves():
+        if ChessRules.is_legal_move(board.board, move_uci) and board.make_move(move_uci):
+            nodes += perft_wrapper(board, depth - 1)
+            board.undo_move()
+    return nodes
+
+def run_perft(fen: str, depth: int, mode: str = "raw") -> Dict[str, Any]:
+    """Run perft on a position and return the node count and speed"""
+    start = time.perf_counter()
+    if mode == "raw":
+        nodes = perft_raw(chess.Board(fen), depth)
+    elif mode == "incremental":
+        nodes = perft_incremental(ChessBoard(fen), depth)
+    elif mode == "wrapper":
+        nodes = perft_wrapper(ChessBoard(fen), depth)
+    else:
+        raise ValueError(f"Unknown perft mode {mode!r}, expected one of {PERFT_MODES}")
+    seconds = time.perf_counter() - start
+    return {"nodes": nodes, "seconds": seconds, "nps": nodes / seconds if seconds > 0 else 0.0}
+
+def run_suite(max_nodes: int = 100000, names: Optional[List[str]] = None,
+              modes=PERFT_MODES, repeat: int = 1) -> List[Dict[str, Any]]:
+    """Run every position at the deepest known depth within max_nodes
+    
+    Each result has the node count checked against the known value and the
+    best speed of every mode over repeat runs, with the slowdown of each mode
+    relative to raw python-chess so the overhead of the wrappers is visible.
+    """
+    results = []
+    for name, fen, expected in PERFT_POSITIONS:
+        if names and name not in names:
+            continue
+        depth = max((d for d, nodes in expected.items() if nodes <= max_nodes), default=1)
+        result = {"name": name, "depth": depth, "expected": expected[depth], "ok": True}
+        
+        for mode in modes:
+            run = max((run_perft(fen, depth, mode) for _ in range(repeat)), key=lambda run: run["nps"])
+            result["ok"] = result["ok"] and run["nodes"] == expected[depth]
+            result[f"{mode}_nodes"] = run["nodes"]
+            result[f"{mode}_nps"] = run["nps"]
+        
+        if "raw" in modes:
+            for mode in modes:
+                if mode != "raw" and result[f"{mode}_nps"]:
+                    result[f"{mode}_overhead"] = result["raw_nps"] / result[f"{mode}_nps"]
+        results.append(result)
+    return results
+
+def baseline_key(result: Dict[str, Any]) -> str:
+    """Baseline entries are kept per position and depth"""
+    return f"{result['name']}/{result['depth']}"
+
+def save_baseline(results: List[Dict[str, Any]], path: str = DEFAULT_BASELINE_PATH):
+    """Store suite results to compare later runs against, keeping entries of other depths"""
+    stored = (load_baseline(path) or {}).get("results", {})
+    for result in results:
+        stored[baseline_key(result)] = {
+            key: round(value, 3) if isinstance(value, float) else value
+            for key, value in result.items() if key not in ("name", "depth")
+        }
+    
+    baseline = {
+        "machine": f"{platform.machine()} {platform.python_implementation()} {platform.python_version()}",
+        "chess": chess.__version__,
+        "results": dict(sorted(stored.items()))
+    }
+    
+    with open(path, 'w') as f:
+        json.dump(baseline, f, indent=2)
+
+def load_baseline(path: str = DEFAULT_BASELINE_PATH) -> Optional[Dict[str, Any]]:
+    """Load stored suite results, or None if there are none"""
+    if not os.path.isfile(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def compare_to_baseline(results: List[Dict[str, Any]], baseline: Dict[str, Any],
+                        tolerance: float = 0.5, absolute: bool = False) -> List[str]:
+    """List the regressions of a run against a baseline
+    
+    Node counts must match exactly. The overhead of each mode relative to raw
+    python-chess may grow by at most the tolerance; it is measured on the
+    same machine in the same run, so it holds across machines. Absolute
+    speeds are only compared with absolute=True, on the baseline's machine.
+    """
+    regressions = []
+    stored = baseline.get("results", {})
+    for result in results:
+        reference = stored.get(baseline_key(result))
+        if not result["ok"]:
+            regressions.append(f"{result['name']}: wrong node count at depth {result['depth']}")
+        if reference is None:
+            continue
+        
+        for key, value in result.items():
+            if key.endswith("_overhead") and key in reference:
+                if value > reference[key] * (1 + tolerance):
+                    regressions.append(f"{result['name']}: {key} {value:.2f}x, baseline {reference[key]:.2f}x")
+            elif absolute and key.endswith("_nps") and key in reference:
+                if value < reference[key] * (1 - tolerance):
+                    regressions.append(f"{result['name']}: {key} {value:,.0f}, baseline {reference[key]:,.0f}")
+    return regressions
\ No newline at end of file
@@ -22,6 +22,70 @@ class ChessPiece:
         chess.KING: '♚'
     }
     
+    # Piece-square tables in centipawns from White's point of view, rank 8 first
+    PIECE_SQUARE_TABLES = {
+        chess.PAWN: [
+             0,   0,   0,   0,   0,   0,   0,   0,
+            50,  50,  50,  50,  50,  50,  50,  50,
+            10,  10,  20,  30,  30,  20,  10,  10,
+             5,   5,  10,  25,  25,  10,   5,   5,
+             0,   0,   0,  20,  20,   0,   0,   0,
+             5,  -5, -10,   0,   0, -10,  -5,   5,
+             5,  10,  10, -20, -20,  10,  10,   5,
+             0,   0,   0,   0,   0,   0,   0,   0
+        ],
+        chess.KNIGHT: [
+            -50, -40, -30, -30, -30, -30, -40, -50,
+            -40, -20,   0,   0,   0,   0, -20, -40,
+            -30,   0,  10,  15,  15,  10,   0, -30,
+            -30,   5,  15,  20,  20,  15,   5, -30,
+            -30,   0,  15,  20,  20,  15,   0, -30,
+            -30,   5,  10,  15,  15,  10,   5, -30,
+            -40, -20,   0,   5,   5,   0, -20, -40,
+            -50, -40, -30, -30, -30, -30, -40, -50
+        ],
+        chess.BISHOP: [
+            -20, -10, -10, -10, -10, -10, -10, -20,
+            -10,   0,   0,   0,   0,   0,   0, -10,
+            -10,   0,   5,  10,  10,   5,   0, -10,
+            -10,   5,   5,  10,  10,   5,   5, -10,
+            -10,   0,  10,  10,  10,  10,   0, -10,
+            -10,  10,  10,  10,  10,  10,  10, -10,
+            -10,   5,   0,   0,   0,   0,   5, -10,
+            -20, -10, -10, -10, -10, -10, -10, -20
+        ],
+        chess.ROOK: [
+             0,   0,   0,   0,   0,   0,   0,   0,
+             5,  10,  10,  10,  10,  10,  10,   5,
+            -5,   0,   0,   0,   0,   0,   0,  -5,
+            -5,   0,   0,   0,   0,   0,   0,  -5,
+            -5,   0,   0,   0,   0,   0,   0,  -5,
+            -5,   0,   0,   0,   0,   0,   0,  -5,
+            -5,   0,   0,   0,   0,   0,   0,  -5,
+             0,   0,   0,   5,   5,   0,   0,   0
+        ],
+        chess.QUEEN: [
+            -20, -10, -10,  -5,  -5, -10, -10, -20,
+            -10,   0,   0,   0,   0,   0,   0, -10,
+            -10,   0,   5,   5,   5,   5,   0, -10,
+             -5,   0,   5,   5,   5,   5,   0,  -5,
+              0,   0,   5,   5,   5,   5,   0,  -5,
+            -10,   5,   5,   5,   5,   5,   0, -10,
+            -10,   0,   5,   0,   0,   0,   0, -10,
+            -20, -10, -10,  -5,  -5, -10, -10, -20
+        ],
+        chess.KING: [
+            -30, -40, -40, -50, -50, -40, -40, -30,
+            -30, -40, -40, -50, -50, -40, -40, -30,
+            -30, -40, -40, -50, -50, -40, -40, -30,
+            -30, -40, -40, -50, -50, -40, -40, -30,
+            -20, -30, -30, -40, -40, -30, -30, -20,
+            -10, -20, -20, -20, -20, -20, -20, -10,
+             20,  20,   0,   0,   0,   0,  20,  20,
+             20,  30,  10,   0,   0,  10,  30,  20
+        ]
+    }
+    
     @staticmethod
     def get_piece_value(piece_type: int) -> int:
         """Get the value of a piece type"""
@@ -32,6 +96,13 @@ class ChessPiece:
         """Get the Unicode symbol for a piece type"""
         return ChessPiece.PIECE_SYMBOLS.get(piece_type, '?')
     
+    @staticmethod
+    def get_square_value(piece_type: int, color: bool, square: int) -> int:
+        """Get the piece-square table bonus of a piece, positive for both colors"""
+        # Tables are written rank 8 first, so White's squares are flipped vertically
+        index = square ^ 56 if color == chess.WHITE else square
+        return ChessPiece.PIECE_SQUARE_TABLES[piece_type][index]
+    
     @staticmethod
     def get_all_piece_positions(board: chess.Board, color: bool) -> Dict[int, List[int]]:
         """Get positions of all pieces for a given color"""
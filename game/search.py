@@ -0,0 +1,320 @@
+import chess
+import time
+from array import array
+from typing import Optional, Dict, Any, List, Union
+from .board import ChessBoard
+from .pieces import ChessPiece
+from .endgame import EndgameTablebase
+
+class SearchTimeout(Exception):
+    """Raised inside the search when the time budget is used up"""
+
+class TranspositionTable:
+    """Fixed-size transposition table keyed by Zobrist hash
+    
+    Entries live in typed arrays, 20 bytes a slot instead of a list pointer
+    per field. The default size holds every node of a few seconds of search.
+    """
+    
+    EXACT = 0
+    LOWER = 1
+    UPPER = 2
+    
+    def __init__(self, size: int = 1 << 18):
+        self.size = size
+        self.keys = array('Q', bytes(8 * size))
+        self.depths = array('b', [-1]) * size
+        self.scores = array('i', bytes(4 * size))
+        self.flags = array('B', bytes(size))
+        self.moves = array('H', bytes(2 * size))  # Encoded by encode_move, 0 for none
+        self.ages = array('I', bytes(4 * size))
+        self.age = 0
+    
+    @staticmethod
+    def encode_move(move: Optional[chess.Move]) -> int:
+        """Pack a move into 16 bits, 0 for no move"""
+        if move is None:
+            return 0
+        return 1 + move.from_square * 64 + move.to_square + (move.promotion or 0) * 4096
+    
+    def move(self, slot: int) -> Optional[chess.Move]:
+        """Get the best move stored in a slot"""
+        code = self.moves[slot] - 1
+        if code < 0:
+            return None
+        return chess.Move(code // 64 % 64, code % 64, code // 4096 or None)
+    
+    def probe(self, key: int) -> Optional[int]:
+        """Get the slot index holding a key, or None"""
+        slot = key % self.size
+        return slot if self.keys[slot] == key and self.depths[slot] >= 0 else None
+    
+    def store(self, key: int, depth: int, score: int, flag: int, move: Optional[chess.Move]):
+        """Store an entry, preferring deeper and more recent results"""
+        slot = key % self.size
+        # Replace entries from older searches, and same-search entries of lower or equal depth
+        if self.ages[slot] != self.age or depth >= self.depths[slot] or self.keys[slot] == key:
+            if self.keys[slot] != key or move is not None:
+                self.moves[slot] = self.encode_move(move)
+            self.keys[slot] = key
+            self.depths[slot] = depth
+            self.scores[slot] = score
+            self.flags[slot] = flag
+            self.ages[slot] = self.age
+    
+    def new_search(self):
+        """Mark existing entries as belonging to an older search"""
+        self.age += 1
+    
+    def clear(self):
+        """Remove all entries"""
+        self.__init__(self.size)
+
+class SearchEngine:
+    """Negamax alpha-beta search with iterative deepening"""
+    
+    MATE_SCORE = 100000
+    INFINITY = 1000000
+    MAX_PLY = 128
+    
+    # Centipawn values derived from the material values
+    PIECE_CENTIPAWNS = {piece_type: value * 100 for piece_type, value in ChessPiece.PIECE_VALUES.items()}
+    
+    def __init__(self, tt_size: int = 1 << 18, tablebase: Optional[EndgameTablebase] = None):
+        self.tt = TranspositionTable(tt_size)
+        self.tablebase = tablebase
+        self.killers = [[None, None] for _ in range(self.MAX_PLY)]
+        self.history = [[0] * 64 for _ in range(64)]
+        self.nodes = 0
+        self.deadline = None
+    
+    def evaluate(self, position: ChessBoard) -> int:
+        """Evaluate material and piece-square scores from the side to move's point of view"""
+        score = position.evaluate()
+        return score if position.board.turn == chess.WHITE else -score
+    
+    def search(self, board: Union[chess.Board, ChessBoard], max_depth: int = 4,
+               time_limit: float = None) -> Dict[str, Any]:
+        """Search a position and return the best move with search statistics"""
+        if isinstance(board, ChessBoard):
+            board = board.board
+        
+        # Search on a copy that keeps material, piece-square scores and hash up to date
+        position = ChessBoard()
+        position.set_board(board.copy())
+        board = position.board
+        
+        self.tt.new_search()
+        self.killers = [[None, None] for _ in range(self.MAX_PLY)]
+        self.history = [[0] * 64 for _ in range(64)]
+        self.nodes = 0
+        self.deadline = time.perf_counter() + time_limit if time_limit else None
+        
+        start = time.perf_counter()
+        best_move = None
+        best_score = 0
+        completed_depth = 0
+        
+        legal_moves = list(board.legal_moves)
+        result = self.tablebase.probe(board) if self.tablebase and legal_moves else None
+        if result is not None:
+            # Solved endgame, no need to search
+            best_move = chess.Move.from_uci(self.tablebase.best_move(board))
+            best_score = self._tablebase_score(result, 0)
+        
+        elif len(legal_moves) == 1:
+            # Nothing to think about
+            best_move = legal_moves[0]
+        
+        elif legal_moves:
+            for depth in range(1, max_depth + 1):
+                try:
+                    score = self._negamax(position, depth, -self.INFINITY, self.INFINITY, 0)
+                except SearchTimeout:
+                    break
+                
+                entry = self.tt.probe(position.zobrist_hash)
+                if entry is not None and self.tt.moves[entry]:
+                    best_move = self.tt.move(entry)
+                best_score = score
+                completed_depth = depth
+                
+                # No point searching deeper once a forced mate is found
+                if abs(score) >= self.MATE_SCORE - self.MAX_PLY:
+                    break
+            
+            if best_move is None:
+                best_move = legal_moves[0]
+        
+        elapsed = time.perf_counter() - start
+        return {
+            "move": best_move.uci() if best_move else None,
+            "score": best_score,
+            "depth": completed_depth,
+            "nodes": self.nodes,
+            "time": elapsed,
+            "nps": int(self.nodes / elapsed) if elapsed > 0 else 0
+        }
+    
+    def _check_time(self):
+        """Abort the search when the deadline has passed"""
+        if self.deadline and time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+    
+    def _negamax(self, position: ChessBoard, depth: int, alpha: int, beta: int, ply: int) -> int:
+        """Alpha-beta search returning a score relative to the side to move"""
+        self.nodes += 1
+        if self.nodes & 1023 == 0:
+            self._check_time()
+        
+        board = position.board
+        if ply > 0:
+            # A repetition needs at least four reversible plies
+            if board.halfmove_clock >= 100 or (board.halfmove_clock >= 4 and board.is_repetition(2)):
+                return 0
+        
+        if self.tablebase and ply > 0 and chess.popcount(board.occupied) <= 3:
+            result = self.tablebase.probe(board)
+            if result is not None:
+                return self._tablebase_score(result, ply)
+        
+        if depth <= 0:
+            return self._quiescence(position, alpha, beta, ply)
+        
+        alpha_orig = alpha
+        key = position.zobrist_hash
+        tt_move = None
+        entry = self.tt.probe(key)
+        if entry is not None:
+            tt_move = self.tt.move(entry)
+            if ply > 0 and self.tt.depths[entry] >= depth:
+                score = self._score_from_tt(self.tt.scores[entry], ply)
+                flag = self.tt.flags[entry]
+                if flag == TranspositionTable.EXACT:
+                    return score
+                if flag == TranspositionTable.LOWER and score >= beta:
+                    return score
+                if flag == TranspositionTable.UPPER and score <= alpha:
+                    return score
+        
+        moves = list(board.legal_moves)
+        if not moves:
+            return -self.MATE_SCORE + ply if board.is_check() else 0
+        
+        best_score = -self.INFINITY
+        best_move = None
+        for move in self._order_moves(board, moves, tt_move, ply):
+            position.push_move(move)
+            score = -self._negamax(position, depth - 1, -beta, -alpha, ply + 1)
+            position.pop_move()
+            
+            if score > best_score:
+                best_score = score
+                best_move = move
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                if not board.is_capture(move) and not move.promotion:
+                    self._record_cutoff(move, depth, ply)
+                break
+        
+        if best_score <= alpha_orig:
+            flag = TranspositionTable.UPPER
+        elif best_score >= beta:
+            flag = TranspositionTable.LOWER
+        else:
+            flag = TranspositionTable.EXACT
+        self.tt.store(key, depth, self._score_to_tt(best_score, ply), flag, best_move)
+        
+        return best_score
+    
+    def _quiescence(self, position: ChessBoard, alpha: int, beta: int, ply: int) -> int:
+        """Search captures only until the position is quiet"""
+        self.nodes += 1
+        if self.nodes & 1023 == 0:
+            self._check_time()
+        
+        board = position.board
+        stand_pat = self.evaluate(position)
+        if stand_pat >= beta or ply >= self.MAX_PLY - 1:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+        
+        captures = list(board.generate_legal_captures())
+        captures.sort(key=lambda move: self._mvv_lva(board, move), reverse=True)
+        for move in captures:
+            position.push_move(move)
+            score = -self._quiescence(position, -beta, -alpha, ply + 1)
+            position.pop_move()
+            
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+        
+        return alpha
+    
+    def _mvv_lva(self, board: chess.Board, move: chess.Move) -> int:
+        """Most valuable victim, least valuable attacker score of a capture"""
+        victim = chess.PAWN if board.is_en_passant(move) else board.piece_type_at(move.to_square)
+        attacker = board.piece_type_at(move.from_square)
+        return self.PIECE_CENTIPAWNS.get(victim, 0) * 10 - self.PIECE_CENTIPAWNS.get(attacker, 0) // 100
+    
+    def _order_moves(self, board: chess.Board, moves: List[chess.Move],
+                     tt_move: Optional[chess.Move], ply: int) -> List[chess.Move]:
+        """Order moves: TT move, captures by MVV-LVA, killers, then history"""
+        killers = self.killers[ply] if ply < self.MAX_PLY else [None, None]
+        scored = []
+        for move in moves:
+            if move == tt_move:
+                score = 10000000
+            elif board.is_capture(move):
+                score = 1000000 + self._mvv_lva(board, move)
+            elif move.promotion:
+                score = 900000 + self.PIECE_CENTIPAWNS[move.promotion]
+            elif move == killers[0]:
+                score = 800000
+            elif move == killers[1]:
+                score = 700000
+            else:
+                score = self.history[move.from_square][move.to_square]
+            scored.append((score, move))
+        
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [move for _, move in scored]
+    
+    def _record_cutoff(self, move: chess.Move, depth: int, ply: int):
+        """Update killer and history tables after a quiet move caused a cutoff"""
+        if ply < self.MAX_PLY and self.killers[ply][0] != move:
+            self.killers[ply][1] = self.killers[ply][0]
+            self.killers[ply][0] = move
+        
+        self.history[move.from_square][move.to_square] += depth * depth
+        if self.history[move.from_square][move.to_square] > 600000:
+            # Keep history scores below the killer scores
+            self.history = [[value // 2 for value in row] for row in self.history]
+    
+    def _tablebase_score(self, result: Dict[str, Any], ply: int) -> int:
+        """Convert a tablebase result to a search score, mates counted from the root"""
+        if result["wdl"] > 0:
+            return self.MATE_SCORE - ply - result["dtm"]
+        if result["wdl"] < 0:
+            return -self.MATE_SCORE + ply + result["dtm"]
+        return 0
+    
+    def _score_to_tt(self, score: int, ply: int) -> int:
+        """Store mate scores relative to the node instead of the root"""
+        if score >= self.MATE_SCORE - self.MAX_PLY:
+            return score + ply
+        if score <= -self.MATE_SCORE + self.MAX_PLY:
+            return score - ply
+        return score
+    
+    def _score_from_tt(self, score: int, ply: int) -> int:
+        """Convert a stored mate score back to the current ply"""
+        if score >= self.MATE_SCORE - self.MAX_PLY:
+            return score - ply
+        if score <= -self.MATE_SCORE + self.MAX_PLY:
+            return score + ply
+        return score
\ No newline at end of file
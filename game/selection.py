@@ -0,0 +1,64 @@
+import chess
+from typing import Dict, Optional
+from .game_state import GameState
+
+class MoveSelection:
+    """Square selection and move targets of a game, independent of the GUI toolkit
+    
+    Legal moves are grouped by from square once per position. The position
+    key also tells whether an AI move chosen on a worker thread still fits
+    the game, which a reset or another move may have changed meanwhile.
+    """
+    
+    def __init__(self, game: GameState):
+        self.game = game
+        self.selected_square = None
+        self.move_targets = {}  # from square -> {to square: move UCI} of the current position
+        self.targets_position = None
+    
+    def position_key(self) -> tuple:
+        """Identify the current position of the game"""
+        return self.game.history_id, len(self.game.board.board.move_stack)
+    
+    def get_move_targets(self) -> Dict[int, Dict[int, str]]:
+        """Legal moves of the current position grouped by from square, computed once per position"""
+        position = self.position_key()
+        if position != self.targets_position:
+            self.move_targets = {}
+            for move in self.game.board.board.legal_moves:
+                if move.promotion in (None, chess.QUEEN):  # Pawns promote to a queen
+                    self.move_targets.setdefault(move.from_square, {})[move.to_square] = move.uci()
+            self.targets_position = position
+        return self.move_targets
+    
+    def selected_targets(self) -> Dict[int, str]:
+        """Squares the selected piece can move to"""
+        return self.get_move_targets().get(self.selected_square, {})
+    
+    def select_square(self, square: int):
+        """Select one of the player's pieces, or clear the selection"""
+        piece = self.game.board.board.piece_at(square)
+        if piece and piece.color == self.game.player_color:
+            self.selected_square = square
+        else:
+            self.selected_square = None
+    
+    def click(self, square: int) -> Optional[str]:
+        """Return the move UCI if the square is a target of the selection, else select it"""
+        move_uci = self.selected_targets().get(square)
+        if move_uci:
+            self.selected_square = None
+        else:
+            # Select a square, or another piece instead of an illegal move
+            self.select_square(square)
+        return move_uci
+    
+    def clear(self):
+        """Drop the selection"""
+        self.selected_square = None
+    
+    def play_ai_move(self, ai_move: Optional[str], position: tuple) -> bool:
+        """Play a move chosen for position, unless the game changed meanwhile"""
+        if not ai_move or position != self.position_key():
+            return False
+        return self.game.make_ai_move(ai_move)["success"]
\ No newline at end of file
@@ -8,16 +8,18 @@ import sys
 import os
 import argparse
 from game.game_state import GameState
+from game.search import SearchEngine
 from ml.data_generator import ChessDataGenerator
 import chess
 
-def play_console_game():
+def play_console_game(engine: str = "random", depth: int = 4, think_time: float = 2.0):
     """Play chess in console mode"""
     print("🏁 Welcome to AI Chess!")
     print("You are playing as White. Enter moves in UCI format (e.g., e2e4)")
     print("Type 'quit' to exit, 'help' for commands\n")
     
     game = GameState(player_color=chess.WHITE)
+    search_engine = SearchEngine() if engine == "search" else None
     
     while not game.game_over:
         # Display current position
@@ -53,11 +55,17 @@ def play_console_game():
                     print(f"❌ {result['error']}. Try again.")
         
         else:
-            # AI's turn - for now, make a random legal move
+            # AI's turn - search or make a random legal move
             legal_moves = game.board.get_legal_moves()
             if legal_moves:
-                import random
-                ai_move = random.choice(legal_moves)
+                if search_engine:
+                    search_result = search_engine.search(game.board.board, max_depth=depth, time_limit=think_time)
+                    ai_move = search_result["move"]
+                    print(f"🔍 Depth {search_result['depth']}, score {search_result['score']}, "
+                          f"{search_result['nodes']:,} nodes ({search_result['nps']:,} nps)")
+                else:
+                    import random
+                    ai_move = random.choice(legal_moves)
                 result = game.make_ai_move(ai_move)
                 if result["success"]:
                     print(f"🤖 AI played: {ai_move}")
@@ -71,13 +79,31 @@ def play_console_game():
         winner_color = "White" if game.winner else "Black"
         print(f"🏆 Winner: {winner_color}")
 
-def generate_training_data():
+def generate_training_data(num_games: int = 500, num_tactical: int = 200,
+                           num_workers: int = 1, seed: int = None, output_dir: str = "data/shards",
+                           output_format: str = "jsonl", overwrite: bool = False):
     """Generate training data for the ML model"""
     print("🔄 Generating training data...")
     
     generator = ChessDataGenerator()
-    data = generator.generate_full_dataset(num_games=500, num_tactical=200)
-    generator.save_dataset(data)
+    if num_workers > 1 or seed is not None or output_format == "binary":
+        # Reproducible sharded output, identical for any worker count
+        seed = seed or 0
+        import random
+        shards = generator.generate_random_game_data_parallel(num_games, num_workers, seed, output_dir,
+                                                              output_format=output_format, overwrite=overwrite)
+        
+        tactical_data = generator.generate_tactical_positions(num_tactical, rng=random.Random(f"{seed}:tactical"))
+        if output_format == "binary":
+            from ml.dataset import encode_records, write_shard, build_index
+            write_shard(encode_records(tactical_data), output_dir, "tactical")
+            build_index(output_dir, shards=shards + ["tactical"])
+        else:
+            generator.save_shard(tactical_data, os.path.join(output_dir, "tactical.jsonl"))
+        print(f"Saved shards to {output_dir}")
+    else:
+        data = generator.generate_full_dataset(num_games=num_games, num_tactical=num_tactical)
+        generator.save_dataset(data)
     
     print("✅ Training data generated successfully!")
 
@@ -86,13 +112,25 @@ def main():
     parser = argparse.ArgumentParser(description="AI-Powered Chess Game")
     parser.add_argument("--mode", choices=["play", "generate-data", "train"], 
                        default="play", help="Game mode")
+    parser.add_argument("--engine", choices=["random", "search"], default="random",
+                       help="AI opponent engine")
+    parser.add_argument("--depth", type=int, default=4, help="Maximum search depth")
+    parser.add_argument("--think-time", type=float, default=2.0, help="Search time per move in seconds")
+    parser.add_argument("--num-games", type=int, default=500, help="Random games to generate")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes for data generation")
+    parser.add_argument("--seed", type=int, default=None, help="Master seed for reproducible data generation")
+    parser.add_argument("--output-dir", default="data/shards", help="Shard directory for parallel data generation")
+    parser.add_argument("--format", choices=["jsonl", "binary"], default="jsonl",
+                       help="Shard format for parallel data generation")
+    parser.add_argument("--overwrite", action="store_true", help="Replace a dataset already in --output-dir")
     
     args = parser.parse_args()
     
     if args.mode == "play":
-        play_console_game()
+        play_console_game(args.engine, args.depth, args.think_time)
     elif args.mode == "generate-data":
-        generate_training_data()
+        generate_training_data(args.num_games, num_workers=args.workers, seed=args.seed,
+                               output_dir=args.output_dir, output_format=args.format, overwrite=args.overwrite)
     elif args.mode == "train":
         print("🚧 Model training not implemented yet!")
         print("Run with --mode generate-data first to create training data")
@@ -1,10 +1,70 @@
 import chess
 import chess.engine
 import json
+import os
 import random
-from typing import List, Dict, Tuple
+import multiprocessing
+from typing import List, Dict, Tuple, Iterator
 from .utils import ChessEncoder
 
+def play_random_game(rng, game_idx: int, max_moves: int = 100) -> List[Dict]:
+    """Play one game of random legal moves and return its positions"""
+    board = chess.Board()
+    records = []
+    move_count = 0
+    
+    while not board.is_game_over() and move_count < max_moves:
+        legal_moves = list(board.legal_moves)
+        if not legal_moves:
+            break
+        
+        # Choose random legal move
+        move = rng.choice(legal_moves)
+        
+        # Store position and move
+        records.append({
+            "fen": board.fen(),
+            "move": move.uci(),
+            "game_id": game_idx,
+            "move_number": move_count
+        })
+        
+        board.push(move)
+        move_count += 1
+    
+    return records
+
+def game_rng(seed: int, game_idx: int) -> random.Random:
+    """Random generator for one game, independent of which worker plays it"""
+    return random.Random(f"{seed}:{game_idx}")
+
+def _generate_shard(task: Tuple[int, int, int, int, str, str]) -> Tuple[str, int]:
+    """Worker: play a range of games and stream their positions to a shard file"""
+    shard_idx, first_game, last_game, seed, output_dir, output_format = task
+    
+    if output_format == "binary":
+        from .dataset import encode_records, write_shard
+        records = []
+        for game_idx in range(first_game, last_game):
+            records.extend(play_random_game(game_rng(seed, game_idx), game_idx))
+        name = f"shard-{shard_idx:05d}"
+        write_shard(encode_records(records), output_dir, name)
+        return name, len(records)
+    
+    path = os.path.join(output_dir, f"shard-{shard_idx:05d}.jsonl")
+    tmp_path = path + ".tmp"
+    count = 0
+    
+    with open(tmp_path, 'w') as f:
+        for game_idx in range(first_game, last_game):
+            for record in play_random_game(game_rng(seed, game_idx), game_idx):
+                f.write(json.dumps(record) + "\n")
+                count += 1
+    
+    # Only complete shards get their final name
+    os.replace(tmp_path, path)
+    return path, count
+
 class ChessDataGenerator:
     """Generate training data from chess games"""
     
@@ -16,38 +76,49 @@ class ChessDataGenerator:
         data = []
         
         for game_idx in range(num_games):
-            board = chess.Board()
-            game_moves = []
-            
             # Play random moves until game ends or max moves reached
-            max_moves = 100
-            move_count = 0
-            
-            while not board.is_game_over() and move_count < max_moves:
-                legal_moves = list(board.legal_moves)
-                if not legal_moves:
-                    break
-                
-                # Choose random legal move
-                move = random.choice(legal_moves)
-                
-                # Store position and move
-                data.append({
-                    "fen": board.fen(),
-                    "move": move.uci(),
-                    "game_id": game_idx,
-                    "move_number": move_count
-                })
-                
-                board.push(move)
-                move_count += 1
+            data.extend(play_random_game(random, game_idx))
             
             if game_idx % 100 == 0:
                 print(f"Generated {game_idx} games...")
         
         return data
     
-    def generate_tactical_positions(self, num_positions: int = 500) -> List[Dict]:
+    def generate_random_game_data_parallel(self, num_games: int = 1000, num_workers: int = None,
+                                           seed: int = 0, output_dir: str = "data/shards",
+                                           games_per_shard: int = 100, output_format: str = "jsonl",
+                                           overwrite: bool = False) -> List[str]:
+        """Generate random games in a process pool, streaming positions to JSONL or binary shards
+        
+        Every game is seeded from the master seed and its game index, and every
+        shard covers a fixed range of games, so the output is identical for any
+        number of workers. The output directory must not hold a dataset yet,
+        unless overwrite deletes it.
+        """
+        from .dataset import prepare_output_dir
+        prepare_output_dir(output_dir, overwrite)
+        num_workers = num_workers or os.cpu_count() or 1
+        
+        tasks = []
+        for shard_idx, first_game in enumerate(range(0, num_games, games_per_shard)):
+            last_game = min(first_game + games_per_shard, num_games)
+            tasks.append((shard_idx, first_game, last_game, seed, output_dir, output_format))
+        
+        shard_paths = []
+        total = 0
+        with multiprocessing.Pool(num_workers) as pool:
+            for path, count in pool.imap_unordered(_generate_shard, tasks):
+                shard_paths.append(path)
+                total += count
+                print(f"Generated {len(shard_paths)}/{len(tasks)} shards ({total} positions)...")
+        
+        if output_format == "binary":
+            from .dataset import build_index
+            build_index(output_dir, shards=sorted(shard_paths))
+        
+        return sorted(shard_paths)
+    
+    def generate_tactical_positions(self, num_positions: int = 500, rng=random) -> List[Dict]:
         """Generate positions with tactical themes"""
         data = []
         
@@ -63,12 +134,12 @@ class ChessDataGenerator:
         
         for i in range(num_positions):
             # Use random tactical position
-            fen = random.choice(tactical_fens)
+            fen = rng.choice(tactical_fens)
             board = chess.Board(fen)
             
             if board.legal_moves:
                 # Pick a random legal move as "best"
-                move = random.choice(list(board.legal_moves))
+                move = rng.choice(list(board.legal_moves))
                 
                 data.append({
                     "fen": fen,
@@ -90,7 +161,12 @@ class ChessDataGenerator:
         print(f"Saved {len(data)} positions to {filename}")
     
     def load_dataset(self, filename: str = "data/chess_dataset.json") -> List[Dict]:
-        """Load dataset from JSON file"""
+        """Load dataset from a JSON file or a directory of JSONL shards"""
+        if os.path.isdir(filename):
+            data = list(self.iter_shards(filename))
+            print(f"Loaded {len(data)} positions from {filename}")
+            return data
+        
         try:
             with open(filename, 'r') as f:
                 data = json.load(f)
@@ -100,6 +176,22 @@ class ChessDataGenerator:
             print(f"Dataset file {filename} not found")
             return []
     
+    def save_shard(self, data: List[Dict], filename: str):
+        """Save records to a JSONL shard, one record per line"""
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        
+        with open(filename, 'w') as f:
+            for record in data:
+                f.write(json.dumps(record) + "\n")
+    
+    def iter_shards(self, directory: str = "data/shards") -> Iterator[Dict]:
+        """Stream records from all JSONL shards in a directory"""
+        for name in sorted(os.listdir(directory)):
+            if name.endswith(".jsonl"):
+                with open(os.path.join(directory, name), 'r') as f:
+                    for line in f:
+                        yield json.loads(line)
+    
     def generate_full_dataset(self, num_games: int = 1000, num_tactical: int = 500) -> List[Dict]:
         """Generate complete dataset with random games and tactical positions"""
         print("Generating random game data...")
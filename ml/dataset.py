@@ -0,0 +1,289 @@
+import json
+import os
+import chess
+import numpy as np
+from typing import List, Dict, Iterator, Iterable, Tuple
+from .utils import ChessEncoder
+
+INDEX_FILE = "index.json"
+FORMAT_VERSION = 1
+PLANE_SHAPE = (8, 8, 12)
+PACKED_PLANE_BYTES = 96  # 8 * 8 * 12 bits
+
+# Per-position columns stored next to the packed planes
+COLUMNS = {
+    "moves": np.uint16,       # Policy index of the played move, from-to or compact (see the index)
+    "promotion": np.uint8,    # Promotion piece type, 0 if none
+    "turn": np.uint8,         # 1 if White is to move
+    "game_id": np.int32,
+    "move_number": np.int16,
+}
+
+# Tactical positions have no game, their position_id is stored past every generated game's id
+# so that splits grouped by game never put a tactical position with an unrelated game
+TACTICAL_GAME_ID_OFFSET = 1 << 30
+
+# Extra columns of deduplicated datasets, where each row is a distinct move played in a position
+WEIGHT_COLUMNS = {
+    "count": np.uint32,           # Times the move was played in the position
+    "position_count": np.uint32,  # Times the position occurred, over all its moves
+}
+
+def pack_planes(board_tensors: np.ndarray) -> np.ndarray:
+    """Pack (N, 8, 8, 12) board planes into (N, 96) bytes"""
+    bits = board_tensors.reshape(len(board_tensors), -1) > 0
+    return np.packbits(bits, axis=1)
+
+def pack_masks(masks: np.ndarray, block_size: int = 8192) -> np.ndarray:
+    """Pack (N, 12) piece bitboards, in plane order, straight into (N, 96) bytes"""
+    masks = np.ascontiguousarray(masks, dtype='<u8')
+    packed = np.empty((len(masks), PACKED_PLANE_BYTES), dtype=np.uint8)
+    for start in range(0, len(masks), block_size):
+        block = masks[start:start + block_size]
+        # Same layout as ChessEncoder.boards_to_tensor: rank 8 first, planes last
+        bits = np.unpackbits(block.view(np.uint8), axis=1, bitorder='little')
+        planes = bits.reshape(len(block), 12, 8, 8)[:, :, ::-1, :].transpose(0, 2, 3, 1)
+        packed[start:start + block_size] = np.packbits(planes.reshape(len(block), -1), axis=1)
+    return packed
+
+def unpack_planes(packed: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+    """Unpack (N, 96) bytes into (N, 8, 8, 12) float32 board planes"""
+    bits = np.unpackbits(np.asarray(packed), axis=1).reshape((len(packed),) + PLANE_SHAPE)
+    if out is None:
+        return bits.astype(np.float32)
+    out[:len(packed)] = bits
+    return out[:len(packed)]
+
+def record_game_id(record: Dict) -> int:
+    """Game id column value of a dataset record, -1 if it has none"""
+    if "game_id" in record:
+        return record["game_id"]
+    if "position_id" in record:
+        return TACTICAL_GAME_ID_OFFSET + record["position_id"]
+    return -1
+
+def encode_records(records: List[Dict], compact: bool = False) -> Dict[str, np.ndarray]:
+    """Encode dataset records into packed planes and column arrays"""
+    encoder = ChessEncoder()
+    fens = [record["fen"] for record in records]
+    
+    arrays = {"planes": pack_planes(encoder.boards_to_tensor(fens))}
+    arrays["moves"] = encoder.moves_to_indices([record["move"] for record in records], compact).astype(COLUMNS["moves"])
+    arrays["promotion"] = np.array([chess.Move.from_uci(record["move"]).promotion or 0 for record in records],
+                                   dtype=COLUMNS["promotion"])
+    arrays["turn"] = np.array([fen.split(' ')[1] == 'w' for fen in fens], dtype=COLUMNS["turn"])
+    arrays["game_id"] = np.array([record_game_id(record) for record in records], dtype=COLUMNS["game_id"])
+    arrays["move_number"] = np.array([record.get("move_number", -1) for record in records],
+                                     dtype=COLUMNS["move_number"])
+    return arrays
+
+def write_shard(arrays: Dict[str, np.ndarray], directory: str, name: str):
+    """Write one shard's arrays as .npy files"""
+    os.makedirs(directory, exist_ok=True)
+    for column, array in arrays.items():
+        path = os.path.join(directory, f"{name}.{column}.npy")
+        # Write under a temporary name so readers never see half a shard
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, array)
+        os.replace(tmp_path, path)
+
+def prepare_output_dir(directory: str, overwrite: bool = False):
+    """Create a dataset output directory, refusing one that already holds a dataset
+    
+    Shards left by an earlier run would otherwise mix with the new ones.
+    With overwrite, the old shards and index are deleted first.
+    """
+    os.makedirs(directory, exist_ok=True)
+    stale = [name for name in os.listdir(directory)
+             if name == INDEX_FILE or name.endswith((".npy", ".jsonl", ".tmp"))]
+    if stale and not overwrite:
+        raise FileExistsError(f"{directory} already holds a dataset ({len(stale)} files), "
+                              f"use another directory or overwrite it")
+    for name in stale:
+        os.remove(os.path.join(directory, name))
+
+def build_index(directory: str, columns: List[str] = None, shards: List[str] = None, **metadata) -> Dict:
+    """Write the index file of the given shards, or of every shard found in the directory"""
+    if shards is None:
+        shards = [name[:-len(".planes.npy")] for name in sorted(os.listdir(directory))
+                  if name.endswith(".planes.npy")]
+    counts = [np.load(os.path.join(directory, f"{name}.planes.npy"), mmap_mode='r').shape[0] for name in shards]
+    shards = [{"name": name, "count": int(count)} for name, count in zip(shards, counts)]
+    
+    index = {
+        "version": FORMAT_VERSION,
+        "plane_shape": list(PLANE_SHAPE),
+        "columns": list(columns or COLUMNS),
+        "shards": shards,
+        "total": sum(shard["count"] for shard in shards),
+    }
+    index.update(metadata)
+    
+    with open(os.path.join(directory, INDEX_FILE), 'w') as f:
+        json.dump(index, f, indent=2)
+    return index
+
+def policy_name(compact: bool) -> str:
+    """Name of a move index space in the index file"""
+    return "compact" if compact else "from_to"
+
+def is_sharded_dataset(path: str) -> bool:
+    """Check whether a path is a binary sharded dataset directory"""
+    return os.path.isfile(os.path.join(path, INDEX_FILE))
+
+class ShardWriter:
+    """Buffer dataset records and write them out as fixed-size binary shards"""
+    
+    def __init__(self, directory: str, shard_size: int = 65536, prefix: str = "shard", compact: bool = False,
+                 overwrite: bool = False):
+        prepare_output_dir(directory, overwrite)
+        self.directory = directory
+        self.shard_size = shard_size
+        self.prefix = prefix
+        self.compact = compact
+        self.buffer = []
+        self.shard_names = []
+        self.count = 0
+    
+    def add(self, record: Dict):
+        """Add one record, writing a shard when the buffer is full"""
+        self.buffer.append(record)
+        if len(self.buffer) >= self.shard_size:
+            self.flush()
+    
+    def add_many(self, records: Iterable[Dict]):
+        """Add several records"""
+        for record in records:
+            self.add(record)
+    
+    def flush(self):
+        """Write the buffered records as a shard"""
+        if not self.buffer:
+            return
+        name = f"{self.prefix}-{len(self.shard_names):05d}"
+        write_shard(encode_records(self.buffer, self.compact), self.directory, name)
+        self.shard_names.append(name)
+        self.count += len(self.buffer)
+        self.buffer = []
+    
+    def close(self, write_index: bool = True) -> Dict:
+        """Flush the remaining records and optionally write the index"""
+        self.flush()
+        if write_index:
+            return build_index(self.directory, shards=self.shard_names, policy=policy_name(self.compact))
+        return {"shards": self.shard_names, "total": self.count}
+
+class ShardedDataset:
+    """Read-only view of a binary sharded dataset through memory maps"""
+    
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, INDEX_FILE), 'r') as f:
+            self.index = json.load(f)
+        
+        if self.index["version"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported dataset version {self.index['version']}")
+        
+        self.shards = self.index["shards"]
+        self.compact_policy = self.index.get("policy") == "compact"
+        self.weighted = "count" in self.index["columns"]  # Deduplicated, see ml.dedup
+        counts = [shard["count"] for shard in self.shards]
+        self.offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        self._arrays = {}
+    
+    def __len__(self) -> int:
+        return int(self.offsets[-1])
+    
+    def column(self, shard_idx: int, column: str) -> np.ndarray:
+        """Get a memory-mapped column of one shard, opened on first use"""
+        key = (shard_idx, column)
+        if key not in self._arrays:
+            path = os.path.join(self.directory, f"{self.shards[shard_idx]['name']}.{column}.npy")
+            self._arrays[key] = np.load(path, mmap_mode='r')
+        return self._arrays[key]
+    
+    def locate(self, indices: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Map global row indices to (shard, row within shard)"""
+        indices = np.asarray(indices, dtype=np.int64)
+        shard_ids = np.searchsorted(self.offsets, indices, side='right') - 1
+        return shard_ids, indices - self.offsets[shard_ids]
+    
+    def get(self, indices: np.ndarray, column: str) -> np.ndarray:
+        """Gather a column for arbitrary global row indices"""
+        shard_ids, rows = self.locate(indices)
+        result = None
+        for shard_idx in np.unique(shard_ids):
+            mask = shard_ids == shard_idx
+            values = self.column(int(shard_idx), column)[rows[mask]]
+            if result is None:
+                result = np.empty((len(rows),) + values.shape[1:], dtype=values.dtype)
+            result[mask] = values
+        if result is None:
+            result = np.empty(0, dtype=COLUMNS.get(column, WEIGHT_COLUMNS.get(column, np.uint8)))
+        return result
+    
+    def get_batch(self, indices: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Get unpacked board planes and move indices for global row indices"""
+        return unpack_planes(self.get(indices, "planes")), self.get(indices, "moves")
+    
+    def iter_shards(self) -> Iterator[Dict[str, np.ndarray]]:
+        """Iterate over shards as dictionaries of memory-mapped columns"""
+        for shard_idx in range(len(self.shards)):
+            yield {column: self.column(shard_idx, column) for column in ["planes"] + self.index["columns"]}
+    
+    def iter_batches(self, batch_size: int = 1024) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """Iterate over the dataset in order as unpacked (planes, moves) batches"""
+        buffer = np.empty((batch_size,) + PLANE_SHAPE, dtype=np.float32)
+        for shard in self.iter_shards():
+            for start in range(0, len(shard["moves"]), batch_size):
+                planes = unpack_planes(shard["planes"][start:start + batch_size], out=buffer)
+                yield planes, np.asarray(shard["moves"][start:start + batch_size])
+    
+    def load_arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Load the whole dataset as unpacked (X, y) arrays"""
+        X = np.empty((len(self),) + PLANE_SHAPE, dtype=np.float32)
+        y = np.empty(len(self), dtype=np.int64)
+        for shard_idx, shard in enumerate(self.iter_shards()):
+            start, stop = self.offsets[shard_idx], self.offsets[shard_idx + 1]
+            unpack_planes(shard["planes"], out=X[start:stop])
+            y[start:stop] = shard["moves"]
+        return X, y
+
+def convert_json_dataset(source: str, output_dir: str, shard_size: int = 65536, compact: bool = False,
+                         overwrite: bool = False) -> Dict:
+    """Convert a JSON dataset file or a directory of JSONL shards to the binary format"""
+    from .data_generator import ChessDataGenerator
+    generator = ChessDataGenerator()
+    
+    if os.path.isdir(source):
+        records = generator.iter_shards(source)
+    else:
+        records = generator.load_dataset(source)
+    
+    writer = ShardWriter(output_dir, shard_size, compact=compact, overwrite=overwrite)
+    writer.add_many(records)
+    return writer.close()
+
+def convert_to_compact_policy(source_dir: str, output_dir: str, overwrite: bool = False) -> Dict:
+    """Rewrite the move labels of a binary dataset from from-to to compact indices
+    
+    The promotion column restores the underpromotions that share a from-to
+    index with the queen promotion. Other columns are copied unchanged.
+    """
+    dataset = ShardedDataset(source_dir)
+    if dataset.compact_policy:
+        raise ValueError(f"{source_dir} already uses the compact policy")
+    if os.path.abspath(source_dir) == os.path.abspath(output_dir):
+        raise ValueError("Write the converted dataset to a different directory")
+    prepare_output_dir(output_dir, overwrite)
+    
+    for shard, info in zip(dataset.iter_shards(), dataset.shards):
+        arrays = {column: np.asarray(values) for column, values in shard.items()}
+        arrays["moves"] = ChessEncoder.compact_indices(arrays["moves"], arrays["promotion"]).astype(COLUMNS["moves"])
+        write_shard(arrays, output_dir, info["name"])
+    
+    metadata = {key: value for key, value in dataset.index.items()
+                if key not in ("version", "plane_shape", "columns", "shards", "total")}
+    metadata["policy"] = policy_name(True)
+    return build_index(output_dir, dataset.index["columns"], [info["name"] for info in dataset.shards], **metadata)
\ No newline at end of file
@@ -0,0 +1,164 @@
+import math
+import os
+import shutil
+import time
+import numpy as np
+from typing import List, Dict, Any, Optional
+from .dataset import (COLUMNS, WEIGHT_COLUMNS, PACKED_PLANE_BYTES, ShardedDataset, write_shard,
+                      build_index, policy_name, prepare_output_dir)
+
+# One position as spilled to a partition file: the shard columns side by side,
+# with the count so already deduplicated datasets merge too
+RECORD = np.dtype([("planes", np.uint8, PACKED_PLANE_BYTES)]
+                  + [(column, dtype) for column, dtype in COLUMNS.items()]
+                  + [("count", WEIGHT_COLUMNS["count"])])
+
+GOLDEN_GAMMA = np.uint64(0x9E3779B97F4A7C15)
+
+def _mix64(x: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer over an array of uint64"""
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+def position_hashes(planes: np.ndarray, turns: np.ndarray) -> np.ndarray:
+    """64-bit hashes of (N, 96) packed planes and the side to move
+    
+    The key is what the model sees, so positions differing only in castling
+    or en passant rights, which the planes do not encode, are the same.
+    """
+    words = np.ascontiguousarray(planes, dtype=np.uint8).view('<u8')  # 12 words per position
+    with np.errstate(over='ignore'):
+        hashes = _mix64(np.asarray(turns, dtype=np.uint64) + GOLDEN_GAMMA)
+        for column in range(words.shape[1]):
+            hashes = _mix64((hashes ^ words[:, column]) + GOLDEN_GAMMA)
+    return hashes
+
+def merge_records(records: np.ndarray) -> Dict[str, np.ndarray]:
+    """Merge the records of identical positions into one row per distinct move played
+    
+    Positions are compared on their full planes and side to move, not on the
+    hash. The rows of a position are consecutive. Each carries the game id
+    of the position's first game, so all of them land in the same split.
+    """
+    keys = np.ascontiguousarray(np.concatenate([records["planes"], records["turn"][:, None]], axis=1))
+    _, position_ids = np.unique(keys.view(np.dtype((np.void, keys.shape[1]))).ravel(), return_inverse=True)
+    position_ids = position_ids.ravel()
+    
+    # The promotion tells underpromotions apart in the from-to index space
+    order = np.lexsort((records["promotion"], records["moves"], position_ids))
+    records, position_ids = records[order], position_ids[order]
+    new_move = np.ones(len(records), dtype=bool)
+    new_move[1:] = ((position_ids[1:] != position_ids[:-1]) | (records["moves"][1:] != records["moves"][:-1])
+                    | (records["promotion"][1:] != records["promotion"][:-1]))
+    starts = np.flatnonzero(new_move)
+    
+    counts = np.add.reduceat(records["count"].astype(np.int64), starts)
+    position_counts = np.bincount(position_ids, weights=records["count"]).astype(np.int64)
+    # First game of each position, games without an id (-1) only if it has no other
+    game_ids = np.where(records["game_id"] >= 0, records["game_id"], np.iinfo(COLUMNS["game_id"]).max)
+    first_games = np.full(len(position_counts), np.iinfo(COLUMNS["game_id"]).max, dtype=np.int64)
+    np.minimum.at(first_games, position_ids, game_ids)
+    first_games[first_games == np.iinfo(COLUMNS["game_id"]).max] = -1
+    
+    rows = position_ids[starts]
+    return {
+        "planes": records["planes"][starts],
+        "moves": records["moves"][starts],
+        "promotion": records["promotion"][starts],
+        "turn": records["turn"][starts],
+        "game_id": first_games[rows].astype(COLUMNS["game_id"]),
+        "move_number": np.minimum.reduceat(records["move_number"], starts).astype(COLUMNS["move_number"]),
+        "count": counts.astype(WEIGHT_COLUMNS["count"]),
+        "position_count": position_counts[rows].astype(WEIGHT_COLUMNS["position_count"]),
+    }
+
+def _read_records(shard: Dict[str, np.ndarray], start: int, stop: int) -> np.ndarray:
+    """Gather rows of a shard into records, with a count of 1 if the shard has none"""
+    records = np.empty(stop - start, dtype=RECORD)
+    for column in RECORD.names:
+        records[column] = shard[column][start:stop] if column in shard else 1
+    return records
+
+def partition_datasets(datasets: List[ShardedDataset], spill_dir: str, num_partitions: int,
+                       chunk_size: int = 65536) -> np.ndarray:
+    """Spill every position to the partition file picked by its hash and return the rows per partition"""
+    os.makedirs(spill_dir, exist_ok=True)
+    paths = [os.path.join(spill_dir, f"part-{partition:05d}.bin") for partition in range(num_partitions)]
+    for path in paths:
+        open(path, 'wb').close()
+    
+    sizes = np.zeros(num_partitions, dtype=np.int64)
+    for dataset in datasets:
+        for shard in dataset.iter_shards():
+            for start in range(0, len(shard["moves"]), chunk_size):
+                records = _read_records(shard, start, min(start + chunk_size, len(shard["moves"])))
+                partitions = position_hashes(records["planes"], records["turn"]) % np.uint64(num_partitions)
+                order = np.argsort(partitions, kind='stable')
+                bounds = np.searchsorted(partitions[order], np.arange(num_partitions + 1, dtype=np.uint64))
+                # Files are opened per write, so the partition count is not bound by open file limits
+                for partition in np.flatnonzero(np.diff(bounds)):
+                    with open(paths[partition], 'ab') as f:
+                        records[order[bounds[partition]:bounds[partition + 1]]].tofile(f)
+                sizes += np.diff(bounds)
+    return sizes
+
+def deduplicate(sources: List[str], output_dir: str, num_partitions: Optional[int] = None,
+                memory_bytes: int = 512 << 20, shard_size: int = 65536, verbose: bool = True,
+                overwrite: bool = False) -> Dict[str, Any]:
+    """Merge duplicate positions of binary datasets into a weighted dataset
+    
+    Positions are spilled to partition files by hash, then each partition
+    is merged in memory on its own, so only one partition has to fit in
+    memory_bytes whatever the size of the datasets. The output has one row
+    per distinct move of a position with the counts of WEIGHT_COLUMNS.
+    Returns the counters of the run with the shrink factor.
+    """
+    datasets = [ShardedDataset(source) for source in sources]
+    if len({dataset.compact_policy for dataset in datasets}) > 1:
+        raise ValueError("The datasets use different move index spaces")
+    if any(os.path.abspath(source) == os.path.abspath(output_dir) for source in sources):
+        raise ValueError("Write the deduplicated dataset to a different directory")
+    prepare_output_dir(output_dir, overwrite)
+    
+    start_time = time.perf_counter()
+    total_rows = sum(len(dataset) for dataset in datasets)
+    if num_partitions is None:
+        # Sorting and merging a partition takes a few times its size
+        num_partitions = max(1, math.ceil(total_rows * RECORD.itemsize * 4 / memory_bytes))
+    
+    spill_dir = os.path.join(output_dir, "partitions")
+    sizes = partition_datasets(datasets, spill_dir, num_partitions)
+    if verbose:
+        print(f"Partitioned {total_rows:,} rows into {num_partitions} partitions "
+              f"(largest {sizes.max():,} rows, {time.perf_counter() - start_time:.1f}s)")
+    
+    stats = {"positions": 0, "unique_positions": 0, "rows": 0, "partitions": num_partitions, "shards": 0}
+    shard_names = []
+    for partition in range(num_partitions):
+        path = os.path.join(spill_dir, f"part-{partition:05d}.bin")
+        records = np.fromfile(path, dtype=RECORD)
+        os.remove(path)
+        if not len(records):
+            continue
+        
+        arrays = merge_records(records)
+        stats["positions"] += int(records["count"].sum())
+        # The move counts of a position add up to its position count
+        stats["unique_positions"] += int(round((arrays["count"] / arrays["position_count"]).sum()))
+        stats["rows"] += len(arrays["moves"])
+        for shard_start in range(0, len(arrays["moves"]), shard_size):
+            shard = {column: values[shard_start:shard_start + shard_size] for column, values in arrays.items()}
+            shard_names.append(f"dedup-{partition:05d}-{shard_start // shard_size:03d}")
+            write_shard(shard, output_dir, shard_names[-1])
+            stats["shards"] += 1
+    shutil.rmtree(spill_dir)
+    
+    # A ratio of 1 means nothing was merged
+    stats["shrink_factor"] = stats["positions"] / stats["rows"] if stats["rows"] else 1.0
+    stats["position_shrink_factor"] = (stats["positions"] / stats["unique_positions"]
+                                       if stats["unique_positions"] else 1.0)
+    stats["time"] = time.perf_counter() - start_time
+    stats["index"] = build_index(output_dir, list(COLUMNS) + list(WEIGHT_COLUMNS), shard_names,
+                                 policy=policy_name(datasets[0].compact_policy), source_positions=stats["positions"])
+    return stats
\ No newline at end of file
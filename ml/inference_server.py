@@ -0,0 +1,140 @@
+import queue
+import threading
+import time
+import chess
+import numpy as np
+from concurrent.futures import Future
+from typing import Callable, List, Tuple, Union, Optional
+from .utils import ChessEncoder
+from .prediction_cache import PredictionCache
+
+class BatchInferenceServer:
+    """Gather prediction requests from many games into batched forward passes"""
+    
+    def __init__(self, predict_fn: Callable[[np.ndarray], np.ndarray],
+                 max_batch_size: int = 32, max_wait_ms: float = 5.0,
+                 cache: Optional[PredictionCache] = None,
+                 observer: Optional[Callable[[int, float, float], None]] = None):
+        self.predict_fn = predict_fn
+        self.cache = cache
+        self.observer = observer  # Called with (batch size, encode seconds, forward seconds)
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.encoder = ChessEncoder()
+        
+        self._queue = queue.Queue()
+        self._thread = None
+        self._running = False
+        self._lock = threading.Lock()
+        
+        # Reused input buffer, only the batch thread writes to it
+        self._buffer = np.empty((max_batch_size, 8, 8, 12), dtype=np.float32)
+        
+        self.stats = {"requests": 0, "batches": 0, "max_batch": 0}
+    
+    def start(self):
+        """Start the batching thread"""
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name="batch-inference", daemon=True)
+            self._thread.start()
+    
+    def stop(self, timeout: float = None):
+        """Stop the batching thread after the queued requests are served"""
+        with self._lock:
+            if not self._running:
+                return
+            self._running = False
+            self._queue.put(None)
+        self._thread.join(timeout)
+    
+    def submit(self, position: Union[str, chess.Board]) -> Future:
+        """Queue a position and return a future for its policy vector"""
+        future = Future()
+        with self._lock:
+            if not self._running:
+                raise RuntimeError("Inference server is not running")
+            self._queue.put((position, future))
+        return future
+    
+    def predict_top_k(self, fen: str, k: int = 5, timeout: float = None) -> List[Tuple[str, float]]:
+        """Predict the k most probable legal moves through the shared batch"""
+        board = chess.Board(fen)
+        if self.cache is not None:
+            key = self.cache.position_key(board)
+            cached = self.cache.get_top_k(board, k, key)
+            if cached is not None:
+                return cached
+            generation = self.cache.generation
+        
+        policy = self.submit(fen).result(timeout)
+        if self.cache is not None:
+            self.cache.put_policy(board, policy, generation, k, key)
+        
+        # Decode in the calling thread so the batch thread only runs the model
+        return self.encoder.top_k_legal_moves(board, policy, k)
+    
+    def predict_move(self, fen: str, timeout: float = None) -> str:
+        """Predict the best move through the shared batch"""
+        top_moves = self.predict_top_k(fen, k=1, timeout=timeout)
+        return top_moves[0][0] if top_moves else "a1a1"
+    
+    def _collect_batch(self) -> list:
+        """Wait for one request, then gather more until the batch is full or the deadline passes"""
+        first = self._queue.get()
+        if first is None:
+            return []
+        
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                request = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is None:
+                # Serve what we have, the loop sees the stop flag afterwards
+                break
+            batch.append(request)
+        return batch
+    
+    def _run(self):
+        """Batching loop"""
+        while True:
+            batch = self._collect_batch()
+            if batch:
+                self._process(batch)
+            if not self._running and self._queue.empty():
+                break
+    
+    def _process(self, batch: list):
+        """Run one forward pass for a batch and resolve its futures"""
+        # Skip requests whose callers already gave up
+        batch = [(position, future) for position, future in batch
+                 if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        positions = [position for position, _ in batch]
+        futures = [future for _, future in batch]
+        
+        try:
+            start = time.perf_counter()
+            inputs = self.encoder.boards_to_tensor(positions, out=self._buffer)
+            encoded = time.perf_counter()
+            policies = np.asarray(self.predict_fn(inputs))
+            if self.observer:
+                self.observer(len(positions), encoded - start, time.perf_counter() - encoded)
+        except Exception as e:
+            for future in futures:
+                future.set_exception(e)
+            return
+        
+        for future, policy in zip(futures, policies):
+            future.set_result(policy.copy())
+        
+        self.stats["requests"] += len(futures)
+        self.stats["batches"] += 1
+        self.stats["max_batch"] = max(self.stats["max_batch"], len(futures))
\ No newline at end of file
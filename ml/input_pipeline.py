@@ -0,0 +1,148 @@
+import numpy as np
+import tensorflow as tf
+from typing import Dict, Optional, Tuple
+from .dataset import ShardedDataset, PLANE_SHAPE, PACKED_PLANE_BYTES
+from .utils import ChessEncoder, MIRROR_PLANES
+
+TRAIN, VAL, TEST = 0, 1, 2
+SPLIT_NAMES = {"train": TRAIN, "val": VAL, "test": TEST}
+
+# Sample weights of deduplicated datasets: "count" trains as on the duplicated
+# data, "distribution" gives every position a weight of 1 spread over its moves,
+# the same loss as a soft target of the move distribution
+WEIGHTINGS = ("count", "distribution")
+
+def assign_splits(keys: np.ndarray, val_fraction: float = 0.15, test_fraction: float = 0.15,
+                  seed: int = 42) -> np.ndarray:
+    """Assign each key to train/val/test by hashing it, independent of dataset order"""
+    # splitmix64 finalizer gives well-mixed bits for consecutive ids
+    with np.errstate(over='ignore'):
+        x = np.asarray(keys).astype(np.uint64) + np.uint64(seed) * np.uint64(0x9E3779B97F4A7C15)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        x = x ^ (x >> np.uint64(31))
+    u = (x >> np.uint64(11)).astype(np.float64) / float(1 << 53)
+    
+    splits = np.full(len(u), TRAIN, dtype=np.uint8)
+    splits[u < val_fraction + test_fraction] = VAL
+    splits[u < test_fraction] = TEST
+    return splits
+
+def split_keys(dataset: ShardedDataset, shard_idx: int) -> np.ndarray:
+    """Keys used for splitting: the game id, so a game never spans two splits"""
+    game_ids = np.asarray(dataset.column(shard_idx, "game_id")).astype(np.int64)
+    rows = np.arange(len(game_ids), dtype=np.int64) + dataset.offsets[shard_idx]
+    # Positions without a game id are split individually
+    return np.where(game_ids >= 0, game_ids, -1 - rows)
+
+def sample_weights(dataset: ShardedDataset, shard_idx: int, rows: np.ndarray, weighting: str) -> np.ndarray:
+    """Training weights of rows of a deduplicated shard"""
+    counts = dataset.column(shard_idx, "count")[rows].astype(np.float32)
+    if weighting == "distribution":
+        return (counts / dataset.column(shard_idx, "position_count")[rows]).astype(np.float32)
+    return counts
+
+def unpack_planes_tf(packed: tf.Tensor) -> tf.Tensor:
+    """Unpack (B, 96) uint8 packed planes into (B, 8, 8, 12) float32 inside the graph"""
+    shifts = tf.constant([7, 6, 5, 4, 3, 2, 1, 0], dtype=tf.uint8)  # np.packbits is MSB first
+    bits = tf.bitwise.bitwise_and(tf.bitwise.right_shift(tf.expand_dims(packed, -1), shifts), 1)
+    return tf.cast(tf.reshape(bits, (-1,) + PLANE_SHAPE), tf.float32)
+
+def color_flip_tf(planes: tf.Tensor, moves: tf.Tensor, mirror_table: tf.Tensor,
+                  seed: Optional[int] = None) -> Tuple[tf.Tensor, tf.Tensor]:
+    """Color flip a random half of a batch of (B, 8, 8, 12) planes and their move indices
+    
+    The planes carry no side to move, so the flipped position is the same
+    position seen from the other side, with the mirrored move played.
+    """
+    flip = tf.random.uniform(tf.shape(moves), seed=seed) < 0.5
+    mirrored = tf.gather(tf.reverse(planes, axis=[1]), MIRROR_PLANES, axis=3)
+    planes = tf.where(flip[:, None, None, None], mirrored, planes)
+    moves = tf.where(flip, tf.gather(mirror_table, moves), moves)
+    return planes, moves
+
+def count_split_rows(dataset: ShardedDataset, val_fraction: float = 0.15, test_fraction: float = 0.15,
+                     seed: int = 42) -> Dict[str, int]:
+    """Count the rows of each split, reading only the game id columns"""
+    counts = np.zeros(3, dtype=np.int64)
+    for shard_idx in range(len(dataset.shards)):
+        splits = assign_splits(split_keys(dataset, shard_idx), val_fraction, test_fraction, seed)
+        counts += np.bincount(splits, minlength=3)
+    return {name: int(counts[split]) for name, split in SPLIT_NAMES.items()}
+
+def build_split_dataset(directory: str, split: str = "train", batch_size: int = 64,
+                        shuffle_buffer: int = 10000, val_fraction: float = 0.15,
+                        test_fraction: float = 0.15, seed: int = 42,
+                        chunk_size: int = 4096, weighting: Optional[str] = None,
+                        augment: bool = False) -> tf.data.Dataset:
+    """Stream one split of a binary sharded dataset as batches of (planes, move index)
+    
+    With a weighting, batches are (planes, move index, sample weight) from
+    the counts of a deduplicated dataset. With augment, half of every
+    training batch is color flipped, which doubles the positions seen
+    without storing any more of them.
+    """
+    dataset = ShardedDataset(directory)
+    split_id = SPLIT_NAMES[split]
+    training = split == "train"
+    if weighting is not None:
+        if weighting not in WEIGHTINGS:
+            raise ValueError(f"Unknown weighting {weighting!r}, expected one of {WEIGHTINGS}")
+        if not dataset.weighted:
+            raise ValueError(f"{directory} is not deduplicated, it has no counts to weight by")
+    
+    def read_shard(shard_idx):
+        # Read one shard lazily from its memory maps, a chunk at a time
+        shard_idx = int(shard_idx)
+        splits = assign_splits(split_keys(dataset, shard_idx), val_fraction, test_fraction, seed)
+        rows = np.flatnonzero(splits == split_id)
+        planes = dataset.column(shard_idx, "planes")
+        moves = dataset.column(shard_idx, "moves")
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            if weighting is None:
+                yield planes[chunk], moves[chunk].astype(np.int32)
+            else:
+                yield planes[chunk], moves[chunk].astype(np.int32), sample_weights(dataset, shard_idx, chunk, weighting)
+    
+    signature = (
+        tf.TensorSpec(shape=(None, PACKED_PLANE_BYTES), dtype=tf.uint8),
+        tf.TensorSpec(shape=(None,), dtype=tf.int32),
+    )
+    if weighting is not None:
+        signature += (tf.TensorSpec(shape=(None,), dtype=tf.float32),)
+    
+    shards = tf.data.Dataset.range(len(dataset.shards))
+    if training:
+        shards = shards.shuffle(len(dataset.shards), seed=seed, reshuffle_each_iteration=True)
+    
+    ds = shards.interleave(
+        lambda shard_idx: tf.data.Dataset.from_generator(read_shard, output_signature=signature, args=(shard_idx,)),
+        cycle_length=min(4, max(1, len(dataset.shards))),
+        num_parallel_calls=tf.data.AUTOTUNE,
+        deterministic=not training
+    ).unbatch()
+    
+    if training:
+        # Bounded buffer: memory stays flat whatever the dataset size
+        ds = ds.shuffle(shuffle_buffer, seed=seed, reshuffle_each_iteration=True)
+    
+    # Unpack whole batches in parallel rather than one example at a time
+    ds = ds.batch(batch_size)
+    ds = ds.map(lambda packed, *labels: (unpack_planes_tf(packed),) + labels, num_parallel_calls=tf.data.AUTOTUNE)
+    if augment and training:
+        mirror_table = tf.constant(ChessEncoder.mirror_table(dataset.compact_policy))
+        ds = ds.map(lambda planes, moves, *weights: color_flip_tf(planes, moves, mirror_table, seed) + weights,
+                    num_parallel_calls=tf.data.AUTOTUNE)
+    return ds.prefetch(tf.data.AUTOTUNE)
+
+def build_datasets(directory: str, batch_size: int = 64, shuffle_buffer: int = 10000,
+                   val_fraction: float = 0.15, test_fraction: float = 0.15,
+                   seed: int = 42, weighting: Optional[str] = None,
+                   augment: bool = False) -> Dict[str, tf.data.Dataset]:
+    """Build streaming train/val/test datasets from a binary sharded dataset, augmenting only train"""
+    return {
+        split: build_split_dataset(directory, split, batch_size, shuffle_buffer,
+                                   val_fraction, test_fraction, seed, weighting=weighting, augment=augment)
+        for split in SPLIT_NAMES
+    }
\ No newline at end of file
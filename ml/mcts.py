@@ -0,0 +1,236 @@
+import math
+import time
+import chess
+import numpy as np
+from typing import Callable, Dict, Any, List, Optional, Tuple
+from .utils import ChessEncoder
+
+# Evaluates a batch of encoded positions to (policies, values), values in [-1, 1]
+# from the point of view of the side to move
+Evaluator = Callable[[np.ndarray], Tuple[np.ndarray, np.ndarray]]
+
+class MCTSTree:
+    """Search tree stored in flat arrays, one row per node
+    
+    A node is the position after its move. The children of a node are
+    consecutive rows, so selection scores all of them in one vectorized pass.
+    Values are summed from the point of view of the side that made the move.
+    """
+    
+    def __init__(self, capacity: int = 4096):
+        self.size = 0
+        self.capacity = capacity
+        self.parent = np.empty(capacity, dtype=np.int32)
+        self.first_child = np.empty(capacity, dtype=np.int32)   # -1 until expanded
+        self.num_children = np.empty(capacity, dtype=np.int32)
+        self.prior = np.empty(capacity, dtype=np.float32)
+        self.visits = np.empty(capacity, dtype=np.float64)
+        self.value_sum = np.empty(capacity, dtype=np.float64)
+        self.virtual = np.empty(capacity, dtype=np.float64)     # Playouts of the batch still in flight
+        self.terminal = np.empty(capacity, dtype=np.float32)    # Game result for the side to move, NaN if none
+        self.moves: List[Optional[chess.Move]] = []
+        self.add_nodes(-1, [None], np.ones(1, dtype=np.float32))
+    
+    def add_nodes(self, parent: int, moves: List[Optional[chess.Move]], priors: np.ndarray) -> int:
+        """Append nodes as the children of parent and return the first row"""
+        start, count = self.size, len(moves)
+        if start + count > self.capacity:
+            self._grow(max(self.capacity * 2, start + count))
+        
+        rows = slice(start, start + count)
+        self.parent[rows] = parent
+        self.first_child[rows] = -1
+        self.num_children[rows] = 0
+        self.prior[rows] = priors
+        self.visits[rows] = 0
+        self.value_sum[rows] = 0
+        self.virtual[rows] = 0
+        self.terminal[rows] = np.nan
+        self.moves.extend(moves)
+        self.size += count
+        
+        if parent >= 0:
+            self.first_child[parent] = start
+            self.num_children[parent] = count
+        return start
+    
+    def children(self, node: int) -> slice:
+        """Rows of the children of a node"""
+        start = self.first_child[node]
+        return slice(start, start + self.num_children[node])
+    
+    def _grow(self, capacity: int):
+        """Reallocate every array with room for capacity nodes"""
+        for name in ("parent", "first_child", "num_children", "prior", "visits", "value_sum", "virtual", "terminal"):
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+        self.capacity = capacity
+
+class MCTSEngine:
+    """Monte Carlo Tree Search guided by a policy and value network
+    
+    Playouts descend the tree by PUCT until they reach an unexpanded node.
+    Leaves are collected batch_size at a time, each path marked with a
+    virtual loss so the next playouts of the batch spread over other
+    branches, and all of them are scored by one forward pass.
+    """
+    
+    def __init__(self, evaluate: Evaluator, batch_size: int = 16, c_puct: float = 1.5,
+                 virtual_loss: float = 1.0, fpu_reduction: float = 0.25, compact_policy: bool = False):
+        self.evaluate = evaluate
+        self.compact_policy = compact_policy  # Move index space of the evaluator's policies
+        self.batch_size = batch_size
+        self.c_puct = c_puct
+        self.virtual_loss = virtual_loss
+        self.fpu_reduction = fpu_reduction  # Unvisited moves look this much worse than their parent
+        self.encoder = ChessEncoder()
+        self._buffer = np.empty((batch_size, 8, 8, 12), dtype=np.float32)
+        self.stats = {"playouts": 0, "batches": 0, "evaluated": 0, "collisions": 0, "max_depth": 0}
+    
+    def search(self, board: chess.Board, max_playouts: Optional[int] = 800,
+               time_limit: float = None) -> Dict[str, Any]:
+        """Search a position within a playout and/or time budget and return the most visited move"""
+        if max_playouts is None and time_limit is None:
+            raise ValueError("Give a playout budget, a time limit or both")
+        board = getattr(board, "board", board).copy()  # Accept a ChessBoard, search on a copy
+        
+        self.stats = {"playouts": 0, "batches": 0, "evaluated": 0, "collisions": 0, "max_depth": 0}
+        start = time.perf_counter()
+        deadline = start + time_limit if time_limit else None
+        tree = MCTSTree()
+        
+        legal_moves = list(board.legal_moves)
+        if len(legal_moves) > 1:
+            while max_playouts is None or self.stats["playouts"] < max_playouts:
+                if deadline and time.perf_counter() >= deadline:
+                    break
+                remaining = self.batch_size if max_playouts is None else max_playouts - self.stats["playouts"]
+                self._run_batch(tree, board, min(self.batch_size, remaining))
+        
+        elapsed = time.perf_counter() - start
+        playouts = self.stats["playouts"]
+        result = {
+            "move": legal_moves[0].uci() if legal_moves else None,  # Nothing to think about with one move
+            "score": 0.0,
+            "visits": {},
+            "principal_variation": [],
+            "nodes": tree.size,
+            "time": elapsed,
+            "playouts_per_sec": int(playouts / elapsed) if elapsed > 0 else 0,
+            "avg_batch": self.stats["evaluated"] / self.stats["batches"] if self.stats["batches"] else 0.0
+        }
+        result.update(self.stats)
+        
+        if tree.num_children[0]:
+            children = tree.children(0)
+            visits = tree.visits[children]
+            best = children.start + int(np.argmax(visits))
+            result["move"] = tree.moves[best].uci()
+            result["score"] = float(tree.value_sum[best] / max(tree.visits[best], 1))
+            result["visits"] = {tree.moves[row].uci(): int(count)
+                                for row, count in zip(range(children.start, children.stop), visits) if count}
+            result["principal_variation"] = self._principal_variation(tree)
+        return result
+    
+    def _run_batch(self, tree: MCTSTree, board: chess.Board, batch_size: int):
+        """Run up to batch_size playouts, evaluating their leaves in one forward pass"""
+        leaves = []  # (path, legal move indices, legal moves)
+        boards = []
+        pending = set()
+        
+        for _ in range(batch_size):
+            # Selection stops at a node that is either unexpanded or the end of the game
+            path = self._select(tree, board)
+            leaf = path[-1]
+            self.stats["max_depth"] = max(self.stats["max_depth"], len(path) - 1)
+            
+            if leaf in pending:
+                # Another playout of this batch is already waiting on this leaf
+                self.stats["collisions"] += 1
+                self._unwind(board, path)
+                break
+            
+            if math.isnan(tree.terminal[leaf]):
+                indices, moves = self.encoder.legal_moves_with_indices(board, compact=self.compact_policy)
+                if not moves:
+                    tree.terminal[leaf] = -1.0 if board.is_check() else 0.0
+                elif board.is_insufficient_material() or board.halfmove_clock >= 100 or board.is_repetition(3):
+                    tree.terminal[leaf] = 0.0
+                else:
+                    leaves.append((path, indices, moves))
+                    boards.append(board.copy(stack=False))
+                    pending.add(leaf)
+                    tree.virtual[path] += 1
+            self._unwind(board, path)
+            
+            if not math.isnan(tree.terminal[leaf]):
+                # Game over, the result needs no evaluation
+                self._backup(tree, path, float(tree.terminal[leaf]))
+                self.stats["playouts"] += 1
+        
+        if not leaves:
+            return
+        
+        tensors = self.encoder.boards_to_tensor(boards, out=self._buffer)
+        policies, values = self.evaluate(tensors)
+        policies = np.asarray(policies)
+        values = np.asarray(values, dtype=np.float64).reshape(-1)
+        
+        for (path, indices, moves), policy, value in zip(leaves, policies, values):
+            priors = policy[indices].astype(np.float32)
+            total = priors.sum()
+            priors = priors / total if total > 0 else np.full(len(moves), 1.0 / len(moves), dtype=np.float32)
+            tree.add_nodes(path[-1], moves, priors)
+            tree.virtual[path] -= 1
+            self._backup(tree, path, float(value))
+        
+        self.stats["playouts"] += len(leaves)
+        self.stats["evaluated"] += len(leaves)
+        self.stats["batches"] += 1
+    
+    def _select(self, tree: MCTSTree, board: chess.Board) -> List[int]:
+        """Descend from the root to a leaf by PUCT, pushing the moves on the board"""
+        node = 0
+        path = [0]
+        while tree.num_children[node]:
+            children = tree.children(node)
+            visits = tree.visits[children] + tree.virtual[children]
+            # Pending playouts count as losses until their leaf is evaluated
+            value_sums = tree.value_sum[children] - self.virtual_loss * tree.virtual[children]
+            
+            parent_visits = tree.visits[node] + tree.virtual[node]
+            parent_q = -tree.value_sum[node] / tree.visits[node] if tree.visits[node] else 0.0
+            q = np.where(visits > 0, value_sums / np.maximum(visits, 1), parent_q - self.fpu_reduction)
+            u = self.c_puct * tree.prior[children] * math.sqrt(max(parent_visits, 1)) / (1 + visits)
+            
+            node = children.start + int(np.argmax(q + u))
+            board.push(tree.moves[node])
+            path.append(node)
+        return path
+    
+    @staticmethod
+    def _unwind(board: chess.Board, path: List[int]):
+        """Take back the moves pushed while selecting a path"""
+        for _ in range(len(path) - 1):
+            board.pop()
+    
+    def _backup(self, tree: MCTSTree, path: List[int], value: float):
+        """Add a leaf value, given for the side to move at the leaf, along its path"""
+        # Each node keeps the value of the side that moved into it, which alternates
+        signs = np.where(np.arange(len(path))[::-1] % 2 == 0, -1.0, 1.0)
+        tree.value_sum[path] += signs * value
+        tree.visits[path] += 1
+    
+    def _principal_variation(self, tree: MCTSTree, max_length: int = 10) -> List[str]:
+        """Follow the most visited child from the root"""
+        moves = []
+        node = 0
+        while tree.num_children[node] and len(moves) < max_length:
+            children = tree.children(node)
+            if not tree.visits[children].any():
+                break
+            node = children.start + int(np.argmax(tree.visits[children]))
+            moves.append(tree.moves[node].uci())
+        return moves
\ No newline at end of file
@@ -1,24 +1,43 @@
-import tensorflow as tf
 import numpy as np
 import chess
-from typing import List, Tuple
-from .utils import ChessEncoder
+from typing import List, Tuple, Optional, Union
+from .utils import ChessEncoder, COMPACT_POLICY_SIZE
+from .prediction_cache import PredictionCache
+from .startup import tensorflow
 
 class ChessAI:
     """Neural network model for chess move prediction"""
     
-    def __init__(self, model_path: str = None):
+    def __init__(self, model_path: str = None, cache_bytes: int = 64 << 20, cache_top_k: Optional[int] = None,
+                 backend: str = "keras", num_threads: Optional[int] = None, compact_policy: bool = False,
+                 value_head: bool = False):
         self.encoder = ChessEncoder()
+        self.compact_policy = compact_policy  # Output only the ~1.9k moves a piece can make
+        self.value_head = value_head  # Also predict the expected game result, for tree search
         self.model = None
+        self.tflite = None
+        self.backend = backend
         self.model_path = model_path or "models/chess_model.h5"
+        self.loaded_path = None  # Where the weights came from, None for a newly built network
         
-        if model_path:
+        # Predictions of repeated positions are served from here, 0 disables it
+        self.cache = PredictionCache(cache_bytes, cache_top_k) if cache_bytes else None
+        
+        if backend == "tflite":
+            if not model_path:
+                raise ValueError("The TFLite backend needs a .tflite model path")
+            self.load_tflite(model_path, num_threads)
+        elif backend != "keras":
+            raise ValueError(f"Unknown backend {backend!r}, expected 'keras' or 'tflite'")
+        elif model_path:
             self.load_model(model_path)
         else:
             self.build_model()
     
     def build_model(self):
         """Build the neural network architecture"""
+        tf = tensorflow()
+        
         # Input: 8x8x12 board representation
         inputs = tf.keras.Input(shape=(8, 8, 12), name='board_input')
         
@@ -40,52 +59,100 @@ class ChessAI:
         x = tf.keras.layers.Dropout(0.3)(x)
         
         # Output layer: probability distribution over all possible moves
-        # Using 4096 outputs (64*64 possible from-to combinations)
-        outputs = tf.keras.layers.Dense(4096, activation='softmax', name='move_output')(x)
+        # Using 4096 outputs (64*64 possible from-to combinations), or with a
+        # compact policy 1924 outputs for the reachable moves and underpromotions
+        policy_size = self.encoder.policy_size(self.compact_policy)
+        outputs = tf.keras.layers.Dense(policy_size, activation='softmax', name='move_output')(x)
+        
+        if self.value_head:
+            # Second head: game result from the side to move's view, -1 loss to 1 win
+            value = tf.keras.layers.Dense(64, activation='relu')(x)
+            value = tf.keras.layers.Dense(1, activation='tanh', name='value_output')(value)
+            outputs = [outputs, value]
         
         self.model = tf.keras.Model(inputs=inputs, outputs=outputs)
+        self.loaded_path = None
+        self.invalidate_cache()
         
         # Compile model
-        self.model.compile(
-            optimizer=tf.keras.optimizers.Adam(learning_rate=0.001),
-            loss='sparse_categorical_crossentropy',
-            metrics=['accuracy']
-        )
+        if self.value_head:
+            # Labels are given as {"move_output": move indices, "value_output": results}
+            self.model.compile(
+                optimizer=tf.keras.optimizers.Adam(learning_rate=0.001),
+                loss={'move_output': 'sparse_categorical_crossentropy', 'value_output': 'mse'},
+                metrics={'move_output': 'accuracy'}
+            )
+        else:
+            self.model.compile(
+                optimizer=tf.keras.optimizers.Adam(learning_rate=0.001),
+                loss='sparse_categorical_crossentropy',
+                metrics=['accuracy']
+            )
         
         print("✅ Model architecture built successfully!")
         print(f"Model parameters: {self.model.count_params():,}")
     
-    def predict_move(self, fen: str) -> str:
-        """Predict the best move for a given position"""
+    def predict_policy(self, position: Union[str, chess.BaseBoard]) -> np.ndarray:
+        """Get the raw move probability vector for a FEN or board, as a batch of one"""
+        return self.predict_policies(self.encoder.boards_to_tensor([position]))[0]
+    
+    def predict_policies(self, board_tensors: np.ndarray) -> np.ndarray:
+        """Get move probability vectors for a batch of encoded positions"""
+        if self.tflite:
+            return self.tflite.predict(board_tensors)
         if not self.model:
             raise ValueError("Model not loaded or built")
         
-        # Convert FEN to tensor
-        board_tensor = self.encoder.fen_to_tensor(fen)
-        board_tensor = np.expand_dims(board_tensor, axis=0)  # Add batch dimension
-        
-        # Get model prediction
-        predictions = self.model.predict(board_tensor, verbose=0)[0]
+        # predict_on_batch skips the per-call setup of predict
+        predictions = self.model.predict_on_batch(board_tensors)
+        return np.asarray(predictions[0] if self.value_head else predictions)
+    
+    def predict_policies_and_values(self, board_tensors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Get move probability vectors and position values for a batch of encoded positions"""
+        if not self.model and not self.tflite:
+            raise ValueError("Model not loaded or built")
+        if not self.value_head:
+            raise ValueError("The model has no value head, build it with value_head=True")
+        if self.tflite:
+            return self.tflite.predict_with_values(board_tensors)
         
-        # Convert predictions to move probabilities
-        move_probs = []
-        for i, prob in enumerate(predictions):
-            move_uci = self.encoder.index_to_move(i)
-            move_probs.append((move_uci, prob))
+        policies, values = self.model.predict_on_batch(board_tensors)
+        return np.asarray(policies), np.asarray(values).reshape(-1)
+    
+    def predict_top_k(self, fen: str, k: int = 5) -> List[Tuple[str, float]]:
+        """Predict the k most probable legal moves with their probabilities"""
+        board = chess.Board(fen)
+        if self.cache is None:
+            return self.encoder.top_k_legal_moves(board, self.predict_policy(board), k)
         
-        # Sort by probability and filter legal moves
-        move_probs.sort(key=lambda x: x[1], reverse=True)
+        key = self.cache.position_key(board)
+        cached = self.cache.get_top_k(board, k, key)
+        if cached is not None:
+            return cached
         
-        # Filter to only legal moves
-        board = chess.Board(fen)
-        best_move = self.encoder.filter_legal_moves(board, move_probs)
+        # Remember the model version so a reload during the prediction is not cached
+        generation = self.cache.generation
+        predictions = self.predict_policy(board)
+        self.cache.put_policy(board, predictions, generation, k, key)
         
-        return best_move
+        # Gather only the legal entries of the policy instead of decoding all of it
+        return self.encoder.top_k_legal_moves(board, predictions, k)
+    
+    def predict_move(self, fen: str) -> str:
+        """Predict the best move for a given position"""
+        top_moves = self.predict_top_k(fen, k=1)
+        return top_moves[0][0] if top_moves else "a1a1"
+    
+    def invalidate_cache(self):
+        """Forget cached predictions after the model changed"""
+        if self.cache is not None:
+            self.cache.invalidate()
     
     def train(self, X_train: np.ndarray, y_train: np.ndarray, 
               X_val: np.ndarray = None, y_val: np.ndarray = None,
               epochs: int = 10, batch_size: int = 32):
         """Train the model"""
+        self._require_keras("train")
         if not self.model:
             self.build_model()
         
@@ -95,6 +162,7 @@ class ChessAI:
             validation_data = (X_val, y_val)
         
         # Callbacks
+        tf = tensorflow()
         callbacks = [
             tf.keras.callbacks.EarlyStopping(patience=3, restore_best_weights=True),
             tf.keras.callbacks.ReduceLROnPlateau(factor=0.5, patience=2),
@@ -109,6 +177,30 @@ class ChessAI:
             callbacks=callbacks,
             verbose=1
         )
+        self.invalidate_cache()
+        
+        return history
+    
+    def train_on_datasets(self, train_dataset, val_dataset=None, epochs: int = 10):
+        """Train the model on batched tf.data datasets"""
+        self._require_keras("train")
+        if not self.model:
+            self.build_model()
+        
+        tf = tensorflow()
+        callbacks = [
+            tf.keras.callbacks.EarlyStopping(patience=3, restore_best_weights=True),
+            tf.keras.callbacks.ReduceLROnPlateau(factor=0.5, patience=2),
+        ]
+        
+        history = self.model.fit(
+            train_dataset,
+            validation_data=val_dataset,
+            epochs=epochs,
+            callbacks=callbacks,
+            verbose=1
+        )
+        self.invalidate_cache()
         
         return history
     
@@ -127,18 +219,61 @@ class ChessAI:
     def load_model(self, path: str):
         """Load a trained model"""
         try:
-            self.model = tf.keras.models.load_model(path)
+            self.model = tensorflow().keras.models.load_model(path)
+            self.value_head = len(self.model.outputs) == 2
+            self.compact_policy = self.model.outputs[0].shape[-1] == COMPACT_POLICY_SIZE
+            self.tflite = None
+            self.backend = "keras"
+            self.loaded_path = path
+            self.invalidate_cache()
             print(f"✅ Model loaded from {path}")
         except Exception as e:
             print(f"❌ Failed to load model from {path}: {e}")
             self.build_model()
     
-    def evaluate(self, X_test: np.ndarray, y_test: np.ndarray):
+    def load_tflite(self, path: str, num_threads: Optional[int] = None):
+        """Load a TFLite model and run predictions with the interpreter"""
+        from .tflite_backend import TFLiteBackend
+        self.tflite = TFLiteBackend(path, num_threads=num_threads)
+        self.value_head = self.tflite.value_head
+        self.compact_policy = self.tflite.policy_size == COMPACT_POLICY_SIZE
+        self.model = None
+        self.backend = "tflite"
+        self.loaded_path = path
+        self.invalidate_cache()
+        print(f"✅ TFLite model loaded from {path}")
+    
+    def export_tflite(self, path: str = "models/chess_model.tflite", quantize: Optional[str] = None,
+                      calibration_data: np.ndarray = None) -> dict:
+        """Export the Keras model to TFLite, optionally with int8 quantization"""
+        from .tflite_backend import export_tflite
+        self._require_keras("export")
+        if not self.model:
+            raise ValueError("No model to export")
+        
+        result = export_tflite(self.model, path, quantize, calibration_data)
+        print(f"✅ TFLite model saved to {path} ({result['size_bytes'] / 1e6:.1f} MB)")
+        return result
+    
+    def _require_keras(self, action: str):
+        """Fail for operations that need the Keras model"""
+        if self.tflite:
+            raise ValueError(f"Cannot {action} with the TFLite backend, use the Keras model")
+    
+    def evaluate(self, X_test: np.ndarray, y_test: np.ndarray = None):
         """Evaluate model performance"""
         if not self.model:
             raise ValueError("No model to evaluate")
         
-        loss, accuracy = self.model.evaluate(X_test, y_test, verbose=0)
+        if y_test is None:
+            # X_test is a dataset of (inputs, labels) batches
+            results = self.model.evaluate(X_test, verbose=0, return_dict=True)
+        else:
+            results = self.model.evaluate(X_test, y_test, verbose=0, return_dict=True)
+        
+        # With a value head the policy accuracy is named after its output
+        loss = results["loss"]
+        accuracy = results.get("accuracy", results.get("move_output_accuracy"))
         print(f"Test Loss: {loss:.4f}")
         print(f"Test Accuracy: {accuracy:.4f}")
         
@@ -0,0 +1,286 @@
+import os
+import re
+import time
+import multiprocessing
+import chess
+import numpy as np
+from typing import List, Dict, Iterator, Optional, Tuple, Any
+from .dataset import (COLUMNS, TACTICAL_GAME_ID_OFFSET, pack_masks, write_shard, build_index, policy_name,
+                      prepare_output_dir)
+from .utils import ChessEncoder
+
+# Game IDs number the games of a run in file order and stay below the tactical position ids
+MAX_GAMES = TACTICAL_GAME_ID_OFFSET
+
+# Estimated game duration (base + 40 * increment, in seconds) below which a
+# time control falls in each category, as used by lichess
+TIME_CONTROL_CATEGORIES = [("ultrabullet", 29), ("bullet", 179), ("blitz", 479), ("rapid", 1499)]
+
+TAG_PATTERN = re.compile(rb'^\[(\w+)\s+"(.*)"\]\s*$')
+COMMENT_PATTERN = re.compile(r'\{[^}]*\}|;[^\n]*')
+VARIATION_PATTERN = re.compile(r'\([^()]*\)')
+NOISE_PATTERN = re.compile(r'\$\d+|\d+\.(\.\.)?|1-0|0-1|1/2-1/2|\*')
+
+def time_control_category(time_control: str) -> Optional[str]:
+    """Category of a PGN TimeControl tag such as "300+3", or None if unknown"""
+    if time_control == "-":
+        return "correspondence"
+    match = re.match(r'^(\d+)(?:\+(\d+))?$', time_control)
+    if not match:
+        return None
+    seconds = int(match.group(1)) + 40 * int(match.group(2) or 0)
+    for category, limit in TIME_CONTROL_CATEGORIES:
+        if seconds <= limit:
+            return category
+    return "classical"
+
+class GameFilter:
+    """Decide from its headers whether a PGN game is used"""
+    
+    def __init__(self, min_elo: int = 0, max_elo: Optional[int] = None,
+                 time_controls: Optional[List[str]] = None):
+        self.min_elo = min_elo
+        self.max_elo = max_elo
+        self.time_controls = set(time_controls) if time_controls else None
+    
+    def reject_reason(self, headers: Dict[str, str]) -> Optional[str]:
+        """Name the filter that rejects a game, or None to keep it"""
+        if headers.get("Variant", "Standard").lower() not in ("standard", "chess"):
+            return "variant"
+        
+        if self.min_elo or self.max_elo:
+            try:
+                elos = [int(headers.get(tag, "")) for tag in ("WhiteElo", "BlackElo")]
+            except ValueError:
+                return "rating"  # Unrated or "?"
+            if min(elos) < self.min_elo or (self.max_elo and max(elos) > self.max_elo):
+                return "rating"
+        
+        if self.time_controls and time_control_category(headers.get("TimeControl", "")) not in self.time_controls:
+            return "time_control"
+        return None
+
+def iter_chunk_games(path: str, start: int, end: int) -> Iterator[Tuple[Dict[str, str], str]]:
+    """Read the (headers, movetext) of the games starting in a byte range of a PGN file
+    
+    Games start at their [Event tag, as every exported PGN game does. A game
+    belongs to the chunk its [Event line starts in, so byte ranges can be
+    read independently and each game is read exactly once.
+    """
+    with open(path, 'rb') as f:
+        position = start
+        if start > 0:
+            # Move to the start of the next line, which may be the start itself
+            f.seek(start - 1)
+            position = start - 1 + len(f.readline())
+        
+        headers, movetext = None, []
+        for line in f:
+            if line.startswith(b"[Event "):
+                if headers is not None:
+                    yield headers, b"".join(movetext).decode("utf-8", errors="replace")
+                if position >= end:
+                    return
+                headers, movetext = {}, []
+            position += len(line)
+            
+            if headers is None:
+                continue  # Still inside a game of the previous chunk
+            match = TAG_PATTERN.match(line) if line.startswith(b"[") else None
+            if match:
+                headers[match.group(1).decode()] = match.group(2).decode("utf-8", errors="replace")
+            else:
+                movetext.append(line)
+        
+        if headers is not None:
+            yield headers, b"".join(movetext).decode("utf-8", errors="replace")
+
+def parse_movetext(movetext: str) -> List[str]:
+    """Get the SAN moves of the main line, without comments, variations and annotations"""
+    text = COMMENT_PATTERN.sub(" ", movetext)
+    while "(" in text:
+        stripped = VARIATION_PATTERN.sub(" ", text)
+        if stripped == text:
+            break  # Unbalanced parentheses
+        text = stripped
+    return [token.rstrip("!?") for token in NOISE_PATTERN.sub(" ", text).split()]
+
+def game_positions(headers: Dict[str, str], movetext: str, min_ply: int = 0,
+                   max_ply: Optional[int] = None) -> List[Tuple]:
+    """Replay a game and return (piece bitboards, move, turn, ply) of its positions within the ply range
+    
+    The bitboards are in ChessEncoder.PIECE_PLANES order, which is much
+    cheaper than going through a FEN for every position.
+    """
+    board = chess.Board(headers["FEN"]) if headers.get("SetUp") == "1" and "FEN" in headers else chess.Board()
+    positions = []
+    for ply, san in enumerate(parse_movetext(movetext)):
+        if max_ply is not None and ply >= max_ply:
+            break
+        move = board.parse_san(san)
+        if ply >= min_ply:
+            white, black = board.occupied_co[chess.WHITE], board.occupied_co[chess.BLACK]
+            masks = (board.pawns & white, board.knights & white, board.bishops & white,
+                     board.rooks & white, board.queens & white, board.kings & white,
+                     board.pawns & black, board.knights & black, board.bishops & black,
+                     board.rooks & black, board.queens & black, board.kings & black)
+            positions.append((masks, move, board.turn, ply))
+        board.push(move)
+    return positions
+
+class PositionBuffer:
+    """Collect replayed positions and write them out as binary shards"""
+    
+    def __init__(self, output_dir: str, prefix: str, compact: bool = False):
+        self.output_dir = output_dir
+        self.prefix = prefix
+        self.compact = compact
+        self.shard_names = []
+        self.clear()
+    
+    def __len__(self) -> int:
+        return len(self.masks)
+    
+    def clear(self):
+        """Drop the buffered positions"""
+        self.masks, self.moves, self.promotions = [], [], []
+        self.turns, self.game_ids, self.move_numbers = [], [], []
+    
+    def add_game(self, positions: List[Tuple], game_id: int):
+        """Add the positions of one game"""
+        for masks, move, turn, ply in positions:
+            self.masks.append(masks)
+            self.moves.append(move.from_square * 64 + move.to_square)
+            self.promotions.append(move.promotion or 0)
+            self.turns.append(turn)
+            self.game_ids.append(game_id)
+            self.move_numbers.append(ply)
+    
+    def flush(self) -> int:
+        """Write the buffered positions as a shard and return how many there were"""
+        count = len(self)
+        if not count:
+            return 0
+        moves = np.array(self.moves, dtype=np.int64)
+        promotions = np.array(self.promotions, dtype=COLUMNS["promotion"])
+        if self.compact:
+            moves = ChessEncoder.compact_indices(moves, promotions)
+        
+        arrays = {
+            "planes": pack_masks(np.array(self.masks, dtype='<u8')),
+            "moves": moves.astype(COLUMNS["moves"]),
+            "promotion": promotions,
+            "turn": np.array(self.turns, dtype=COLUMNS["turn"]),
+            "game_id": np.array(self.game_ids, dtype=COLUMNS["game_id"]),
+            "move_number": np.array(self.move_numbers, dtype=COLUMNS["move_number"]),
+        }
+        name = f"{self.prefix}-{len(self.shard_names):03d}"
+        write_shard(arrays, self.output_dir, name)
+        self.shard_names.append(name)
+        self.clear()
+        return count
+
+def _ingest_chunk(task: Tuple) -> Dict[str, Any]:
+    """Worker: parse the games of one byte range and write their positions to shards"""
+    path, chunk_idx, start, end, output_dir, game_filter, min_ply, max_ply, shard_size, compact = task
+    stats = {"games": 0, "kept": 0, "positions": 0, "errors": 0, "rejected": {}, "bytes": end - start}
+    buffer = PositionBuffer(output_dir, f"pgn-{chunk_idx:05d}", compact)
+    
+    for headers, movetext in iter_chunk_games(path, start, end):
+        game_id = stats["games"]  # Within the chunk, see number_games
+        stats["games"] += 1
+        
+        reason = game_filter.reject_reason(headers)
+        if reason is not None:
+            stats["rejected"][reason] = stats["rejected"].get(reason, 0) + 1
+            continue
+        try:
+            positions = game_positions(headers, movetext, min_ply, max_ply)
+        except ValueError:
+            stats["errors"] += 1  # Illegal or unreadable move
+            continue
+        
+        stats["kept"] += 1
+        buffer.add_game(positions, game_id)
+        if len(buffer) >= shard_size:
+            stats["positions"] += buffer.flush()  # Memory stays bounded by the shard size
+    
+    stats["positions"] += buffer.flush()
+    stats["shards"] = buffer.shard_names
+    stats["chunk"] = chunk_idx
+    return stats
+
+def number_games(output_dir: str, chunk_stats: List[Dict[str, Any]]):
+    """Turn the game ids of each chunk's shards into ids over the run
+    
+    Workers cannot know how many games the chunks before theirs hold, so
+    they number games from 0. Once every chunk is counted, the game_id
+    column of each shard is shifted by the games of the earlier chunks.
+    """
+    chunk_stats = sorted(chunk_stats, key=lambda stats: stats["chunk"])
+    total_games = sum(stats["games"] for stats in chunk_stats)
+    if total_games > MAX_GAMES:
+        raise ValueError(f"{total_games:,} games do not fit in the game id range, ingest at most {MAX_GAMES:,}")
+    
+    offset = 0
+    for stats in chunk_stats:
+        if offset:
+            for name in stats["shards"]:
+                game_ids = np.load(os.path.join(output_dir, f"{name}.game_id.npy"))
+                write_shard({"game_id": (game_ids + offset).astype(COLUMNS["game_id"])}, output_dir, name)
+        offset += stats["games"]
+
+def plan_chunks(paths: List[str], chunk_bytes: int) -> List[Tuple[str, int, int]]:
+    """Split PGN files into (path, start, end) byte ranges"""
+    chunks = []
+    for path in paths:
+        size = os.path.getsize(path)
+        for start in range(0, max(size, 1), chunk_bytes):
+            chunks.append((path, start, min(start + chunk_bytes, size)))
+    return chunks
+
+def ingest_pgn(paths: List[str], output_dir: str, game_filter: GameFilter = None, min_ply: int = 0,
+               max_ply: Optional[int] = None, shard_size: int = 65536, chunk_bytes: int = 16 << 20,
+               num_workers: int = None, compact: bool = False, verbose: bool = True,
+               overwrite: bool = False) -> Dict[str, Any]:
+    """Parse PGN files in a process pool and write their positions as binary shards
+    
+    Each worker reads its own byte ranges of the files and writes shards as
+    they fill, so memory use does not depend on the size of the archive.
+    Returns the counters of the run with the games per second.
+    """
+    prepare_output_dir(output_dir, overwrite)
+    game_filter = game_filter or GameFilter()
+    num_workers = num_workers or os.cpu_count() or 1
+    chunks = plan_chunks(paths, chunk_bytes)
+    
+    tasks = [(path, chunk_idx, start, end, output_dir, game_filter, min_ply, max_ply, shard_size, compact)
+             for chunk_idx, (path, start, end) in enumerate(chunks)]
+    totals = {"games": 0, "kept": 0, "positions": 0, "errors": 0, "shards": 0, "rejected": {}}
+    shard_names, chunk_stats = [], []
+    total_bytes = sum(end - start for _, start, end in chunks)
+    done_bytes = 0
+    start_time = time.perf_counter()
+    
+    with multiprocessing.Pool(num_workers) as pool:
+        for stats in pool.imap_unordered(_ingest_chunk, tasks):
+            for key in ("games", "kept", "positions", "errors"):
+                totals[key] += stats[key]
+            totals["shards"] += len(stats["shards"])
+            shard_names.extend(stats["shards"])
+            chunk_stats.append(stats)
+            for reason, count in stats["rejected"].items():
+                totals["rejected"][reason] = totals["rejected"].get(reason, 0) + count
+            
+            done_bytes += stats["bytes"]
+            if verbose:
+                elapsed = time.perf_counter() - start_time
+                print(f"Read {done_bytes / 1e6:,.0f}/{total_bytes / 1e6:,.0f} MB: {totals['games']:,} games "
+                      f"({totals['games'] / elapsed:,.0f}/s), {totals['positions']:,} positions...")
+    
+    number_games(output_dir, chunk_stats)
+    elapsed = time.perf_counter() - start_time
+    totals["time"] = elapsed
+    totals["games_per_sec"] = totals["games"] / elapsed if elapsed > 0 else 0.0
+    totals["index"] = build_index(output_dir, shards=sorted(shard_names), policy=policy_name(compact))
+    return totals
\ No newline at end of file
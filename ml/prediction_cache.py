@@ -0,0 +1,124 @@
+import sys
+import threading
+import chess
+import chess.polyglot
+import numpy as np
+from collections import OrderedDict
+from typing import List, Tuple, Optional, Dict, Any
+from .utils import ChessEncoder
+
+class PredictionCache:
+    """Thread-safe LRU cache of model predictions keyed by position hash
+    
+    Entries are either full policy vectors or, when top_k is set, only the
+    k most probable legal moves, which are much smaller. The Zobrist key
+    covers placement, side to move, castling and en passant, so it also
+    determines the legal moves a cached prediction is decoded against.
+    """
+    
+    def __init__(self, max_bytes: int = 64 << 20, top_k: Optional[int] = None):
+        self.max_bytes = max_bytes
+        self.top_k = top_k
+        
+        self._entries = OrderedDict()  # key -> (value, size), least recently used first
+        self._lock = threading.Lock()
+        self.generation = 0
+        self.bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+    
+    @staticmethod
+    def position_key(board: chess.Board) -> int:
+        """Get the cache key of a position"""
+        return chess.polyglot.zobrist_hash(board)
+    
+    def get(self, key: int, min_moves: int = 0) -> Optional[Any]:
+        """Get a cached value and mark it as most recently used
+        
+        Cached top-move lists shorter than min_moves that do not hold all
+        legal moves count as a miss.
+        """
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None and not isinstance(item[0], np.ndarray):
+                top_moves, complete = item[0]
+                if len(top_moves) < min_moves and not complete:
+                    item = None
+            if item is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return item[0]
+    
+    def put(self, key: int, value: Any, generation: int = None):
+        """Store a value, dropping it if the model changed since it was predicted"""
+        size = self._sizeof(value)
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            if size > self.max_bytes:
+                return
+            
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self._entries[key] = (value, size)
+            self.bytes += size
+            
+            while self.bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.stats["evictions"] += 1
+    
+    def invalidate(self):
+        """Drop all entries, e.g. after the model weights changed"""
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+            self.generation += 1
+            self.stats["invalidations"] += 1
+    
+    def get_top_k(self, board: chess.Board, k: int = 1, key: int = None) -> Optional[List[Tuple[str, float]]]:
+        """Get the k most probable legal moves from the cache, or None on a miss"""
+        value = self.get(self.position_key(board) if key is None else key, min_moves=k)
+        if value is None:
+            return None
+        if isinstance(value, np.ndarray):
+            return ChessEncoder.top_k_legal_moves(board, value, k)
+        return value[0][:k]
+    
+    def put_policy(self, board: chess.Board, policy: np.ndarray, generation: int,
+                   k: int = 1, key: int = None):
+        """Cache the prediction for a position, as a policy vector or its top moves"""
+        key = self.position_key(board) if key is None else key
+        if self.top_k is None:
+            value = np.array(policy, dtype=np.float32)
+            value.setflags(write=False)
+        else:
+            k = max(k, self.top_k)
+            top_moves = ChessEncoder.top_k_legal_moves(board, policy, k)
+            value = (top_moves, len(top_moves) < k)
+        self.put(key, value, generation)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache counters"""
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return dict(self.stats, entries=len(self._entries), bytes=self.bytes,
+                        max_bytes=self.max_bytes, generation=self.generation,
+                        hit_rate=self.stats["hits"] / lookups if lookups else 0.0)
+    
+    @staticmethod
+    def _sizeof(value: Any) -> int:
+        """Approximate memory used by a cached value"""
+        if isinstance(value, np.ndarray):
+            return sys.getsizeof(value) + (0 if value.flags.owndata else value.nbytes)
+        top_moves, _ = value
+        size = sys.getsizeof(value) + sys.getsizeof(top_moves)
+        for move, prob in top_moves:
+            size += sys.getsizeof((move, prob)) + sys.getsizeof(move) + sys.getsizeof(prob)
+        return size
\ No newline at end of file
@@ -0,0 +1,109 @@
+import threading
+import time
+import numpy as np
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+# Seconds spent in each startup stage, in the order they ran
+startup_times: Dict[str, float] = OrderedDict()
+_times_lock = threading.Lock()
+_open_stages = threading.local()  # Time spent in nested stages, per thread
+_tensorflow = None
+
+@contextmanager
+def timed(stage: str):
+    """Record how long a startup stage takes, excluding the stages nested in it"""
+    if not hasattr(_open_stages, "nested"):
+        _open_stages.nested = []
+    stack = _open_stages.nested
+    stack.append(0.0)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        nested = stack.pop()
+        if stack:
+            stack[-1] += elapsed
+        with _times_lock:
+            startup_times[stage] = startup_times.get(stage, 0.0) + elapsed - nested
+
+def tensorflow():
+    """Import TensorFlow on first use, so modules that only serve moves stay light"""
+    global _tensorflow
+    if _tensorflow is None:
+        with timed("import tensorflow"):
+            import tensorflow as tf
+        _tensorflow = tf
+    return _tensorflow
+
+def get_startup_times() -> Dict[str, float]:
+    """Copy of the recorded startup stages in seconds"""
+    with _times_lock:
+        return {stage: round(seconds, 4) for stage, seconds in startup_times.items()}
+
+def startup_report() -> str:
+    """Format the startup stages and their durations"""
+    with _times_lock:
+        stages = list(startup_times.items())
+    lines = [f"   {stage:<20} {seconds * 1000:8.1f} ms" for stage, seconds in stages]
+    return "\n".join(["⏱️ Startup time:"] + lines)
+
+class BackgroundModelLoader:
+    """Load a model and run a warm-up prediction in a background thread
+    
+    The first forward pass builds the graph and allocates buffers, so it is
+    run here rather than on the first move request. Until ready is set,
+    callers are expected to answer with a fast fallback.
+    """
+    
+    def __init__(self, load_fn: Callable[[], object], on_ready: Callable[[object], None] = None):
+        self.load_fn = load_fn
+        self.on_ready = on_ready
+        self.model = None
+        self.error: Optional[Exception] = None
+        self.ready = threading.Event()  # Set once the model is warmed up
+        self.done = threading.Event()  # Set when loading finished, successfully or not
+        self._thread = None
+    
+    def start(self):
+        """Start loading in a daemon thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="model-loader", daemon=True)
+            self._thread.start()
+        return self
+    
+    def wait(self, timeout: float = None) -> bool:
+        """Wait for loading to finish and return whether the model is ready"""
+        self.done.wait(timeout)
+        return self.ready.is_set()
+    
+    def is_ready(self) -> bool:
+        """Whether the model is loaded and warmed up"""
+        return self.ready.is_set()
+    
+    def get_status(self) -> Dict:
+        """Readiness and the startup breakdown so far"""
+        return {
+            "ready": self.ready.is_set(),
+            "loading": self._thread is not None and not self.done.is_set(),
+            "error": str(self.error) if self.error else None,
+            "startup_times": get_startup_times()
+        }
+    
+    def _run(self):
+        """Load, warm up and publish the model"""
+        try:
+            with timed("load model"):
+                model = self.load_fn()
+            with timed("warm-up"):
+                model.predict_policies(np.zeros((1, 8, 8, 12), dtype=np.float32))
+            if self.on_ready:
+                self.on_ready(model)
+            self.model = model
+            self.ready.set()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done.set()
\ No newline at end of file
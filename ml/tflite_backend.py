@@ -0,0 +1,150 @@
+import os
+import random
+import threading
+import numpy as np
+from typing import Dict, Any, Optional, Tuple
+from .dataset import ShardedDataset, is_sharded_dataset, PLANE_SHAPE
+from .utils import ChessEncoder
+from .startup import tensorflow
+
+QUANTIZATION_MODES = (None, "dynamic", "int8")
+
+def _load_interpreter_class():
+    """Find the lightest available TFLite interpreter, falling back to full TensorFlow"""
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        pass
+    try:
+        from tflite_runtime.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        pass
+    tf = tensorflow()
+    return tf.lite.Interpreter
+
+def load_calibration_positions(dataset_path: str, num_positions: int = 500, seed: int = 0) -> np.ndarray:
+    """Sample encoded positions from a dataset to calibrate quantization"""
+    rng = random.Random(seed)
+    if os.path.isdir(dataset_path) and is_sharded_dataset(dataset_path):
+        dataset = ShardedDataset(dataset_path)
+        rows = sorted(rng.sample(range(len(dataset)), min(num_positions, len(dataset))))
+        return dataset.get_batch(np.array(rows, dtype=np.int64))[0]
+    
+    from .data_generator import ChessDataGenerator
+    generator = ChessDataGenerator()
+    if os.path.isdir(dataset_path):
+        records = list(generator.iter_shards(dataset_path))
+    else:
+        records = generator.load_dataset(dataset_path)
+    records = rng.sample(records, min(num_positions, len(records)))
+    return ChessEncoder.boards_to_tensor([record["fen"] for record in records])
+
+def export_tflite(model, output_path: str, quantize: Optional[str] = None,
+                  calibration_data: np.ndarray = None) -> Dict[str, Any]:
+    """Convert a Keras model to a TFLite flatbuffer, optionally quantized
+    
+    "dynamic" stores int8 weights, "int8" also runs the activations in int8
+    using ranges calibrated on calibration_data. Inputs and outputs stay
+    float32 either way, so callers do not change.
+    """
+    tf = tensorflow()
+    
+    if quantize not in QUANTIZATION_MODES:
+        raise ValueError(f"Unknown quantization mode {quantize!r}, expected one of {QUANTIZATION_MODES}")
+    
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if quantize:
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantize == "int8":
+        if calibration_data is None or len(calibration_data) == 0:
+            raise ValueError("int8 quantization needs calibration positions")
+        
+        def representative_dataset():
+            for i in range(len(calibration_data)):
+                yield [np.asarray(calibration_data[i:i + 1], dtype=np.float32)]
+        
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    
+    flatbuffer = converter.convert()
+    
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open(output_path, 'wb') as f:
+        f.write(flatbuffer)
+    
+    return {"path": output_path, "quantize": quantize, "size_bytes": len(flatbuffer)}
+
+class TFLiteBackend:
+    """Run a TFLite policy model, with or without a value head, with the interpreter, without loading Keras"""
+    
+    def __init__(self, model_path: str, num_threads: Optional[int] = None):
+        self.model_path = model_path
+        interpreter_class = _load_interpreter_class()
+        self.interpreter = interpreter_class(model_path=model_path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        
+        self.input = self.interpreter.get_input_details()[0]
+        self._find_outputs()
+        self.policy_size = int(self.output["shape"][-1])
+        self.value_head = self.value_output is not None
+        self.batch_size = int(self.input["shape"][0])
+        self._lock = threading.Lock()  # The interpreter is not thread-safe
+    
+    def _find_outputs(self):
+        """Tell the policy output from the value output by shape, TFLite does not keep the Keras output order"""
+        outputs = sorted(self.interpreter.get_output_details(), key=lambda details: int(details["shape"][-1]))
+        if len(outputs) > 2 or (len(outputs) == 2 and int(outputs[0]["shape"][-1]) != 1):
+            raise ValueError(f"Expected a policy output and at most one value output, got "
+                             f"{[list(details['shape']) for details in outputs]}")
+        self.output = outputs[-1]
+        self.value_output = outputs[0] if len(outputs) == 2 else None
+    
+    def predict(self, board_tensors: np.ndarray) -> np.ndarray:
+        """Get move probability vectors for a batch of encoded positions"""
+        with self._lock:
+            self._invoke(board_tensors)
+            return self._dequantize(self.interpreter.get_tensor(self.output["index"]), self.output)
+    
+    def predict_with_values(self, board_tensors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Get move probability vectors and position values for a batch of encoded positions"""
+        if not self.value_head:
+            raise ValueError(f"{self.model_path} has no value output")
+        with self._lock:
+            self._invoke(board_tensors)
+            policies = self._dequantize(self.interpreter.get_tensor(self.output["index"]), self.output)
+            values = self._dequantize(self.interpreter.get_tensor(self.value_output["index"]), self.value_output)
+            return policies, values.reshape(-1)
+    
+    def _invoke(self, board_tensors: np.ndarray):
+        """Run the interpreter on a batch (lock must be held)"""
+        board_tensors = np.asarray(board_tensors).reshape((-1,) + PLANE_SHAPE)
+        n = len(board_tensors)
+        if n != self.batch_size:
+            # Resizing reallocates the tensors, so keep the last batch size
+            self.interpreter.resize_tensor_input(self.input["index"], [n] + list(PLANE_SHAPE))
+            self.interpreter.allocate_tensors()
+            self.input = self.interpreter.get_input_details()[0]
+            self._find_outputs()
+            self.batch_size = n
+        
+        self.interpreter.set_tensor(self.input["index"], self._quantize(board_tensors, self.input))
+        self.interpreter.invoke()
+    
+    @staticmethod
+    def _quantize(values: np.ndarray, details: Dict) -> np.ndarray:
+        """Convert float inputs for models with integer inputs"""
+        if details["dtype"] == np.float32:
+            return values.astype(np.float32, copy=False)
+        scale, zero_point = details["quantization"]
+        info = np.iinfo(details["dtype"])
+        return np.clip(np.round(values / scale + zero_point), info.min, info.max).astype(details["dtype"])
+    
+    @staticmethod
+    def _dequantize(values: np.ndarray, details: Dict) -> np.ndarray:
+        """Convert integer outputs back to probabilities"""
+        if details["dtype"] == np.float32:
+            return values.copy()
+        scale, zero_point = details["quantization"]
+        return (values.astype(np.float32) - zero_point) * scale
\ No newline at end of file
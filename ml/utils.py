@@ -1,10 +1,74 @@
 import chess
 import numpy as np
-from typing import List, Tuple, Dict
+from typing import List, Tuple, Dict, Union
+
+# Policy output sizes: every from-to pair, or only the moves a piece can make
+FROM_TO_POLICY_SIZE = 4096
+UNDERPROMOTIONS = (chess.KNIGHT, chess.BISHOP, chess.ROOK)
+
+def _build_compact_moves() -> List[chess.Move]:
+    """Moves of the compact policy: queen lines and knight jumps, then underpromotions
+    
+    Queen promotions share the index of their from-to pair, which no other
+    piece can use in the same position, so every legal move has its own index.
+    """
+    moves = []
+    for from_square in chess.SQUARES:
+        for to_square in chess.SQUARES:
+            rank_delta = abs(chess.square_rank(to_square) - chess.square_rank(from_square))
+            file_delta = abs(chess.square_file(to_square) - chess.square_file(from_square))
+            if from_square == to_square:
+                continue
+            if rank_delta == 0 or file_delta == 0 or rank_delta == file_delta or \
+                    sorted((rank_delta, file_delta)) == [1, 2]:
+                moves.append(chess.Move(from_square, to_square))
+    
+    # Pawn moves onto the last rank, straight or capturing, for both colors
+    for from_rank, to_rank in ((6, 7), (1, 0)):
+        for from_file in range(8):
+            for to_file in range(max(from_file - 1, 0), min(from_file + 2, 8)):
+                for promotion in UNDERPROMOTIONS:
+                    moves.append(chess.Move(chess.square(from_file, from_rank), chess.square(to_file, to_rank),
+                                            promotion))
+    return moves
+
+def _build_compact_index(moves: List[chess.Move]) -> np.ndarray:
+    """Lookup table [promotion piece type, from * 64 + to] -> compact index, -1 if unreachable"""
+    table = np.full((chess.KING, FROM_TO_POLICY_SIZE), -1, dtype=np.int16)
+    for index, move in enumerate(moves):
+        table[move.promotion or 0, move.from_square * 64 + move.to_square] = index
+    table[chess.QUEEN] = table[0]
+    return table
+
+COMPACT_MOVES = _build_compact_moves()
+COMPACT_POLICY_SIZE = len(COMPACT_MOVES)  # 1924
+COMPACT_INDEX = _build_compact_index(COMPACT_MOVES)
+COMPACT_MOVE_UCI = [move.uci() for move in COMPACT_MOVES]
+_COMPACT_INDEX_ROWS = COMPACT_INDEX.tolist()  # Plain lists are faster for one move at a time
+
+# Color flip: the board mirrored top to bottom (square s -> s ^ 56) with the
+# colors swapped, white planes 0-5 trading places with black planes 6-11
+MIRROR_PLANES = np.array(list(range(6, 12)) + list(range(6)))
+
+def _build_mirror_tables() -> Tuple[np.ndarray, np.ndarray]:
+    """Permutations taking each from-to and compact index to the index of the mirrored move"""
+    from_to = np.arange(FROM_TO_POLICY_SIZE)
+    mirror_from_to = (from_to // 64 ^ 56) * 64 + (from_to % 64 ^ 56)
+    mirror_compact = np.array([COMPACT_INDEX[move.promotion or 0,
+                                             mirror_from_to[move.from_square * 64 + move.to_square]]
+                               for move in COMPACT_MOVES])
+    return mirror_from_to.astype(np.int32), mirror_compact.astype(np.int32)
+
+MIRROR_FROM_TO, MIRROR_COMPACT = _build_mirror_tables()
 
 class ChessEncoder:
     """Utilities for encoding chess positions and moves"""
     
+    # Plane order used by the encoders: white pieces 0-5, black pieces 6-11
+    PIECE_PLANES = [(color, piece_type) for color in (chess.WHITE, chess.BLACK)
+                    for piece_type in chess.PIECE_TYPES]
+    PIECE_LETTERS = np.frombuffer(b'PNBRQKpnbrqk', dtype=np.uint8)
+    
     @staticmethod
     def fen_to_tensor(fen: str) -> np.ndarray:
         """Convert FEN string to neural network input tensor"""
@@ -34,18 +98,80 @@ class ChessEncoder:
         return tensor
     
     @staticmethod
-    def move_to_index(move_uci: str) -> int:
-        """Convert UCI move to index for classification"""
+    def boards_to_tensor(positions: List[Union[str, chess.BaseBoard]], out: np.ndarray = None) -> np.ndarray:
+        """Convert a batch of FENs or boards to an (N, 8, 8, 12) input tensor"""
+        n = len(positions)
+        if out is None:
+            out = np.empty((n, 8, 8, 12), dtype=np.float32)
+        elif out.shape[0] < n or out.shape[1:] != (8, 8, 12):
+            raise ValueError(f"Output buffer of shape {out.shape} cannot hold {n} positions")
+        
+        # FEN placement fields can be matched against the piece letters directly
+        if all(isinstance(position, str) for position in positions):
+            rows = bytearray()
+            for fen in positions:
+                placement = fen.split(' ', 1)[0].replace('/', '')
+                for digit in '2345678':
+                    placement = placement.replace(digit, '1' * int(digit))
+                if len(placement) != 64:
+                    raise ValueError(f"Invalid FEN piece placement: {fen!r}")
+                rows += placement.encode()
+            squares = np.frombuffer(bytes(rows), dtype=np.uint8).reshape(n, 8, 8, 1)
+            np.equal(squares, ChessEncoder.PIECE_LETTERS, out=out[:n], casting='unsafe')
+            return out[:n]
+        
+        # Collect the 12 piece bitboards of every position
+        masks = np.empty((n, 12), dtype='<u8')
+        for i, position in enumerate(positions):
+            if isinstance(position, str):
+                position = chess.BaseBoard(position.split(' ', 1)[0])
+            masks[i] = [position.pieces_mask(piece_type, color)
+                        for color, piece_type in ChessEncoder.PIECE_PLANES]
+        
+        # Expand each bitboard to 64 bits, square a1 first
+        bits = np.unpackbits(masks.view(np.uint8), axis=1, bitorder='little')
+        planes = bits.reshape(n, 12, 8, 8)[:, :, ::-1, :]  # Flip ranks so row 0 is rank 8
+        out[:n] = planes.transpose(0, 2, 3, 1)
+        
+        return out[:n]
+    
+    @staticmethod
+    def policy_size(compact: bool = False) -> int:
+        """Number of policy outputs of a move index space"""
+        return COMPACT_POLICY_SIZE if compact else FROM_TO_POLICY_SIZE
+    
+    @staticmethod
+    def move_to_index(move_uci: str, compact: bool = False) -> int:
+        """Convert UCI move to index for classification
+        
+        Compact indices are -1 for moves no piece can make, which have no output.
+        """
         # Simple encoding: from_square * 64 + to_square
         try:
             move = chess.Move.from_uci(move_uci)
-            return move.from_square * 64 + move.to_square
         except:
-            return 0
+            return -1 if compact else 0
+        from_to = move.from_square * 64 + move.to_square
+        if not compact:
+            return from_to
+        return _COMPACT_INDEX_ROWS[move.promotion or 0][from_to]
+    
+    @staticmethod
+    def moves_to_indices(moves_uci: List[str], compact: bool = False) -> np.ndarray:
+        """Convert UCI moves to indices, refusing moves without one"""
+        indices = np.array([ChessEncoder.move_to_index(move_uci, compact) for move_uci in moves_uci], dtype=np.int64)
+        if (indices < 0).any():
+            invalid = [move_uci for move_uci, index in zip(moves_uci, indices) if index < 0]
+            raise ValueError(f"{len(invalid)} moves cannot be made by any piece, e.g. {invalid[0]!r}")
+        return indices
     
     @staticmethod
-    def index_to_move(index: int) -> str:
+    def index_to_move(index: int, compact: bool = False) -> str:
         """Convert index back to UCI move"""
+        if compact:
+            # Queen promotions come back without the promotion suffix, like from-to indices
+            return COMPACT_MOVE_UCI[index] if 0 <= index < COMPACT_POLICY_SIZE else "a1a1"
+        
         from_square = index // 64
         to_square = index % 64
         
@@ -56,8 +182,35 @@ class ChessEncoder:
             return "a1a1"
     
     @staticmethod
-    def get_all_possible_moves() -> List[str]:
+    def compact_indices(from_to: np.ndarray, promotion: np.ndarray = None) -> np.ndarray:
+        """Map from-to move indices, with their promotion piece types, to compact indices"""
+        from_to = np.asarray(from_to, dtype=np.int64)
+        promotion = np.zeros(len(from_to), dtype=np.int64) if promotion is None else np.asarray(promotion)
+        indices = COMPACT_INDEX[promotion, from_to]
+        if (indices < 0).any():
+            raise ValueError(f"{int((indices < 0).sum())} moves cannot be made by any piece")
+        return indices
+    
+    @staticmethod
+    def mirror_table(compact: bool = False) -> np.ndarray:
+        """Permutation of a move index space under the color flip"""
+        return MIRROR_COMPACT if compact else MIRROR_FROM_TO
+    
+    @staticmethod
+    def mirror_tensors(board_tensors: np.ndarray) -> np.ndarray:
+        """Color flip a batch of (N, 8, 8, 12) tensors: mirror the ranks and swap the color planes"""
+        return board_tensors[:, ::-1, :, MIRROR_PLANES]
+    
+    @staticmethod
+    def mirror_moves(indices: np.ndarray, compact: bool = False) -> np.ndarray:
+        """Color flip a batch of move indices"""
+        return ChessEncoder.mirror_table(compact)[np.asarray(indices)]
+    
+    @staticmethod
+    def get_all_possible_moves(compact: bool = False) -> List[str]:
         """Get all possible UCI moves (for output layer size)"""
+        if compact:
+            return list(COMPACT_MOVE_UCI)
         moves = []
         for from_sq in range(64):
             for to_sq in range(64):
@@ -82,4 +235,48 @@ class ChessEncoder:
             return max(legal_predictions, key=lambda x: x[1])[0]
         else:
             # Fallback to random legal move
-            return np.random.choice(legal_moves) if legal_moves else "a1a1"
\ No newline at end of file
+            return np.random.choice(legal_moves) if legal_moves else "a1a1"
+    
+    @staticmethod
+    def legal_moves_with_indices(board: chess.Board, compact: bool = False) -> Tuple[np.ndarray, List[chess.Move]]:
+        """Get policy output indices and moves for all legal moves"""
+        indices = []
+        moves = []
+        if compact:
+            # Every promotion has its own index
+            for move in board.legal_moves:
+                indices.append(_COMPACT_INDEX_ROWS[move.promotion or 0][move.from_square * 64 + move.to_square])
+                moves.append(move)
+            return np.array(indices, dtype=np.int64), moves
+        
+        for move in board.legal_moves:
+            # Promotions share one from-to index, let the queen stand for it
+            if move.promotion and move.promotion != chess.QUEEN:
+                continue
+            indices.append(move.from_square * 64 + move.to_square)
+            moves.append(move)
+        return np.array(indices, dtype=np.int64), moves
+    
+    @staticmethod
+    def legal_move_indices(board: chess.Board, compact: bool = False) -> Tuple[np.ndarray, List[str]]:
+        """Get policy output indices and UCI strings for all legal moves"""
+        indices, moves = ChessEncoder.legal_moves_with_indices(board, compact)
+        return indices, [move.uci() for move in moves]
+    
+    @staticmethod
+    def top_k_legal_moves(board: chess.Board, policy: np.ndarray, k: int = 1) -> List[Tuple[str, float]]:
+        """Get the k most probable legal moves from a policy vector of either index space"""
+        policy = np.asarray(policy)
+        indices, moves = ChessEncoder.legal_move_indices(board, compact=len(policy) == COMPACT_POLICY_SIZE)
+        if not moves:
+            return []
+        
+        probs = policy[indices]
+        k = min(k, len(moves))
+        if k == 1:
+            order = [int(np.argmax(probs))]
+        else:
+            order = np.argpartition(-probs, k - 1)[:k]
+            order = order[np.argsort(-probs[order], kind='stable')]
+        
+        return [(moves[i], float(probs[i])) for i in order]
\ No newline at end of file
@@ -31,13 +31,14 @@ def main():
         sys.path.insert(0, web_dir)
         os.chdir(web_dir)
         
-        from app import app
+        from app import app, initialize_ai
+        initialize_ai()
         print("✅ Server starting...")
         print("🌐 Open http://localhost:5000 in your browser")
         print("⏹️  Press Ctrl+C to stop the server")
         
         app.run(debug=False, host='0.0.0.0', port=5000)
-        
+    
     except KeyboardInterrupt:
         print("\n👋 Server stopped. Goodbye!")
     except Exception as e:
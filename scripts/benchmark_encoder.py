@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Benchmark the per-square and batched position encoders
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import random
+import time
+import chess
+import numpy as np
+from ml.utils import ChessEncoder
+
+def random_positions(num_positions: int, seed: int = 0) -> list:
+    """Collect positions from random games"""
+    rng = random.Random(seed)
+    board = chess.Board()
+    boards = []
+    
+    while len(boards) < num_positions:
+        legal_moves = list(board.legal_moves)
+        if board.is_game_over() or len(board.move_stack) >= 100:
+            board = chess.Board()
+            continue
+        board.push(rng.choice(legal_moves))
+        boards.append(board.copy(stack=False))
+    
+    return boards
+
+def time_call(func, repeat: int) -> float:
+    """Return the best wall time of several runs"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark chess position encoders")
+    parser.add_argument("--positions", type=int, default=10000, help="Number of positions")
+    parser.add_argument("--batch-size", type=int, default=1024, help="Batch size for the batched encoder")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement")
+    args = parser.parse_args()
+    
+    encoder = ChessEncoder()
+    boards = random_positions(args.positions)
+    fens = [board.fen() for board in boards]
+    n = len(fens)
+    
+    # Make sure both paths agree before timing them
+    reference = np.stack([encoder.fen_to_tensor(fen) for fen in fens[:100]])
+    assert np.array_equal(encoder.boards_to_tensor(fens[:100]), reference)
+    
+    buffer = np.empty((args.batch_size, 8, 8, 12), dtype=np.float32)
+    
+    def batched(positions):
+        for start in range(0, n, args.batch_size):
+            encoder.boards_to_tensor(positions[start:start + args.batch_size], out=buffer)
+    
+    results = [
+        ("per-square (fen_to_tensor)", time_call(lambda: [encoder.fen_to_tensor(fen) for fen in fens], args.repeat)),
+        ("batched from FENs", time_call(lambda: batched(fens), args.repeat)),
+        ("batched from boards", time_call(lambda: batched(boards), args.repeat)),
+    ]
+    
+    print(f"📊 Encoding {n} positions (batch size {args.batch_size})")
+    baseline = results[0][1]
+    for name, seconds in results:
+        print(f"{name:28s} {seconds * 1000:9.1f} ms  {n / seconds:12,.0f} pos/s  {baseline / seconds:5.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Benchmark move prediction latency and throughput over batch sizes and thread settings
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import hashlib
+import json
+import multiprocessing
+import platform
+import random
+import time
+import chess
+import numpy as np
+from ml.utils import ChessEncoder
+
+def planes_to_fen(planes: np.ndarray, white_to_move: bool) -> str:
+    """Rebuild a FEN from encoded planes, without castling or en passant rights"""
+    board = chess.Board.empty()
+    for row, col, plane in zip(*np.nonzero(planes)):
+        color, piece_type = ChessEncoder.PIECE_PLANES[plane]
+        board.set_piece_at((7 - row) * 8 + col, chess.Piece(piece_type, color))
+    board.turn = white_to_move
+    return board.fen()
+
+def random_corpus(num_positions: int, seed: int) -> list:
+    """Positions from seeded random games, for when there is no dataset"""
+    rng = random.Random(seed)
+    board = chess.Board()
+    fens = []
+    while len(fens) < num_positions:
+        if board.is_game_over() or len(board.move_stack) >= 100:
+            board = chess.Board()
+            continue
+        board.push(rng.choice(list(board.legal_moves)))
+        if not board.is_game_over():
+            fens.append(board.fen())
+    return fens
+
+def load_corpus(dataset_path: str, num_positions: int, seed: int) -> list:
+    """Sample a fixed set of position FENs from a dataset"""
+    from ml.dataset import ShardedDataset, is_sharded_dataset
+    rng = random.Random(seed)
+    
+    if not os.path.exists(dataset_path):
+        print(f"⚠️ {dataset_path} not found, using positions from random games")
+        return random_corpus(num_positions, seed)
+    
+    if os.path.isdir(dataset_path) and is_sharded_dataset(dataset_path):
+        dataset = ShardedDataset(dataset_path)
+        rows = np.array(sorted(rng.sample(range(len(dataset)), min(num_positions, len(dataset)))), dtype=np.int64)
+        planes = dataset.get_batch(rows)[0]
+        turns = dataset.get(rows, "turn")
+        return [planes_to_fen(p, bool(turn)) for p, turn in zip(planes, turns)]
+    
+    from ml.data_generator import ChessDataGenerator
+    generator = ChessDataGenerator()
+    records = list(generator.iter_shards(dataset_path)) if os.path.isdir(dataset_path) \
+        else generator.load_dataset(dataset_path)
+    records = rng.sample(records, min(num_positions, len(records)))
+    return [record["fen"] for record in records]
+
+def configure_threads(backend: str, threads: int):
+    """Limit TensorFlow to a number of threads, before anything runs on it"""
+    if backend == "keras" and threads:
+        from ml.startup import tensorflow
+        tf = tensorflow()
+        tf.config.threading.set_intra_op_parallelism_threads(threads)
+        tf.config.threading.set_inter_op_parallelism_threads(threads)
+
+def percentiles(times: list) -> dict:
+    """Latency summary in milliseconds"""
+    ms = np.array(times) * 1000
+    return {
+        "mean": round(float(ms.mean()), 3),
+        "p50": round(float(np.percentile(ms, 50)), 3),
+        "p95": round(float(np.percentile(ms, 95)), 3),
+        "p99": round(float(np.percentile(ms, 99)), 3)
+    }
+
+def measure_batches(ai, fens: list, boards: list, batch_size: int, repeat: int) -> dict:
+    """Time encode, forward pass and move decoding for every batch of the corpus"""
+    encoder = ai.encoder
+    buffer = np.empty((batch_size, 8, 8, 12), dtype=np.float32)
+    ai.predict_policies(encoder.boards_to_tensor(fens[:batch_size], out=buffer))  # Warm-up
+    
+    totals, stages = [], {"encode": [], "forward": [], "decode": []}
+    positions = 0
+    for _ in range(repeat):
+        for start in range(0, len(fens) - batch_size + 1, batch_size):
+            t0 = time.perf_counter()
+            tensors = encoder.boards_to_tensor(fens[start:start + batch_size], out=buffer)
+            t1 = time.perf_counter()
+            policies = ai.predict_policies(tensors)
+            t2 = time.perf_counter()
+            for board, policy in zip(boards[start:start + batch_size], policies):
+                encoder.top_k_legal_moves(board, policy, 1)
+            t3 = time.perf_counter()
+            
+            stages["encode"].append(t1 - t0)
+            stages["forward"].append(t2 - t1)
+            stages["decode"].append(t3 - t2)
+            totals.append(t3 - t0)
+            positions += batch_size
+    
+    return {
+        "batch_size": batch_size,
+        "calls": len(totals),
+        "positions_per_sec": round(positions / sum(totals), 1),
+        "latency_ms": percentiles(totals),
+        "breakdown_ms": {stage: round(float(np.mean(times)) * 1000, 3) for stage, times in stages.items()}
+    }
+
+def measure_predict_move(ai, fens: list, repeat: int) -> dict:
+    """Time the public ChessAI.predict_move call one position at a time"""
+    ai.predict_move(fens[0])  # Warm-up
+    times = []
+    for _ in range(repeat):
+        for fen in fens:
+            start = time.perf_counter()
+            ai.predict_move(fen)
+            times.append(time.perf_counter() - start)
+    return {
+        "batch_size": 1,
+        "calls": len(times),
+        "positions_per_sec": round(len(times) / sum(times), 1),
+        "latency_ms": percentiles(times)
+    }
+
+def run_setting(task: dict) -> dict:
+    """Load the model with one thread setting and measure every batch size"""
+    configure_threads(task["backend"], task["threads"])
+    from ml.model import ChessAI
+    
+    # No cache, every call must reach the model
+    num_threads = task["threads"] if task["backend"] == "tflite" and task["threads"] else None
+    ai = ChessAI(task["model"], cache_bytes=0, backend=task["backend"], num_threads=num_threads)
+    if ai.loaded_path is None:
+        # ChessAI falls back to an untrained network, whose timings say nothing about the model
+        raise RuntimeError(f"Could not load {task['model']}")
+    fens = task["fens"]
+    boards = [chess.Board(fen) for fen in fens]
+    
+    results = [dict(measure_batches(ai, fens, boards, batch_size, task["repeat"]), threads=task["threads"])
+               for batch_size in task["batch_sizes"] if batch_size <= len(fens)]
+    if task["predict_move_positions"]:
+        result = measure_predict_move(ai, fens[:task["predict_move_positions"]], task["repeat"])
+        results.append(dict(result, threads=task["threads"], api="predict_move"))
+    return {"results": results}
+
+def print_results(results: list, previous: dict = None):
+    """Print a results table, with the throughput change against a previous run"""
+    before = {}
+    for result in (previous or {}).get("results", []):
+        before[(result["threads"], result["batch_size"], result.get("api"))] = result["positions_per_sec"]
+    
+    header = (f"{'threads':>7s} {'batch':>6s} {'pos/s':>10s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s}"
+              f" {'encode':>8s} {'forward':>8s} {'decode':>8s}")
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        latency = result["latency_ms"]
+        breakdown = result.get("breakdown_ms")
+        stages = " ".join(f"{breakdown[stage]:8.2f}" for stage in ("encode", "forward", "decode")) \
+            if breakdown else f"{'(predict_move)':>26s}"
+        row = (f"{result['threads'] or 'auto':>7} {result['batch_size']:6d} {result['positions_per_sec']:10,.0f}"
+               f" {latency['p50']:9.2f} {latency['p95']:9.2f} {latency['p99']:9.2f} {stages}")
+        key = (result["threads"], result["batch_size"], result.get("api"))
+        if key in before:
+            row += f"  {result['positions_per_sec'] / before[key] - 1:+.1%}"
+        print(row)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark move prediction latency and throughput")
+    parser.add_argument("--model", default="models/chess_model.h5", help="Keras or TFLite model")
+    parser.add_argument("--backend", choices=["keras", "tflite"], help="Model backend (default from the extension)")
+    parser.add_argument("--dataset", default="data/chess_dataset.json", help="Dataset to take positions from")
+    parser.add_argument("--positions", type=int, default=512, help="Positions in the corpus")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the corpus sample")
+    parser.add_argument("--batch-sizes", default="1,8,32,128", help="Comma-separated batch sizes")
+    parser.add_argument("--threads", default="0", help="Comma-separated thread counts, 0 for the default")
+    parser.add_argument("--repeat", type=int, default=3, help="Passes over the corpus per measurement")
+    parser.add_argument("--predict-move-positions", type=int, default=100,
+                        help="Positions to time through ChessAI.predict_move, 0 to skip")
+    parser.add_argument("--label", default="", help="Name of this run in the results")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", help="Results JSON of an earlier run to compare against")
+    args = parser.parse_args()
+    
+    if not os.path.isfile(args.model):
+        parser.error(f"Model {args.model} not found")
+    backend = args.backend or ("tflite" if args.model.endswith(".tflite") else "keras")
+    batch_sizes = [int(size) for size in args.batch_sizes.split(",")]
+    thread_settings = [int(threads) for threads in args.threads.split(",")]
+    
+    fens = load_corpus(args.dataset, args.positions, args.seed)
+    if not fens:
+        parser.error(f"No positions found in {args.dataset}")
+    corpus_hash = hashlib.sha1("\n".join(fens).encode()).hexdigest()[:12]
+    print(f"📊 {len(fens)} positions (corpus {corpus_hash}), model {args.model} ({backend})")
+    
+    # Thread pools are fixed once TensorFlow starts, so each setting gets a fresh process
+    results = []
+    context = multiprocessing.get_context("spawn")
+    for threads in thread_settings:
+        task = {"model": args.model, "backend": backend, "threads": threads, "fens": fens,
+                "batch_sizes": batch_sizes, "repeat": args.repeat,
+                "predict_move_positions": args.predict_move_positions}
+        with context.Pool(1) as pool:
+            try:
+                results.extend(pool.apply(run_setting, (task,))["results"])
+            except RuntimeError as e:
+                parser.error(str(e))
+    
+    report = {
+        "label": args.label,
+        "model": args.model,
+        "model_bytes": os.path.getsize(args.model),
+        "backend": backend,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": f"{platform.machine()} {platform.processor()} {os.cpu_count()} CPUs",
+        "python": platform.python_version(),
+        "corpus": {"dataset": args.dataset, "positions": len(fens), "seed": args.seed, "hash": corpus_hash},
+        "results": results
+    }
+    
+    previous = None
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            previous = json.load(f)
+        if previous["corpus"]["hash"] != corpus_hash:
+            print(f"⚠️ {args.compare} was measured on a different corpus")
+    print_results(results, previous)
+    
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
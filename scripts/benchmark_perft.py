@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Perft benchmark of move generation through python-chess and the project's wrappers
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+from game.perft import (PERFT_POSITIONS, PERFT_MODES, DEFAULT_BASELINE_PATH, run_suite,
+                        save_baseline, load_baseline, compare_to_baseline)
+
+def main():
+    parser = argparse.ArgumentParser(description="Perft move generation benchmark")
+    parser.add_argument("--max-nodes", type=int, default=100000,
+                        help="Run each position at the deepest depth with at most this many nodes")
+    parser.add_argument("--position", action="append", choices=[name for name, _, _ in PERFT_POSITIONS],
+                        help="Only run this position (repeatable)")
+    parser.add_argument("--mode", action="append", choices=PERFT_MODES,
+                        help="Only run this mode (repeatable, raw is needed for the overhead)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement, the fastest counts")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH, help="Baseline results file")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Allowed slowdown against the baseline")
+    parser.add_argument("--absolute", action="store_true",
+                        help="Also compare absolute nodes per second, only meaningful on the baseline's machine")
+    args = parser.parse_args()
+    
+    modes = tuple(args.mode) if args.mode else PERFT_MODES
+    results = run_suite(args.max_nodes, args.position, modes, args.repeat)
+    
+    print(f"📊 Perft (at most {args.max_nodes:,} nodes per position)")
+    header = f"{'position':12s} {'depth':>5s} {'nodes':>9s}  " + "  ".join(f"{mode + ' nps':>16s}" for mode in modes)
+    print(header)
+    for result in results:
+        row = f"{result['name']:12s} {result['depth']:5d} {result['expected']:9,d}  "
+        row += "  ".join(f"{result[mode + '_nps']:16,.0f}" for mode in modes)
+        overheads = [f"{mode} {result[mode + '_overhead']:.1f}x" for mode in modes if mode + "_overhead" in result]
+        if overheads:
+            row += "   slower than raw: " + ", ".join(overheads)
+        print(row + ("" if result["ok"] else "   ❌ wrong node count"))
+    
+    failed = not all(result["ok"] for result in results)
+    baseline = load_baseline(args.baseline)
+    if baseline:
+        regressions = compare_to_baseline(results, baseline, args.tolerance, args.absolute)
+        for regression in regressions:
+            print(f"⚠️ Regression: {regression}")
+        failed = failed or bool(regressions)
+        if not regressions:
+            print(f"✅ No regressions against {args.baseline}")
+    
+    if args.save_baseline:
+        save_baseline(results, args.baseline)
+        print(f"✅ Baseline saved to {args.baseline}")
+    
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Compare TFLite models against the float Keras model: latency, memory and top-1 agreement
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import multiprocessing
+import resource
+import time
+import chess
+import numpy as np
+from ml.utils import ChessEncoder
+from scripts.benchmark_inference import load_corpus
+
+def load_backend(backend: str, path: str):
+    """Load a model and return its batch prediction function"""
+    from ml.model import ChessAI
+    ai = ChessAI(path, cache_bytes=0, backend=backend)
+    return ai.predict_policies
+
+def _peak_memory(task):
+    """Load a model in a fresh process and report its peak resident memory in MB"""
+    backend, path = task
+    predict = load_backend(backend, path)
+    predict(np.zeros((1, 8, 8, 12), dtype=np.float32))
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def peak_memory(backend: str, path: str) -> float:
+    """Measure memory in a separate process so backends do not share imports"""
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        return pool.apply(_peak_memory, ((backend, path),))
+
+def latency(predict, positions: np.ndarray, batch_size: int, repeat: int) -> float:
+    """Median seconds per call for one batch"""
+    batch = positions[:batch_size]
+    predict(batch)  # Warm-up
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        predict(batch)
+        times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+def predict_all(predict, positions: np.ndarray, batch_size: int) -> np.ndarray:
+    """Predict policies for all positions in batches"""
+    return np.concatenate([predict(positions[start:start + batch_size])
+                           for start in range(0, len(positions), batch_size)])
+
+def played_moves(boards: list, policies: np.ndarray) -> list:
+    """The legal move each policy plays, as the engine picks it, None if there is none"""
+    moves = []
+    for board, policy in zip(boards, policies):
+        top_moves = ChessEncoder.top_k_legal_moves(board, policy, 1)
+        moves.append(top_moves[0][0] if top_moves else None)
+    return moves
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark TFLite models against the Keras model")
+    parser.add_argument("--keras", default="models/chess_model.h5", help="Float Keras model")
+    parser.add_argument("--tflite", nargs="+", default=["models/chess_model_int8.tflite"], help="TFLite models")
+    parser.add_argument("--dataset", default="data/chess_dataset.json", help="Dataset with evaluation positions")
+    parser.add_argument("--positions", type=int, default=1000, help="Positions for the agreement check")
+    parser.add_argument("--batch-size", type=int, default=32, help="Batch size for batched latency")
+    parser.add_argument("--repeat", type=int, default=50, help="Timed calls per measurement")
+    parser.add_argument("--skip-memory", action="store_true", help="Skip the per-process memory measurement")
+    args = parser.parse_args()
+    
+    # Boards rather than planes, the agreement is on the legal move each model plays
+    fens = load_corpus(args.dataset, args.positions, seed=1)
+    if not fens:
+        parser.error(f"No positions found in {args.dataset}")
+    boards = [chess.Board(fen) for fen in fens]
+    positions = ChessEncoder.boards_to_tensor(boards)
+    print(f"📊 {len(positions)} positions from {args.dataset}")
+    
+    reference = None
+    header = f"{'model':40s} {'size MB':>8s} {'1 pos ms':>9s} {f'{args.batch_size} pos ms':>10s} {'peak MB':>8s} {'top-1':>7s}"
+    print(header)
+    print("-" * len(header))
+    
+    for backend, path in [("keras", args.keras)] + [("tflite", path) for path in args.tflite]:
+        predict = load_backend(backend, path)
+        single = latency(predict, positions, 1, args.repeat)
+        batched = latency(predict, positions, args.batch_size, args.repeat)
+        moves = played_moves(boards, predict_all(predict, positions, args.batch_size))
+        
+        if reference is None:
+            reference = moves
+        agreement = float(np.mean([move == reference_move for move, reference_move in zip(moves, reference)]))
+        memory = "-" if args.skip_memory else f"{peak_memory(backend, path):.0f}"
+        size = os.path.getsize(path) / 1e6
+        
+        print(f"{os.path.basename(path):40s} {size:8.1f} {single * 1000:9.2f} {batched * 1000:10.2f} "
+              f"{memory:>8s} {agreement:7.1%}")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
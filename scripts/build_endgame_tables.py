@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""
+Generate distance-to-mate tables for small endgames
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+from game.endgame import build_tables, TABLES, DEFAULT_TABLE_DIR
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate endgame tables by retrograde analysis")
+    parser.add_argument("--output", default=DEFAULT_TABLE_DIR, help="Output directory")
+    parser.add_argument("--tables", nargs="+", choices=list(TABLES), default=list(TABLES),
+                        help="Endgames to generate")
+    args = parser.parse_args()
+    
+    print(f"♟️ Generating {', '.join(args.tables)} in {args.output}...")
+    results = build_tables(args.output, args.tables)
+    
+    for name, info in results.items():
+        print(f"✅ {name}: {info['wins']:,} won positions, longest mate {info['longest_mate']} plies "
+              f"({info['time']:.1f}s)")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Build a Polyglot opening book from a dataset or PGN games
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import time
+import chess
+from game.opening_book import OpeningBookBuilder, OpeningBook, DEFAULT_BOOK_PATH
+from ml.data_generator import ChessDataGenerator
+from ml.dataset import is_sharded_dataset
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a Polyglot opening book")
+    parser.add_argument("--dataset", action="append", default=[],
+                        help="JSON dataset file or directory of JSONL shards (repeatable)")
+    parser.add_argument("--pgn", action="append", default=[], help="PGN file of played games (repeatable)")
+    parser.add_argument("--output", default=DEFAULT_BOOK_PATH, help="Output book file")
+    parser.add_argument("--max-ply", type=int, default=24, help="Only book positions before this ply")
+    parser.add_argument("--min-count", type=int, default=2, help="Drop moves played fewer times than this")
+    parser.add_argument("--min-elo", type=int, default=0, help="Only use PGN games where both players have this rating")
+    args = parser.parse_args()
+    
+    if not args.dataset and not args.pgn:
+        parser.error("Give at least one --dataset or --pgn source")
+    
+    builder = OpeningBookBuilder(max_ply=args.max_ply)
+    generator = ChessDataGenerator()
+    start = time.perf_counter()
+    
+    for source in args.dataset:
+        if os.path.isdir(source) and is_sharded_dataset(source):
+            # Book keys hash castling and en passant rights, which binary planes do not store
+            parser.error(f"{source} is a binary dataset, which lacks the castling and en passant rights "
+                         f"of its positions; use the JSON/JSONL dataset or the PGN games it was built from")
+        print(f"📊 Reading dataset {source}...")
+        records = generator.iter_shards(source) if os.path.isdir(source) else generator.load_dataset(source)
+        if not builder.add_records(records):
+            parser.error(f"No dataset records found in {source}")
+    
+    for path in args.pgn:
+        print(f"📖 Reading games from {path}...")
+        games = builder.add_pgn(path, min_elo=args.min_elo)
+        print(f"   {games} games")
+    
+    count = builder.write(args.output, min_count=args.min_count)
+    elapsed = time.perf_counter() - start
+    print(f"✅ Wrote {count} entries for {len(builder.counts)} positions to {args.output} ({elapsed:.1f}s)")
+    
+    book = OpeningBook(args.output)
+    if book:
+        print(f"Start position: {book.get_entries(chess.Board())[:5]}")
+        book.close()
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Convert a JSON dataset to the binary sharded format, or a binary dataset to compact move labels
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import time
+from ml.dataset import convert_json_dataset, convert_to_compact_policy, is_sharded_dataset
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a JSON chess dataset to binary shards")
+    parser.add_argument("source", nargs="?", default="data/chess_dataset.json",
+                        help="JSON dataset file or directory of JSONL shards")
+    parser.add_argument("output_dir", nargs="?", default="data/binary", help="Output directory")
+    parser.add_argument("--shard-size", type=int, default=65536, help="Positions per shard")
+    parser.add_argument("--compact", action="store_true",
+                        help="Label moves with the compact policy indices (a binary source is relabeled)")
+    parser.add_argument("--overwrite", action="store_true", help="Replace a dataset already in the output directory")
+    args = parser.parse_args()
+    
+    print(f"🔄 Converting {args.source} to {args.output_dir}...")
+    start = time.perf_counter()
+    if os.path.isdir(args.source) and is_sharded_dataset(args.source):
+        if not args.compact:
+            parser.error(f"{args.source} is already binary, use --compact to relabel its moves")
+        index = convert_to_compact_policy(args.source, args.output_dir, args.overwrite)
+    else:
+        index = convert_json_dataset(args.source, args.output_dir, args.shard_size, args.compact, args.overwrite)
+    elapsed = time.perf_counter() - start
+    
+    print(f"✅ Wrote {index['total']} positions in {len(index['shards'])} shards ({elapsed:.1f}s)")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
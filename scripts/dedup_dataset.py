@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+Merge duplicate positions of binary datasets into one weighted dataset
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+from ml.dedup import deduplicate
+
+def main():
+    parser = argparse.ArgumentParser(description="Deduplicate binary chess datasets")
+    parser.add_argument("sources", nargs="+", help="Binary shard directories to merge")
+    parser.add_argument("--output-dir", default="data/dedup", help="Output directory")
+    parser.add_argument("--memory-mb", type=int, default=512, help="Memory budget of one partition")
+    parser.add_argument("--partitions", type=int, default=None, help="Hash partitions (default from the budget)")
+    parser.add_argument("--shard-size", type=int, default=65536, help="Rows per output shard")
+    parser.add_argument("--overwrite", action="store_true", help="Replace a dataset already in --output-dir")
+    args = parser.parse_args()
+    
+    print(f"🔄 Deduplicating {', '.join(args.sources)} into {args.output_dir}...")
+    stats = deduplicate(args.sources, args.output_dir, args.partitions, args.memory_mb << 20, args.shard_size,
+                        overwrite=args.overwrite)
+    
+    print(f"✅ {stats['positions']:,} positions, {stats['unique_positions']:,} distinct "
+          f"({stats['position_shrink_factor']:.2f}x), written as {stats['rows']:,} position/move rows "
+          f"in {stats['shards']} shards")
+    print(f"   Shrink factor {stats['shrink_factor']:.2f}x ({stats['time']:.1f}s)")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Export the trained model to TFLite, optionally with int8 quantization
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+from ml.model import ChessAI
+from ml.tflite_backend import load_calibration_positions
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the chess model to TFLite")
+    parser.add_argument("--model", default="models/chess_model.h5", help="Trained Keras model")
+    parser.add_argument("--output", default=None, help="Output .tflite file")
+    parser.add_argument("--quantize", choices=["none", "dynamic", "int8"], default="int8",
+                        help="none: float32, dynamic: int8 weights, int8: int8 weights and activations")
+    parser.add_argument("--dataset", default="data/chess_dataset.json",
+                        help="Dataset to draw calibration positions from (int8 only)")
+    parser.add_argument("--calibration-positions", type=int, default=500, help="Number of calibration positions")
+    args = parser.parse_args()
+    
+    quantize = None if args.quantize == "none" else args.quantize
+    output = args.output or os.path.splitext(args.model)[0] + ("" if quantize is None else f"_{quantize}") + ".tflite"
+    
+    ai = ChessAI(args.model)
+    
+    calibration_data = None
+    if quantize == "int8":
+        print(f"📊 Sampling {args.calibration_positions} calibration positions from {args.dataset}...")
+        calibration_data = load_calibration_positions(args.dataset, args.calibration_positions)
+    
+    print(f"🔄 Converting {args.model} ({args.quantize})...")
+    ai.export_tflite(output, quantize, calibration_data)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
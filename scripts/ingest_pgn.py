@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Ingest PGN game archives into binary training shards
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+from ml.pgn_ingest import ingest_pgn, GameFilter, TIME_CONTROL_CATEGORIES
+
+def main():
+    time_controls = [category for category, _ in TIME_CONTROL_CATEGORIES] + ["classical", "correspondence"]
+    parser = argparse.ArgumentParser(description="Ingest PGN games into binary training shards")
+    parser.add_argument("pgn", nargs="+", help="PGN files (uncompressed)")
+    parser.add_argument("--output-dir", default="data/pgn", help="Shard directory")
+    parser.add_argument("--min-elo", type=int, default=0,
+                        help="Only games where both players have at least this rating")
+    parser.add_argument("--max-elo", type=int, default=None,
+                        help="Only games where both players have at most this rating")
+    parser.add_argument("--time-control", action="append", choices=time_controls,
+                        help="Only games of this time control (repeatable)")
+    parser.add_argument("--min-ply", type=int, default=0, help="Skip the positions before this ply")
+    parser.add_argument("--max-ply", type=int, default=None, help="Skip the positions from this ply on")
+    parser.add_argument("--shard-size", type=int, default=65536, help="Positions per shard")
+    parser.add_argument("--chunk-mb", type=int, default=16, help="Megabytes of PGN per worker task")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--compact", action="store_true", help="Label moves with the compact policy indices")
+    parser.add_argument("--overwrite", action="store_true", help="Replace a dataset already in --output-dir")
+    args = parser.parse_args()
+    
+    game_filter = GameFilter(args.min_elo, args.max_elo, args.time_control)
+    print(f"📖 Ingesting {', '.join(args.pgn)} into {args.output_dir}...")
+    stats = ingest_pgn(args.pgn, args.output_dir, game_filter, args.min_ply, args.max_ply, args.shard_size,
+                       args.chunk_mb << 20, args.workers, args.compact, overwrite=args.overwrite)
+    
+    rejected = ", ".join(f"{count:,} by {reason}" for reason, count in sorted(stats["rejected"].items()))
+    print(f"✅ {stats['kept']:,} of {stats['games']:,} games kept ({rejected or 'none rejected'}, "
+          f"{stats['errors']:,} unreadable)")
+    print(f"   {stats['positions']:,} positions in {stats['shards']} shards, "
+          f"{stats['time']:.1f}s ({stats['games_per_sec']:,.0f} games/s)")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -8,12 +8,12 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import numpy as np
-from sklearn.model_selection import train_test_split
 from ml.model import ChessAI
 from ml.data_generator import ChessDataGenerator
 from ml.utils import ChessEncoder
+from ml.dataset import ShardedDataset, is_sharded_dataset
 
-def prepare_training_data(dataset_path: str = "data/chess_dataset.json"):
+def prepare_training_data(dataset_path: str = "data/chess_dataset.json", compact_policy: bool = False):
     """Prepare training data from dataset"""
     print("📊 Loading and preparing training data...")
     
@@ -29,29 +29,24 @@ def prepare_training_data(dataset_path: str = "data/chess_dataset.json"):
     
     # Prepare features and labels
     encoder = ChessEncoder()
-    X = []
-    y = []
+    fens = [example['fen'] for example in data]
     
     print("🔄 Converting positions to tensors...")
-    for i, example in enumerate(data):
-        try:
-            # Convert FEN to tensor
-            board_tensor = encoder.fen_to_tensor(example['fen'])
-            X.append(board_tensor)
-            
-            # Convert move to index
-            move_index = encoder.move_to_index(example['move'])
-            y.append(move_index)
-            
-            if i % 1000 == 0:
-                print(f"Processed {i}/{len(data)} examples...")
-                
-        except Exception as e:
-            print(f"Error processing example {i}: {e}")
-            continue
-    
-    X = np.array(X)
-    y = np.array(y)
+    # Encode in batches straight into one preallocated array
+    X = np.empty((len(fens), 8, 8, 12), dtype=np.float32)
+    batch_size = 1000
+    for start in range(0, len(fens), batch_size):
+        encoder.boards_to_tensor(fens[start:start + batch_size], out=X[start:start + batch_size])
+        print(f"Processed {start}/{len(data)} examples...")
+    
+    # Convert moves to indices
+    y = encoder.moves_to_indices([example['move'] for example in data], compact_policy)
+    
+    return split_training_data(X, y)
+
+def split_training_data(X: np.ndarray, y: np.ndarray):
+    """Split prepared arrays into train/validation/test sets"""
+    from sklearn.model_selection import train_test_split
     
     print(f"✅ Prepared {len(X)} training examples")
     print(f"Input shape: {X.shape}")
@@ -67,25 +62,64 @@ def prepare_training_data(dataset_path: str = "data/chess_dataset.json"):
     
     return X_train, X_val, X_test, y_train, y_val, y_test
 
-def train_model():
+def train_model_streaming(dataset_path: str, epochs: int = 20, batch_size: int = 64,
+                          shuffle_buffer: int = 10000, weighting: str = None, augment: bool = False):
+    """Train the chess AI model from binary shards without materializing arrays"""
+    from ml.input_pipeline import build_datasets, count_split_rows
+    
+    print("🚀 Starting streaming model training...")
+    
+    dataset = ShardedDataset(dataset_path)
+    counts = count_split_rows(dataset)
+    print(f"Training set: {counts['train']} examples")
+    print(f"Validation set: {counts['val']} examples")
+    print(f"Test set: {counts['test']} examples")
+    
+    # Deduplicated datasets weight each row by how often its move was played
+    if weighting is None and dataset.weighted:
+        weighting = "count"
+    if weighting:
+        print(f"Weighting rows by {weighting} ({dataset.index.get('source_positions', len(dataset))} positions "
+              f"merged into {len(dataset)} rows)")
+    if augment:
+        print("Color flipping half of every training batch")
+    datasets = build_datasets(dataset_path, batch_size=batch_size, shuffle_buffer=shuffle_buffer,
+                              weighting=weighting, augment=augment)
+    
+    # The output layer follows the move labels of the dataset
+    ai = ChessAI(compact_policy=dataset.compact_policy)
+    
+    print("🏋️ Training model...")
+    ai.train_on_datasets(datasets["train"], datasets["val"], epochs=epochs)
+    
+    print("📈 Evaluating model...")
+    ai.evaluate(datasets["test"])
+    
+    ai.save_model("models/chess_model.h5")
+    
+    print("✅ Training completed successfully!")
+
+def train_model(dataset_path: str = "data/chess_dataset.json", epochs: int = 20, batch_size: int = 64,
+                compact_policy: bool = False):
     """Train the chess AI model"""
     print("🚀 Starting model training...")
     
     # Prepare data
-    X_train, X_val, X_test, y_train, y_val, y_test = prepare_training_data()
+    prepared = prepare_training_data(dataset_path, compact_policy)
     
-    if X_train is None:
+    if prepared[0] is None:
         return
+    X_train, X_val, X_test, y_train, y_val, y_test = prepared
     
     # Create and train model
-    ai = ChessAI()
+    ai = ChessAI(compact_policy=compact_policy)
     
     print("🏋️ Training model...")
     history = ai.train(
         X_train, y_train,
         X_val, y_val,
-        epochs=20,
-        batch_size=64
+        epochs=epochs,
+        batch_size=batch_size
     )
     
     # Evaluate model
@@ -98,6 +132,30 @@ def train_model():
     print("✅ Training completed successfully!")
 
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Train the chess AI model")
+    parser.add_argument("--dataset", default="data/chess_dataset.json",
+                        help="JSON dataset, JSONL shard directory or binary shard directory")
+    parser.add_argument("--epochs", type=int, default=20, help="Training epochs")
+    parser.add_argument("--batch-size", type=int, default=64, help="Batch size")
+    parser.add_argument("--shuffle-buffer", type=int, default=10000,
+                        help="Shuffle buffer size for streaming training")
+    parser.add_argument("--compact-policy", action="store_true",
+                        help="Use the compact move outputs (binary shards use the labels they were written with)")
+    parser.add_argument("--weighting", choices=["count", "distribution"],
+                        help="Sample weights of a deduplicated dataset (default count): count trains as on the "
+                             "duplicated data, distribution weights every position once by its move distribution")
+    parser.add_argument("--augment", action="store_true",
+                        help="Color flip half of every training batch (binary shards only)")
+    args = parser.parse_args()
+    
     # Create models directory
     os.makedirs("models", exist_ok=True)
-    train_model()
\ No newline at end of file
+    if os.path.isdir(args.dataset) and is_sharded_dataset(args.dataset):
+        # Binary shards are streamed, so memory stays flat whatever the dataset size
+        train_model_streaming(args.dataset, args.epochs, args.batch_size, args.shuffle_buffer, args.weighting,
+                              args.augment)
+    else:
+        if args.augment:
+            print("⚠️ --augment needs a binary dataset, convert it with scripts/convert_dataset.py")
+        train_model(args.dataset, args.epochs, args.batch_size, args.compact_policy)
\ No newline at end of file
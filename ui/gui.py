@@ -1,16 +1,33 @@
 import pygame
 import chess
+import random
 import sys
 import os
+import threading
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from game.board import ChessBoard
 from game.game_state import GameState
+from game.selection import MoveSelection
 from ml.model import ChessAI
+from ml.startup import BackgroundModelLoader, startup_report
+from ml.mcts import MCTSEngine
+from game.search import SearchEngine
+from game.opening_book import OpeningBook
+from game.endgame import EndgameTablebase
+
+# Posted by the AI worker thread when it has chosen a move
+AI_MOVE_EVENT = pygame.USEREVENT + 1
 
 class ChessGUI:
-    """Simple Pygame-based chess GUI"""
+    """Simple Pygame-based chess GUI
+    
+    Glyphs, highlights and the empty board are rendered once. Each frame only
+    redraws the squares and status lines whose content changed, and the AI
+    thinks on a worker thread so the window keeps handling events.
+    """
     
-    def __init__(self):
+    def __init__(self, engine: str = "model", think_time: float = 2.0, playouts: int = 800):
         pygame.init()
         
         # Constants
@@ -24,19 +41,29 @@ class ChessGUI:
         # Initialize display
         self.screen = pygame.display.set_mode((self.BOARD_SIZE, self.BOARD_SIZE + 100))
         pygame.display.set_caption("AI Chess Game")
+        pygame.event.set_blocked(pygame.MOUSEMOTION)
         
         # Game state
         self.game = GameState(player_color=chess.WHITE)
-        self.selected_square = None
-        self.legal_moves = []
+        self.selection = MoveSelection(self.game)
         
         # AI
         self.ai = None
-        try:
-            self.ai = ChessAI("models/chess_model.h5")
-            print("✅ AI model loaded successfully!")
-        except:
-            print("⚠️ AI model not found. AI will make random moves.")
+        self.model_loader = None
+        self.search_engine = None
+        self.mcts_engine = None
+        self.ai_thread = None
+        self.engine = engine
+        self.think_time = think_time
+        self.playouts = playouts
+        self.opening_book = OpeningBook("models/opening_book.bin") if engine != "random" else None
+        self.endgame_tables = EndgameTablebase("models/endgame") if engine != "random" else None
+        if engine == "search":
+            self.search_engine = SearchEngine(tablebase=self.endgame_tables)
+        elif engine in ("model", "mcts"):
+            # Load in the background so the window opens right away
+            self.model_loader = BackgroundModelLoader(lambda: ChessAI("models/chess_model.h5"),
+                                                      on_ready=self.on_model_ready).start()
         
         # Font for text
         self.font = pygame.font.Font(None, 36)
@@ -46,6 +73,33 @@ class ChessGUI:
             'P': '♙', 'N': '♘', 'B': '♗', 'R': '♖', 'Q': '♕', 'K': '♔',
             'p': '♟', 'n': '♞', 'b': '♝', 'r': '♜', 'q': '♛', 'k': '♚'
         }
+        
+        # Rendered once, blitted every time a square is redrawn
+        self.board_surface = self.draw_board()
+        self.glyphs = {}  # piece symbol -> (surface, offset in the square)
+        for piece, symbol in self.piece_symbols.items():
+            glyph = self.font.render(symbol, True, (0, 0, 0))
+            self.glyphs[piece] = (glyph, glyph.get_rect(center=(self.SQUARE_SIZE // 2, self.SQUARE_SIZE // 2)).topleft)
+        self.highlights = {
+            "selected": self.make_highlight((0, 255, 0), 128),
+            "target": self.make_highlight((255, 255, 0), 64)
+        }
+        self.text_cache = {}
+        
+        # What is on screen, to find the parts that need a redraw
+        self.drawn_squares = [None] * 64
+        self.drawn_status = None
+    
+    def on_model_ready(self, model: ChessAI):
+        """Use the model once it is loaded and warmed up"""
+        if self.engine == "mcts":
+            if model.value_head:
+                self.mcts_engine = MCTSEngine(model.predict_policies_and_values, compact_policy=model.compact_policy)
+            else:
+                print("⚠️ The model has no value head, playing its policy without tree search")
+        self.ai = model
+        print("✅ AI model loaded successfully!")
+        print(startup_report())
     
     def square_to_coords(self, square: int) -> tuple:
         """Convert chess square to screen coordinates"""
@@ -59,69 +113,101 @@ class ChessGUI:
         row = 7 - (y // self.SQUARE_SIZE)
         return row * 8 + col
     
-    def draw_board(self):
-        """Draw the chess board"""
+    def draw_board(self) -> pygame.Surface:
+        """Draw the empty chess board"""
+        surface = pygame.Surface((self.BOARD_SIZE, self.BOARD_SIZE))
         for row in range(8):
             for col in range(8):
                 color = self.WHITE if (row + col) % 2 == 0 else self.BLACK
                 rect = pygame.Rect(col * self.SQUARE_SIZE, row * self.SQUARE_SIZE, 
                                  self.SQUARE_SIZE, self.SQUARE_SIZE)
-                pygame.draw.rect(self.screen, color, rect)
+                pygame.draw.rect(surface, color, rect)
+        return surface
     
-    def draw_pieces(self):
-        """Draw chess pieces on the board"""
-        for square in chess.SQUARES:
-            piece = self.game.board.board.piece_at(square)
-            if piece:
-                x, y = self.square_to_coords(square)
-                symbol = self.piece_symbols.get(piece.symbol(), '?')
-                
-                # Render piece
-                text = self.font.render(symbol, True, (0, 0, 0))
-                text_rect = text.get_rect(center=(x + self.SQUARE_SIZE // 2, 
-                                                y + self.SQUARE_SIZE // 2))
-                self.screen.blit(text, text_rect)
-    
-    def draw_highlights(self):
-        """Draw square highlights"""
-        # Highlight selected square
-        if self.selected_square is not None:
-            x, y = self.square_to_coords(self.selected_square)
-            highlight_surface = pygame.Surface((self.SQUARE_SIZE, self.SQUARE_SIZE))
-            highlight_surface.set_alpha(128)
-            highlight_surface.fill((0, 255, 0))
-            self.screen.blit(highlight_surface, (x, y))
-        
-        # Highlight legal moves
-        for move_uci in self.legal_moves:
-            try:
-                move = chess.Move.from_uci(move_uci)
-                if self.selected_square == move.from_square:
-                    x, y = self.square_to_coords(move.to_square)
-                    highlight_surface = pygame.Surface((self.SQUARE_SIZE, self.SQUARE_SIZE))
-                    highlight_surface.set_alpha(64)
-                    highlight_surface.fill((255, 255, 0))
-                    self.screen.blit(highlight_surface, (x, y))
-            except:
-                continue
+    def make_highlight(self, color: tuple, alpha: int) -> pygame.Surface:
+        """Create a translucent square overlay"""
+        surface = pygame.Surface((self.SQUARE_SIZE, self.SQUARE_SIZE))
+        surface.set_alpha(alpha)
+        surface.fill(color)
+        return surface
     
-    def draw_status(self):
-        """Draw game status"""
-        y_offset = self.BOARD_SIZE + 10
-        
+    def render_text(self, text: str, color: tuple) -> pygame.Surface:
+        """Render a status line, reusing earlier renders of the same text"""
+        key = (text, color)
+        if key not in self.text_cache:
+            self.text_cache[key] = self.font.render(text, True, color)
+        return self.text_cache[key]
+    
+    def draw_square(self, square: int, piece: str, highlight: str) -> pygame.Rect:
+        """Draw one square with its highlight and piece, returning the area drawn"""
+        x, y = self.square_to_coords(square)
+        rect = pygame.Rect(x, y, self.SQUARE_SIZE, self.SQUARE_SIZE)
+        self.screen.blit(self.board_surface, rect, rect)
+        if highlight:
+            self.screen.blit(self.highlights[highlight], rect)
+        if piece:
+            glyph, (dx, dy) = self.glyphs[piece]
+            self.screen.blit(glyph, (x + dx, y + dy))
+        return rect
+    
+    def get_status_lines(self) -> tuple:
+        """Status lines as (text, color) pairs"""
         # Current turn
         turn_text = f"Turn: {'White' if self.game.board.board.turn else 'Black'}"
         if self.game.board.is_check():
             turn_text += " (CHECK!)"
-        
-        text = self.font.render(turn_text, True, (0, 0, 0))
-        self.screen.blit(text, (10, y_offset))
+        lines = [(turn_text, (0, 0, 0))]
         
         # Game status
         if self.game.game_over:
-            status_text = f"Game Over: {self.game.game_result}"
-            text = self.font.render(status_text, True, (255, 0, 0))
-            self.screen.blit(text, (10, y_offset + 40))
+            lines.append((f"Game Over: {self.game.game_result}", (255, 0, 0)))
+        elif self.model_loader and not self.model_loader.done.is_set():
+            lines.append(("Loading AI model...", (128, 128, 128)))
+        elif self.ai_thread is not None:
+            lines.append(("AI is thinking...", (128, 128, 128)))
+        return tuple(lines)
+    
+    def draw_status(self, lines: tuple) -> pygame.Rect:
+        """Draw game status"""
+        rect = pygame.Rect(0, self.BOARD_SIZE, self.BOARD_SIZE, 100)
+        self.screen.fill((255, 255, 255), rect)
+        y_offset = self.BOARD_SIZE + 10
+        for text, color in lines:
+            self.screen.blit(self.render_text(text, color), (10, y_offset))
+            y_offset += 40
+        return rect
+    
+    def render(self, full: bool = False):
+        """Redraw the squares and status lines that changed since the last frame"""
+        if full:
+            self.drawn_squares = [None] * 64
+            self.drawn_status = None
+        
+        pieces = self.game.board.board.piece_map()
+        targets = self.selection.selected_targets()
+        dirty = []
+        for square in chess.SQUARES:
+            piece = pieces.get(square)
+            if square == self.selection.selected_square:
+                highlight = "selected"
+            elif square in targets:
+                highlight = "target"
+            else:
+                highlight = None
+            state = (piece.symbol() if piece else None, highlight)
+            if state != self.drawn_squares[square]:
+                self.drawn_squares[square] = state
+                dirty.append(self.draw_square(square, *state))
+        
+        status = self.get_status_lines()
+        if status != self.drawn_status:
+            self.drawn_status = status
+            dirty.append(self.draw_status(status))
+        
+        if full:
+            pygame.display.flip()
+        elif dirty:
+            pygame.display.update(dirty)
     
     def handle_click(self, pos):
         """Handle mouse click on board"""
@@ -132,93 +218,110 @@ class ChessGUI:
         if y >= self.BOARD_SIZE:  # Click below board
             return
         
-        clicked_square = self.coords_to_square(x, y)
-        
-        if self.selected_square is None:
-            # Select a square
-            piece = self.game.board.board.piece_at(clicked_square)
-            if piece and piece.color == self.game.player_color:
-                self.selected_square = clicked_square
-                self.legal_moves = self.game.board.get_legal_moves()
-        else:
-            # Try to make a move
+        move_uci = self.selection.click(self.coords_to_square(x, y))
+        if move_uci:
+            result = self.game.make_player_move(move_uci)
+            if result["success"]:
+                print(f"Player move: {move_uci}")
+    
+    def choose_ai_move(self, board: ChessBoard) -> str:
+        """Choose the AI move on a copy of the game board"""
+        book_move = self.opening_book.get_move(board) if self.opening_book else None
+        endgame_move = None
+        if self.endgame_tables and not book_move:
+            endgame_move = self.endgame_tables.best_move(board.board)
+        if book_move:
+            print(f"Book move: {book_move}")
+            return book_move
+        if endgame_move:
+            print(f"Endgame table move: {endgame_move}")
+            return endgame_move
+        if self.search_engine:
+            result = self.search_engine.search(board.board, max_depth=64, time_limit=self.think_time)
+            print(f"Search: depth {result['depth']}, {result['nodes']:,} nodes ({result['nps']:,} nps)")
+            return result["move"]
+        if self.mcts_engine:
+            result = self.mcts_engine.search(board.board, self.playouts, time_limit=self.think_time)
+            print(f"MCTS: {result['playouts']:,} playouts ({result['playouts_per_sec']:,} per second), "
+                  f"{result['avg_batch']:.1f} positions per forward pass")
+            return result["move"]
+        if self.ai:
             try:
-                move_uci = chess.Move(self.selected_square, clicked_square).uci()
-                result = self.game.make_player_move(move_uci)
-                
-                if result["success"]:
-                    print(f"Player move: {move_uci}")
-                    self.selected_square = None
-                    self.legal_moves = []
-                else:
-                    # Invalid move, try selecting new square
-                    piece = self.game.board.board.piece_at(clicked_square)
-                    if piece and piece.color == self.game.player_color:
-                        self.selected_square = clicked_square
-                        self.legal_moves = self.game.board.get_legal_moves()
-                    else:
-                        self.selected_square = None
-                        self.legal_moves = []
+                return self.ai.predict_move(board.get_fen())
             except:
-                self.selected_square = None
-                self.legal_moves = []
+                pass  # Fallback to random move
+        
+        # Random move, also while the model is still loading
+        legal_moves = board.get_legal_moves()
+        return random.choice(legal_moves) if legal_moves else None
     
     def make_ai_move(self):
-        """Make AI move"""
-        if self.game.game_over or not self.game.is_ai_turn():
+        """Start choosing the AI move on a worker thread"""
+        if self.ai_thread is not None or self.game.game_over or not self.game.is_ai_turn():
             return
         
-        if self.ai:
-            try:
-                ai_move = self.ai.predict_move(self.game.board.get_fen())
-            except:
-                # Fallback to random move
-                import random
-                legal_moves = self.game.board.get_legal_moves()
-                ai_move = random.choice(legal_moves) if legal_moves else None
-        else:
-            # Random move
-            import random
-            legal_moves = self.game.board.get_legal_moves()
+        board = ChessBoard()
+        board.set_board(self.game.board.board.copy())
+        self.ai_thread = threading.Thread(target=self.think, args=(board, self.selection.position_key()),
+                                          name="ai-move", daemon=True)
+        self.ai_thread.start()
+    
+    def think(self, board: ChessBoard, position: tuple):
+        """Worker thread: choose a move and hand it to the event loop"""
+        try:
+            ai_move = self.choose_ai_move(board)
+        except Exception as e:
+            print(f"❌ AI move failed: {e}")
+            legal_moves = board.get_legal_moves()
             ai_move = random.choice(legal_moves) if legal_moves else None
-        
-        if ai_move:
-            result = self.game.make_ai_move(ai_move)
-            if result["success"]:
-                print(f"AI move: {ai_move}")
+        if pygame.get_init():
+            pygame.event.post(pygame.event.Event(AI_MOVE_EVENT, move=ai_move, position=position))
+    
+    def apply_ai_move(self, ai_move: str, position: tuple):
+        """Play the move chosen by the worker, unless the game changed meanwhile"""
+        self.ai_thread = None
+        if self.selection.play_ai_move(ai_move, position):
+            print(f"AI move: {ai_move}")
     
     def run(self):
         """Main game loop"""
         clock = pygame.time.Clock()
         running = True
+        self.render(full=True)
         
         while running:
-            for event in pygame.event.get():
+            # Sleep until something happens, waking up now and then for the loading status
+            for event in [pygame.event.wait(250)] + pygame.event.get():
                 if event.type == pygame.QUIT:
                     running = False
                 elif event.type == pygame.MOUSEBUTTONDOWN:
                     self.handle_click(event.pos)
+                elif event.type == AI_MOVE_EVENT:
+                    self.apply_ai_move(event.move, event.position)
+                elif event.type == pygame.VIDEOEXPOSE:
+                    self.render(full=True)
                 elif event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_r:  # Reset game
+                    if event.key == pygame.K_r:  # Reset game, a move still being chosen is dropped
                         self.game.reset_game()
-                        self.selected_square = None
-                        self.legal_moves = []
+                        self.selection.clear()
             
             # Make AI move if it's AI's turn
             self.make_ai_move()
             
-            # Draw everything
-            self.screen.fill((255, 255, 255))
-            self.draw_board()
-            self.draw_highlights()
-            self.draw_pieces()
-            self.draw_status()
-            
-            pygame.display.flip()
+            # Draw what changed
+            self.render()
             clock.tick(60)
         
         pygame.quit()
 
 if __name__ == "__main__":
-    game = ChessGUI()
+    import argparse
+    parser = argparse.ArgumentParser(description="AI Chess GUI")
+    parser.add_argument("--engine", choices=["model", "mcts", "search", "random"], default="model",
+                        help="AI opponent engine")
+    parser.add_argument("--think-time", type=float, default=2.0, help="Search time per move in seconds")
+    parser.add_argument("--playouts", type=int, default=800, help="MCTS playouts per move")
+    args = parser.parse_args()
+    
+    game = ChessGUI(engine=args.engine, think_time=args.think_time, playouts=args.playouts)
     game.run()
\ No newline at end of file
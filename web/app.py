@@ -3,138 +3,298 @@
 Flask web server for chess game
 """
 
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify, g
 from flask_cors import CORS
 import sys
 import os
+import threading
+import time
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from game.game_state import GameState
+from game.game_store import GameStore
+from game.board import ChessBoard
+from game.move_worker import AIMoveWorker
+from game.search import SearchEngine
+from game.opening_book import OpeningBook
+from game.endgame import EndgameTablebase
+from game.metrics import REGISTRY, Gauge, Counter, CONTENT_TYPE
+from web.game_routes import game_routes, parse_player_color, game_not_found
 from ml.model import ChessAI
+from ml.inference_server import BatchInferenceServer
+from ml.mcts import MCTSEngine
+from ml.startup import BackgroundModelLoader, timed, startup_report, get_startup_times
 import chess
 import json
 
 app = Flask(__name__)
 CORS(app)
 
-# Global game state
-game = None
+# Games of all sessions, keyed by game ID
+games = GameStore(
+    max_games=int(os.environ.get("CHESS_MAX_GAMES", "50000")),
+    idle_timeout=float(os.environ.get("CHESS_GAME_IDLE_TIMEOUT", "3600"))
+)
+app.register_blueprint(game_routes(games))
+
+# AI engine: "search" for alpha-beta search, "mcts" for tree search with a
+# policy and value model, otherwise the model's policy alone
+AI_ENGINE = os.environ.get("CHESS_AI_ENGINE", "model")
+MODEL_ENGINES = ("model", "mcts")
+SEARCH_TIME = float(os.environ.get("CHESS_SEARCH_TIME", "1.0"))
+SEARCH_TT_SIZE = int(os.environ.get("CHESS_SEARCH_TT_SIZE", str(1 << 18)))  # 20 bytes a slot, per worker thread
+MCTS_PLAYOUTS = int(os.environ.get("CHESS_MCTS_PLAYOUTS", "800"))
+search_engines = threading.local()  # The search engine is not thread-safe, keep one per thread
+mcts_engines = threading.local()
+
+# AI replies are computed on a worker pool and delivered by long-poll or SSE
+AI_WORKERS = int(os.environ.get("CHESS_AI_WORKERS", "4"))
+AI_WAIT_TIMEOUT = 25.0  # Seconds a long-poll request is held, below common proxy timeouts
+
+# Opening book, memory-mapped so every worker process shares one copy
+with timed("opening book"):
+    opening_book = OpeningBook(os.environ.get("CHESS_OPENING_BOOK", "../models/opening_book.bin"))
+
+# Endgame tables, memory-mapped like the opening book
+with timed("endgame tables"):
+    endgame_tables = EndgameTablebase(os.environ.get("CHESS_ENDGAME_TABLES", "../models/endgame"))
+
 ai = None
+inference = None
+model_loader = None
+
+# Hot-path timings, exposed with the component counters at /api/metrics
+REQUEST_SECONDS = REGISTRY.histogram("chess_http_request_seconds", "HTTP request latency",
+                                     ("endpoint", "method", "status"))
+AI_MOVE_SECONDS = REGISTRY.histogram("chess_ai_move_seconds", "AI think time by the engine that chose the move",
+                                     ("source",))
+ENCODE_SECONDS = REGISTRY.histogram("chess_encode_seconds", "Time to encode one inference batch")
+INFERENCE_SECONDS = REGISTRY.histogram("chess_inference_seconds", "Forward pass time of one inference batch")
+INFERENCE_BATCH_SIZE = REGISTRY.histogram("chess_inference_batch_size", "Positions per inference batch",
+                                          buckets=(1, 2, 4, 8, 16, 32, 64))
+
+def observe_inference_batch(batch_size: int, encode_seconds: float, forward_seconds: float):
+    """Record one batch of the inference server"""
+    INFERENCE_BATCH_SIZE.observe(batch_size)
+    ENCODE_SECONDS.observe(encode_seconds)
+    INFERENCE_SECONDS.observe(forward_seconds)
+
+def start_inference(model: ChessAI):
+    """Serve moves from the model once it is loaded and warmed up"""
+    global ai, inference
+    
+    # Share forward passes between concurrent requests
+    inference = BatchInferenceServer(model.predict_policies, max_batch_size=32, max_wait_ms=5.0,
+                                     cache=model.cache, observer=observe_inference_batch)
+    inference.start()
+    ai = model
+    if AI_ENGINE == "mcts" and not model.value_head:
+        print("⚠️ The model has no value head, playing its policy without tree search")
+    print("✅ AI model loaded successfully!")
+    print(startup_report())
 
-def initialize_game():
-    """Initialize game and AI"""
-    global game, ai
-    game = GameState(player_color=chess.WHITE)
+def initialize_ai(wait: bool = False):
+    """Start loading the AI model in the background
+    
+    Requests are served right away, with book, endgame table or random
+    moves until the model is ready.
+    """
+    global model_loader
     
-    # Try to load AI model
-    try:
-        ai = ChessAI("../models/chess_model.h5")
-        print("✅ AI model loaded successfully!")
-    except:
-        print("⚠️ AI model not found. AI will make random moves.")
-        ai = None
+    if AI_ENGINE in MODEL_ENGINES and model_loader is None:
+        model_loader = BackgroundModelLoader(lambda: ChessAI("../models/chess_model.h5"),
+                                             on_ready=start_inference).start()
+        if wait and not model_loader.wait():
+            print(f"⚠️ AI model not available ({model_loader.error}). AI will make random moves.")
 
 @app.route('/')
 def index():
     """Serve the main chess game page"""
     return render_template('index.html')
 
-@app.route('/api/game/status')
-def get_game_status():
-    """Get current game status"""
-    if not game:
-        initialize_game()
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_time(response):
+    """Time every request by endpoint, long-polls and streams included"""
+    start = g.get("request_start")
+    if start is not None:
+        REQUEST_SECONDS.labels(request.endpoint or "unknown", request.method,
+                               response.status_code).observe(time.perf_counter() - start)
+    return response
+
+def collect_component_metrics():
+    """Read the counters of the game store, AI workers, book and model cache at scrape time"""
+    store = games.get_stats()
+    jobs = ai_worker.get_stats()
+    gauges = [("chess_games_live", "Games held in memory", store["live"]),
+              ("chess_games_hibernated", "Idle games packed into move records", store["hibernated_now"]),
+              ("chess_ai_jobs_pending", "AI moves queued or being computed", jobs["pending"]),
+              ("chess_model_ready", "1 once the model is loaded and warmed up", int(ai is not None))]
+    counters = [("chess_games_created", "Games created", store["created"]),
+                ("chess_games_evicted", "Games dropped for being idle or over the limit", store["evicted"]),
+                ("chess_ai_jobs_completed", "AI moves played", jobs["completed"]),
+                ("chess_ai_jobs_stale", "AI moves dropped after the game changed", jobs["stale"]),
+                ("chess_ai_jobs_failed", "AI moves that could not be computed", jobs["failed"]),
+                ("chess_book_hits", "Opening book lookups that found a move", opening_book.stats["hits"]),
+                ("chess_book_misses", "Opening book lookups without a move", opening_book.stats["misses"])]
     
-    return jsonify(game.get_game_info())
+    if ai is not None and ai.cache is not None:
+        cache = ai.cache.get_stats()
+        gauges.append(("chess_prediction_cache_bytes", "Memory used by cached predictions", cache["bytes"]))
+        counters += [("chess_prediction_cache_hits", "Model predictions served from the cache", cache["hits"]),
+                     ("chess_prediction_cache_misses", "Model predictions computed", cache["misses"]),
+                     ("chess_prediction_cache_evictions", "Cached predictions evicted", cache["evictions"])]
+    
+    metrics = []
+    for metric_type, values in ((Gauge, gauges), (Counter, counters)):
+        for name, help, value in values:
+            metric = metric_type(name, help)
+            metric.value = value
+            metrics.append(metric)
+    return metrics
+
+REGISTRY.add_collector(collect_component_metrics)
+
+@app.route('/api/metrics')
+def get_metrics():
+    """Metrics in the Prometheus text format"""
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+@app.route('/api/ready')
+def get_ready():
+    """Report whether the AI engine is ready and how long startup took"""
+    if model_loader:
+        status = model_loader.get_status()
+    else:
+        status = {"ready": AI_ENGINE not in MODEL_ENGINES, "loading": False, "error": None,
+                  "startup_times": get_startup_times()}
+    status["engine"] = AI_ENGINE
+    return jsonify(status)
 
-@app.route('/api/game/reset', methods=['POST'])
-def reset_game():
+@app.route('/api/game/<game_id>/reset', methods=['POST'])
+def reset_game(game_id):
     """Reset the game"""
-    global game
-    data = request.get_json() or {}
-    player_color = chess.WHITE if data.get('player_color', 'white') == 'white' else chess.BLACK
+    data = request.get_json(silent=True) or {}
+    with games.game(game_id) as game:
+        if not game:
+            return game_not_found(game_id)
+        game.reset_game(parse_player_color(data))
+        
+        # Drops a pending reply, or queues the first move when the AI plays white
+        job_id = ai_worker.schedule(game_id, game)
     
-    game = GameState(player_color=player_color)
-    return jsonify({"success": True, "message": "Game reset"})
+    result = {"success": True, "message": "Game reset"}
+    if job_id is not None:
+        result["ai_pending"] = True
+        result["ai_job"] = job_id
+    return jsonify(result)
 
-@app.route('/api/game/move', methods=['POST'])
-def make_move():
+@app.route('/api/game/<game_id>/move', methods=['POST'])
+def make_move(game_id):
     """Make a player move"""
-    if not game:
-        initialize_game()
-    
-    data = request.get_json()
+    data = request.get_json(silent=True) or {}
     move_uci = data.get('move')
     
     if not move_uci:
         return jsonify({"success": False, "error": "No move provided"})
     
-    # Make player move
-    result = game.make_player_move(move_uci)
-    
-    if not result["success"]:
-        return jsonify(result)
-    
-    # If game is not over and it's AI's turn, make AI move
-    if not game.game_over and game.is_ai_turn():
-        ai_move = get_ai_move()
-        if ai_move:
-            ai_result = game.make_ai_move(ai_move)
-            result["ai_move"] = ai_move
-            result["ai_result"] = ai_result
+    with games.game(game_id) as game:
+        if not game:
+            return game_not_found(game_id)
+        
+        # Make player move
+        result = game.make_player_move(move_uci)
+        
+        if not result["success"]:
+            return jsonify(result)
+        
+        # If game is not over and it's AI's turn, queue the AI move
+        job_id = ai_worker.schedule(game_id, game)
+        if job_id is not None:
+            result["ai_pending"] = True
+            result["ai_job"] = job_id
     
     return jsonify(result)
 
-def get_ai_move():
-    """Get AI move"""
-    if ai:
+def get_ai_move(board: ChessBoard):
+    """Get AI move, runs on the AI worker pool"""
+    start = time.perf_counter()
+    move, source = choose_ai_move(board)
+    AI_MOVE_SECONDS.labels(source).observe(time.perf_counter() - start)
+    return move
+
+def choose_ai_move(board: ChessBoard) -> tuple:
+    """Pick the AI move and name the source that chose it"""
+    book_move = opening_book.get_move(board)
+    if book_move:
+        return book_move, "book"
+    
+    endgame_move = endgame_tables.best_move(board.board)
+    if endgame_move:
+        return endgame_move, "endgame"
+    
+    if AI_ENGINE == "search":
+        if not hasattr(search_engines, "engine"):
+            search_engines.engine = SearchEngine(tt_size=SEARCH_TT_SIZE, tablebase=endgame_tables)
+        return search_engines.engine.search(board.board, max_depth=64, time_limit=SEARCH_TIME)["move"], "search"
+    
+    if AI_ENGINE == "mcts" and ai is not None and ai.value_head:
+        if not hasattr(mcts_engines, "engine"):
+            mcts_engines.engine = MCTSEngine(ai.predict_policies_and_values, compact_policy=ai.compact_policy)
+        return mcts_engines.engine.search(board.board, MCTS_PLAYOUTS, time_limit=SEARCH_TIME)["move"], "mcts"
+    
+    # Until the background load finishes, fall through to a random move
+    if inference:
         try:
-            return ai.predict_move(game.board.get_fen())
+            return inference.predict_move(board.get_fen(), timeout=10.0), "model"
         except Exception as e:
             print(f"AI prediction failed: {e}")
     
     # Fallback to random move
     import random
-    legal_moves = game.board.get_legal_moves()
-    return random.choice(legal_moves) if legal_moves else None
-
-@app.route('/api/game/legal-moves')
-def get_legal_moves():
-    """Get legal moves for current position"""
-    if not game:
-        initialize_game()
-    
-    return jsonify({
-        "legal_moves": game.board.get_legal_moves(),
-        "current_turn": "white" if game.board.board.turn else "black"
-    })
-
-@app.route('/api/game/board')
-def get_board():
-    """Get current board state"""
-    if not game:
-        initialize_game()
-    
-    # Convert board to JSON format
-    board_data = {}
-    for square in chess.SQUARES:
-        piece = game.board.board.piece_at(square)
-        if piece:
-            square_name = chess.square_name(square)
-            board_data[square_name] = {
-                "piece": piece.symbol(),
-                "color": "white" if piece.color else "black"
-            }
-    
-    return jsonify({
-        "board": board_data,
-        "fen": game.board.get_fen(),
-        "turn": "white" if game.board.board.turn else "black",
-        "is_check": game.board.is_check(),
-        "game_over": game.game_over,
-        "result": game.game_result
-    })
+    legal_moves = board.get_legal_moves()
+    return (random.choice(legal_moves) if legal_moves else None), "random"
+
+ai_worker = AIMoveWorker(games, get_ai_move, max_workers=AI_WORKERS)
+
+@app.route('/api/game/<game_id>/ai-move')
+def get_ai_move_result(game_id):
+    """Long-poll for the AI reply, optionally of a given job"""
+    job_id = request.args.get('job', type=int)
+    timeout = min(request.args.get('timeout', AI_WAIT_TIMEOUT, type=float), AI_WAIT_TIMEOUT)
+    
+    if game_id not in games:
+        return game_not_found(game_id)
+    
+    job = ai_worker.wait(game_id, job_id, timeout=max(timeout, 0.0))
+    if job is None:
+        return jsonify({"success": False, "status": "none", "error": "No AI move scheduled"})
+    job["success"] = job["status"] == "done"
+    return jsonify(job)
+
+@app.route('/api/game/<game_id>/ai-move/events')
+def stream_ai_move(game_id):
+    """Push the AI reply as a Server-Sent Event once it is ready"""
+    job_id = request.args.get('job', type=int)
+    if game_id not in games:
+        return game_not_found(game_id)
+    
+    def events():
+        while True:
+            job = ai_worker.wait(game_id, job_id, timeout=AI_WAIT_TIMEOUT)
+            if job is not None and job["status"] == "pending":
+                yield ": keep-alive\n\n"
+                continue
+            
+            job = job or {"status": "none"}
+            job["success"] = job["status"] == "done"
+            yield f"event: ai_move\ndata: {json.dumps(job)}\n\n"
+            return
+    
+    return Response(events(), mimetype='text/event-stream', headers={"Cache-Control": "no-cache"})
 
 if __name__ == '__main__':
-    initialize_game()
+    initialize_ai()
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -7,9 +7,15 @@ from flask import Flask, render_template, request, jsonify
 from flask_cors import CORS
 import sys
 import os
+import threading
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from game.game_state import GameState
+from game.game_store import GameStore
+from game.search import SearchEngine
+from game.opening_book import OpeningBook
+from game.endgame import EndgameTablebase
+from web.game_routes import game_routes, parse_player_color, game_not_found
 import chess
 import json
 import random
@@ -17,130 +23,105 @@ import random
 app = Flask(__name__)
 CORS(app)
 
-# Global game state
-game = None
+# Games of all sessions, keyed by game ID
+games = GameStore(
+    max_games=int(os.environ.get("CHESS_MAX_GAMES", "50000")),
+    idle_timeout=float(os.environ.get("CHESS_GAME_IDLE_TIMEOUT", "3600"))
+)
+app.register_blueprint(game_routes(games))
 
-def initialize_game():
-    """Initialize game"""
-    global game
-    game = GameState(player_color=chess.WHITE)
+# AI engine: "search" for alpha-beta search, otherwise random moves
+AI_ENGINE = os.environ.get("CHESS_AI_ENGINE", "random")
+SEARCH_TIME = float(os.environ.get("CHESS_SEARCH_TIME", "1.0"))
+SEARCH_TT_SIZE = int(os.environ.get("CHESS_SEARCH_TT_SIZE", str(1 << 18)))  # 20 bytes a slot, per worker thread
+search_engines = threading.local()  # The search engine is not thread-safe, keep one per thread
+
+# Opening book, memory-mapped so every worker process shares one copy
+opening_book = OpeningBook(os.environ.get("CHESS_OPENING_BOOK", "../models/opening_book.bin")) \
+    if AI_ENGINE != "random" else None
+
+# Endgame tables, memory-mapped like the opening book
+endgame_tables = EndgameTablebase(os.environ.get("CHESS_ENDGAME_TABLES", "../models/endgame"))
 
 @app.route('/')
 def index():
     """Serve the main chess game page"""
     return render_template('index.html')
 
-@app.route('/api/game/status')
-def get_game_status():
-    """Get current game status"""
-    if not game:
-        initialize_game()
-    
-    return jsonify(game.get_game_info())
+@app.route('/api/ready')
+def get_ready():
+    """The simple engines need no model, so they are always ready"""
+    return jsonify({"ready": True, "loading": False, "error": None, "engine": AI_ENGINE})
 
-@app.route('/api/game/reset', methods=['POST'])
-def reset_game():
+@app.route('/api/game/<game_id>/reset', methods=['POST'])
+def reset_game(game_id):
     """Reset the game"""
-    global game
-    data = request.get_json() or {}
-    player_color = chess.WHITE if data.get('player_color', 'white') == 'white' else chess.BLACK
-    
-    game = GameState(player_color=player_color)
+    data = request.get_json(silent=True) or {}
+    with games.game(game_id) as game:
+        if not game:
+            return game_not_found(game_id)
+        game.reset_game(parse_player_color(data))
     return jsonify({"success": True, "message": "Game reset"})
 
-@app.route('/api/game/move', methods=['POST'])
-def make_move():
+@app.route('/api/game/<game_id>/move', methods=['POST'])
+def make_move(game_id):
     """Make a player move"""
-    if not game:
-        initialize_game()
-    
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
         move_uci = data.get('move')
         
-        print(f"Received move request: {move_uci}")
+        print(f"Received move request for {game_id}: {move_uci}")
         
         if not move_uci:
             return jsonify({"success": False, "error": "No move provided"})
         
-        # Make player move
-        result = game.make_player_move(move_uci)
-        print(f"Player move result: {result}")
-        
-        if not result["success"]:
-            return jsonify(result)
-        
-        # If game is not over and it's AI's turn, make AI move
-        if not game.game_over and game.is_ai_turn():
-            ai_move = get_ai_move()
-            if ai_move:
-                print(f"AI making move: {ai_move}")
-                ai_result = game.make_ai_move(ai_move)
-                result["ai_move"] = ai_move
-                result["ai_result"] = ai_result
-                print(f"AI move result: {ai_result}")
+        with games.game(game_id) as game:
+            if not game:
+                return game_not_found(game_id)
+            
+            # Make player move
+            result = game.make_player_move(move_uci)
+            print(f"Player move result: {result}")
+            
+            if not result["success"]:
+                return jsonify(result)
+            
+            # If game is not over and it's AI's turn, make AI move
+            if not game.game_over and game.is_ai_turn():
+                ai_move = get_ai_move(game)
+                if ai_move:
+                    print(f"AI making move: {ai_move}")
+                    ai_result = game.make_ai_move(ai_move)
+                    result["ai_move"] = ai_move
+                    result["ai_result"] = ai_result
+                    print(f"AI move result: {ai_result}")
         
         return jsonify(result)
-        
+    
     except Exception as e:
         print(f"Error in make_move: {e}")
         import traceback
         traceback.print_exc()
         return jsonify({"success": False, "error": str(e)})
 
-def get_ai_move():
-    """Get AI move (random for now)"""
+def get_ai_move(game: GameState):
+    """Get AI move (search or random)"""
+    book_move = opening_book.get_move(game.board) if opening_book else None
+    if book_move:
+        return book_move
+    
+    endgame_move = endgame_tables.best_move(game.board.board) if AI_ENGINE != "random" else None
+    if endgame_move:
+        return endgame_move
+    
+    if AI_ENGINE == "search":
+        if not hasattr(search_engines, "engine"):
+            search_engines.engine = SearchEngine(tt_size=SEARCH_TT_SIZE, tablebase=endgame_tables)
+        return search_engines.engine.search(game.board.board, max_depth=64, time_limit=SEARCH_TIME)["move"]
+    
     # Simple random move AI
     legal_moves = game.board.get_legal_moves()
     return random.choice(legal_moves) if legal_moves else None
 
-@app.route('/api/game/legal-moves')
-def get_legal_moves():
-    """Get legal moves for current position"""
-    if not game:
-        initialize_game()
-    
-    return jsonify({
-        "legal_moves": game.board.get_legal_moves(),
-        "current_turn": "white" if game.board.board.turn else "black"
-    })
-
-@app.route('/api/game/board')
-def get_board():
-    """Get current board state"""
-    if not game:
-        initialize_game()
-    
-    try:
-        # Convert board to JSON format
-        board_data = {}
-        for square in chess.SQUARES:
-            piece = game.board.board.piece_at(square)
-            if piece:
-                square_name = chess.square_name(square)
-                board_data[square_name] = {
-                    "piece": piece.symbol(),
-                    "color": "white" if piece.color else "black"
-                }
-        
-        response_data = {
-            "board": board_data,
-            "fen": game.board.get_fen(),
-            "turn": "white" if game.board.board.turn else "black",
-            "is_check": game.board.is_check(),
-            "game_over": game.game_over,
-            "result": game.game_result
-        }
-        
-        print(f"Board state: {len(board_data)} pieces, turn: {response_data['turn']}")
-        return jsonify(response_data)
-        
-    except Exception as e:
-        print(f"Error in get_board: {e}")
-        import traceback
-        traceback.print_exc()
-        return jsonify({"error": str(e)}), 500
-
 if __name__ == '__main__':
-    initialize_game()
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,73 @@
+"""
+Routes and helpers shared by the full and the simplified web servers
+"""
+
+from flask import Blueprint, Response, request, jsonify
+from game.game_store import GameStore
+import chess
+
+def parse_player_color(data: dict) -> bool:
+    """Get the requested player color from a request body"""
+    return chess.WHITE if data.get('player_color', 'white') == 'white' else chess.BLACK
+
+def game_not_found(game_id: str):
+    """Response for an unknown or expired game ID"""
+    return jsonify({"success": False, "error": f"Game {game_id} not found"}), 404
+
+def cached_json(body: bytes, etag: str):
+    """Serve pre-serialized JSON, answering 304 when the client's copy is current"""
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"  # Cache, but revalidate every poll
+    return response.make_conditional(request)
+
+def game_routes(games: GameStore) -> Blueprint:
+    """Blueprint of the game endpoints that do not involve the AI"""
+    routes = Blueprint("games", __name__)
+    
+    @routes.route('/api/game/new', methods=['POST'])
+    def new_game():
+        """Create a new game"""
+        data = request.get_json(silent=True) or {}
+        game_id = games.create_game(parse_player_color(data))
+        return jsonify({"success": True, "game_id": game_id})
+    
+    @routes.route('/api/game/<game_id>/status')
+    def get_game_status(game_id):
+        """Get current game status"""
+        with games.game(game_id) as game:
+            if not game:
+                return game_not_found(game_id)
+            
+            # ?since=<ply>&history=<history_id> returns only the newer moves
+            since = request.args.get('since', type=int)
+            if since is not None:
+                return jsonify(game.get_game_delta(since, request.args.get('history')))
+            
+            snapshot = game.snapshot()
+            return cached_json(snapshot.info_json, snapshot.etag)
+    
+    @routes.route('/api/game/<game_id>/legal-moves')
+    def get_legal_moves(game_id):
+        """Get legal moves for current position"""
+        with games.game(game_id) as game:
+            if not game:
+                return game_not_found(game_id)
+            
+            return jsonify({
+                "legal_moves": game.get_legal_moves(),
+                "current_turn": "white" if game.board.board.turn else "black"
+            })
+    
+    @routes.route('/api/game/<game_id>/board')
+    def get_board(game_id):
+        """Get current board state"""
+        with games.game(game_id) as game:
+            if not game:
+                return game_not_found(game_id)
+            
+            # Serialized once per ply and shared by all polls
+            snapshot = game.board_snapshot()
+            return cached_json(snapshot.board_json, snapshot.board_etag)
+    
+    return routes
\ No newline at end of file
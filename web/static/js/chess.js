@@ -12,6 +12,7 @@ class ChessGame {
         this.playerColor = 'white';
         this.moveHistory = [];
         this.capturedPieces = { white: [], black: [] };
+        this.gameId = sessionStorage.getItem('chessGameId');
         
         // Piece symbols
         this.pieceSymbols = {
@@ -19,10 +20,41 @@ class ChessGame {
             'k': '♚', 'q': '♛', 'r': '♜', 'b': '♝', 'n': '♞', 'p': '♟'
         };
         
+        this.gameReady = this.ensureGame();
         this.initializeBoard();
         this.bindEvents();
     }
     
+    async ensureGame() {
+        // Reuse this tab's game if the server still has it
+        if (this.gameId) {
+            const response = await fetch(`/api/game/${this.gameId}/status`);
+            if (response.ok) {
+                return this.gameId;
+            }
+        }
+        return this.createGame(this.playerColor);
+    }
+    
+    async createGame(playerColor) {
+        const response = await fetch('/api/game/new', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({ player_color: playerColor })
+        });
+        const data = await response.json();
+        
+        this.gameId = data.game_id;
+        sessionStorage.setItem('chessGameId', this.gameId);
+        return this.gameId;
+    }
+    
+    apiUrl(endpoint) {
+        return `/api/game/${this.gameId}/${endpoint}`;
+    }
+    
     initializeBoard() {
         const boardElement = document.getElementById('chessBoard');
         boardElement.innerHTML = '';
@@ -46,7 +78,14 @@ class ChessGame {
     
     async loadGameState() {
         try {
-            const response = await fetch('/api/game/board');
+            await this.gameReady;
+            let response = await fetch(this.apiUrl('board'));
+            if (response.status === 404) {
+                // The game expired on the server, start a new one
+                this.gameReady = this.createGame(this.playerColor);
+                await this.gameReady;
+                response = await fetch(this.apiUrl('board'));
+            }
             const data = await response.json();
             
             this.board = data.board;
@@ -101,7 +140,7 @@ class ChessGame {
         if (!this.selectedSquare) return;
         
         try {
-            const response = await fetch('/api/game/legal-moves');
+            const response = await fetch(this.apiUrl('legal-moves'));
             const data = await response.json();
             
             data.legal_moves.forEach(moveUci => {
@@ -175,7 +214,7 @@ class ChessGame {
         
         try {
             console.log('Sending move to server...');
-            const response = await fetch('/api/game/move', {
+            const response = await fetch(this.apiUrl('move'), {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
@@ -192,28 +231,36 @@ class ChessGame {
                 // Play move sound
                 this.playMoveSound();
                 
-                // Add to move history
-                this.addMoveToHistory(moveUci, result.ai_move);
-                
                 // Clear selection
                 this.selectedSquare = null;
                 
                 // Update board
                 await this.loadGameState();
                 
-                // Show AI thinking if AI made a move
-                if (result.ai_move) {
-                    console.log(`AI played: ${result.ai_move}`);
+                // The AI reply is computed in the background, wait for it
+                let aiResult = result.ai_move ? { success: true, ai_move: result.ai_move } : null;
+                if (result.ai_pending) {
                     this.showAIThinking(true);
-                    setTimeout(() => {
-                        this.showAIThinking(false);
-                        this.playMoveSound();
-                    }, 1000);
+                    aiResult = await this.waitForAIMove(result.ai_job);
+                    this.showAIThinking(false);
+                }
+                const aiMove = aiResult && aiResult.success ? aiResult.ai_move : null;
+                
+                // Add to move history
+                this.addMoveToHistory(moveUci, aiMove);
+                
+                if (aiMove) {
+                    console.log(`AI played: ${aiMove}`);
+                    this.playMoveSound();
+                    if (result.ai_pending) {
+                        await this.loadGameState();
+                    }
                 }
                 
                 // Check for game over
-                if (result.game_over) {
-                    this.handleGameOver(result.result);
+                const final = aiResult && aiResult.game_over ? aiResult : result;
+                if (final.game_over) {
+                    this.handleGameOver(final.result);
                 }
                 
             } else {
@@ -290,6 +337,22 @@ class ChessGame {
         }
     }
     
+    async waitForAIMove(jobId) {
+        // Long-poll until the AI move of this job is done or replaced
+        while (true) {
+            try {
+                const response = await fetch(this.apiUrl(`ai-move?job=${jobId}`));
+                const result = await response.json();
+                if (result.status !== 'pending') {
+                    return result;
+                }
+            } catch (error) {
+                console.error('Failed to get AI move:', error);
+                return null;
+            }
+        }
+    }
+    
     showAIThinking(show) {
         const aiThinking = document.getElementById('aiThinking');
         if (show) {
@@ -344,7 +407,8 @@ class ChessGame {
     
     async resetGame(playerColor = 'white') {
         try {
-            const response = await fetch('/api/game/reset', {
+            await this.gameReady;
+            const response = await fetch(this.apiUrl('reset'), {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
@@ -368,7 +432,13 @@ class ChessGame {
                 // Hide modal
                 document.getElementById('gameOverModal').classList.add('hidden');
                 
-                // Reload game state
+                // Reload game state, after the AI opening move when it plays white
+                const result = await response.json();
+                if (result.ai_pending) {
+                    this.showAIThinking(true);
+                    await this.waitForAIMove(result.ai_job);
+                    this.showAIThinking(false);
+                }
                 await this.loadGameState();
                 
                 // Update color button
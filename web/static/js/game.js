@@ -29,7 +29,8 @@ class GameManager {
     }
     
     async checkConnection() {
-        const response = await fetch('/api/game/status');
+        await window.chessGame.gameReady;
+        const response = await fetch(window.chessGame.apiUrl('status'));
         if (!response.ok) {
             throw new Error('Server not responding');
         }
@@ -75,7 +76,8 @@ class GameManager {
     
     async syncGameState() {
         try {
-            const response = await fetch('/api/game/status');
+            await window.chessGame.gameReady;
+            const response = await fetch(window.chessGame.apiUrl('status'));
             const gameInfo = await response.json();
             
             // Update local game state if needed
@@ -19,11 +19,16 @@ class UIManager {
         const statusText = document.querySelector('.status-text');
         
         try {
-            // Check if AI is available by making a test request
-            const response = await fetch('/api/game/status');
-            if (response.ok) {
+            // The model loads in the background, moves are served meanwhile
+            const response = await fetch('/api/ready');
+            const status = await response.json();
+            if (status.ready) {
                 statusIndicator.className = 'status-indicator';
                 statusText.textContent = 'AI Ready';
+            } else if (status.loading) {
+                statusIndicator.className = 'status-indicator loading';
+                statusText.textContent = 'AI Loading...';
+                setTimeout(() => this.updateAIStatus(), 1000);
             } else {
                 statusIndicator.className = 'status-indicator error';
                 statusText.textContent = 'AI Unavailable';